@@ -3,20 +3,45 @@ import streamlit as st
 import asyncio
 import os
 import tempfile
-import speech_recognition as sr
-from utils.api_handler import GeminiHandler, WeatherHandler
+from typing import AsyncIterator, Iterator
+from utils.api_handler import GeminiHandler, GenerationError, WeatherError, WeatherHandler
 from utils.context_manager import ConversationManager
-from config.settings import ALLOWED_FILE_TYPES
+from config.settings import ALLOWED_FILE_TYPES, CONVERSATION_PAGE_SIZE
 
 async def process_message(user_input: str, file_path: str, gemini_handler: GeminiHandler,
                         weather_handler: WeatherHandler, conversation_manager: ConversationManager) -> str:
     context = conversation_manager.get_context()
     if "weather" in user_input.lower():
-        return weather_handler.get_weather_info(user_input)
+        return await weather_handler.get_weather_info_async(user_input)
     else:
         return await gemini_handler.generate_response(user_input, file_path, context)
 
+async def stream_message(user_input: str, file_path: str, gemini_handler: GeminiHandler,
+                         weather_handler: WeatherHandler, conversation_manager: ConversationManager) -> AsyncIterator[str]:
+    """Streaming variant of process_message: yields response text as it arrives."""
+    context = conversation_manager.get_context()
+    if "weather" in user_input.lower():
+        yield await weather_handler.get_weather_info_async(user_input)
+    else:
+        async for chunk in gemini_handler.stream_response(user_input, file_path, context):
+            yield chunk
+
+def iterate_async(agen: AsyncIterator[str]) -> Iterator[str]:
+    """Drive an async generator from Streamlit's synchronous script thread, item by item."""
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(agen.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(agen.aclose())
+        loop.close()
+
 def handle_voice_input():
+    import speech_recognition as sr  # only needed for voice input
+
     r = sr.Recognizer()
     with sr.Microphone() as source:
         st.info("Listening... Speak now.")
@@ -28,11 +53,29 @@ def handle_voice_input():
             return text, tmp_file.name
     return None, None
 
+def load_history_page(conversation_manager: ConversationManager):
+    """Prepend the previous page of stored history to ``st.session_state.messages``.
+
+    Only the rendered window lives in session state; the store is read once per page,
+    not on every rerun.
+    """
+    store, session_id = conversation_manager.store, conversation_manager.session_id
+    if "messages" not in st.session_state:
+        st.session_state.messages = []
+        st.session_state.history_offset = store.count(session_id) if store is not None and session_id else 0
+    offset = st.session_state.history_offset
+    start = max(offset - CONVERSATION_PAGE_SIZE, 0)
+    if offset > start:
+        st.session_state.messages = store.load(session_id, start, offset - start) + st.session_state.messages
+        st.session_state.history_offset = start
+
 def chat_interface(gemini_handler: GeminiHandler, weather_handler: WeatherHandler,
                   conversation_manager: ConversationManager):
     # Display chat history
     if "messages" not in st.session_state:
-        st.session_state.messages = []
+        load_history_page(conversation_manager)
+    if st.session_state.history_offset > 0 and st.button("Load earlier messages"):
+        load_history_page(conversation_manager)
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
@@ -61,13 +104,18 @@ def chat_interface(gemini_handler: GeminiHandler, weather_handler: WeatherHandle
             if file_path and file_path.lower().endswith(('png', 'jpg', 'jpeg')):
                 st.image(file_path)
 
-        with st.spinner("Processing..."):
-            response = asyncio.run(process_message(user_input, file_path, gemini_handler,
-                                                  weather_handler, conversation_manager))
+        # Tokens are rendered as they arrive instead of after the whole generation
+        with st.chat_message("assistant"):
+            try:
+                response = st.write_stream(iterate_async(stream_message(user_input, file_path, gemini_handler,
+                                                                        weather_handler, conversation_manager)))
+            except (GenerationError, WeatherError) as e:
+                # Shown as an error, never stored as an answer the model would see as context
+                st.error(str(e))
+                response = None
+        if response is not None:
             conversation_manager.add_to_context(user_input, response)
             st.session_state.messages.append({"role": "assistant", "content": response})
-            with st.chat_message("assistant"):
-                st.markdown(response)
 
         # Cleanup
         if file_path and os.path.exists(file_path):
@@ -0,0 +1,62 @@
+# app/components/diagnostics.py
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+from utils.metrics import MetricsRegistry, slowest_spans
+
+
+def _timers_frame(snapshot: dict) -> pd.DataFrame:
+    rows = [{"operation": name, "labels": ", ".join(f"{k}={v}" for k, v in s["labels"].items()),
+             "count": s["count"], "p50 ms": s["p50_s"] * 1000, "p95 ms": s["p95_s"] * 1000,
+             "p99 ms": s["p99_s"] * 1000, "max ms": s["max_s"] * 1000, "total s": s["sum_s"]}
+            for name, series in snapshot["timers"].items() for s in series]
+    return pd.DataFrame(rows).sort_values("total s", ascending=False) if rows else pd.DataFrame()
+
+
+def _counters_frame(snapshot: dict) -> pd.DataFrame:
+    rows = [{"counter": name, "labels": ", ".join(f"{k}={v}" for k, v in s["labels"].items()),
+             "value": s["value"]}
+            for name, series in snapshot["counters"].items() for s in series]
+    return pd.DataFrame(rows).sort_values(["counter", "labels"]) if rows else pd.DataFrame()
+
+
+def display_diagnostics(registry: MetricsRegistry):
+    """Timers, counters, recent request traces and optional per-request profiles."""
+    st.subheader("Diagnostics")
+    snapshot = registry.snapshot()
+    st.caption(f"Metrics since process start ({snapshot['uptime_s'] / 60:.1f} min ago)")
+
+    col1, col2, col3 = st.columns(3)
+    col1.download_button("Prometheus metrics", registry.render_prometheus(), file_name="metrics.prom",
+                         mime="text/plain")
+    col2.download_button("JSON metrics", registry.render_json(), file_name="metrics.json",
+                         mime="application/json")
+    if col3.button("Reset metrics"):
+        registry.reset()
+        st.rerun()
+
+    st.markdown("**Timers** (slowest total first)")
+    st.dataframe(_timers_frame(snapshot), hide_index=True, use_container_width=True)
+    st.markdown("**Counters**")
+    st.dataframe(_counters_frame(snapshot), hide_index=True, use_container_width=True)
+
+    st.markdown("**Recent requests**")
+    for trace in reversed(snapshot["traces"][-10:]):
+        started = datetime.fromtimestamp(trace["started_at"]).strftime("%H:%M:%S")
+        with st.expander(f"{started} {trace['name']}: {trace['duration_ms']:.1f} ms ({trace['status']})"):
+            spans = slowest_spans(trace)
+            if spans:
+                st.dataframe(pd.DataFrame(spans), hide_index=True, use_container_width=True)
+            else:
+                st.caption("No instrumented operations in this request.")
+
+    st.markdown("**Profiling**")
+    registry.profiling_enabled = st.toggle("Profile each request (cProfile + tracemalloc; slow)",
+                                           value=registry.profiling_enabled)
+    for profile in reversed(registry.profiles):
+        started = datetime.fromtimestamp(profile["started_at"]).strftime("%H:%M:%S")
+        with st.expander(f"{started} {profile['name']}: {profile['duration_ms']:.1f} ms, "
+                         f"peak {profile['peak_traced_mb']:.1f} MB traced"):
+            st.code(profile["cpu"], language="text")
+            st.code("\n".join(profile["allocations"]), language="text")
@@ -1,16 +1,33 @@
 # app/components/sidebar.py
 import streamlit as st
+from config.settings import DIAGNOSTICS_ENABLED
 
 
 def sidebar_controls() -> str:
     st.sidebar.title("NetworkSync Controls")
 
-    # Mode selection
-    mode = st.sidebar.selectbox("Select Mode", ["Chat", "Network Analysis", "Node Placement"])
+    # Mode selection; Diagnostics (traces, profiles, metrics) only when DIAGNOSTICS_ENABLED is set
+    modes = ["Chat", "Network Analysis", "Node Placement"]
+    if DIAGNOSTICS_ENABLED:
+        modes.append("Diagnostics")
+    mode = st.sidebar.selectbox("Select Mode", modes)
 
     # Input mode for Chat only
     if mode == "Chat":
         input_mode = st.sidebar.radio("Input Mode", ["Text", "Voice", "File"])
         st.session_state.input_mode = input_mode
 
-    return mode
\ No newline at end of file
+    return mode
+
+
+def display_timings(resource_timings: dict, rerun_timings: dict, cache_stats: dict = None):
+    """Show startup/resource load, per-rerun timings and cache hit rates in a collapsed sidebar panel."""
+    with st.sidebar.expander("Performance", expanded=False):
+        for name, seconds in sorted(resource_timings.items()):
+            st.caption(f"{name}: {seconds * 1000:.1f} ms")
+        if "last" in rerun_timings:
+            st.caption(f"last rerun: {rerun_timings['last'] * 1000:.1f} ms "
+                       f"({rerun_timings['count']} reruns this session)")
+        for name, stats in (cache_stats or {}).items():
+            st.caption(f"{name} cache: {stats['hits']} hits / {stats['misses']} misses "
+                       f"({stats['hit_rate']:.0%})")
@@ -1,37 +1,204 @@
 # app/components/visualizations.py
 import streamlit as st
 import pandas as pd
-from utils.network_analyzer import NetworkAnalyzer
-from utils.geo_processor import GeoProcessor
 import os
-import plotly.express as px  # For simple visualizations
+import time
 import logging
+from typing import TYPE_CHECKING, Callable, Hashable, Optional
+import numpy as np
+from config.settings import NODE_COVERAGE_RADIUS_KM, MAX_NODES, MODEL_PATH
+from utils.cache import TTLCache
+from utils.downsample import downsample
+from utils.jobs import Job, JobPool
+from utils.metrics import count
+from utils.upload_store import StoredUpload, UploadStore, UploadTooLargeError
+
+if TYPE_CHECKING:  # each page only imports the subsystem it uses
+    from utils.data_fetcher import TelemetryStream
+    from utils.geo_processor import GeoProcessor
+    from utils.network_analyzer import NetworkAnalyzer
 
 logger = logging.getLogger(__name__)
 
+TRAINING_MODES = ["Predict only (persisted model)", "Incremental update", "Full retrain"]
+POLL_INTERVAL = 0.5  # seconds between reruns while a background job is running
+EXPLAINED_ROWS = 1000  # the lowest predictions explained per upload
+MAX_CHART_POINTS = 4000  # points sent to the browser per chart; longer series are downsampled
+DOWNSAMPLING = {"Min/max (keeps dips)": "minmax", "LTTB (keeps shape)": "lttb"}
+
+# Figure JSON per (job, range, method): reruns and other sessions viewing the same result reuse it
+_figures = TTLCache(maxsize=64)
+
+
+def store_upload(uploads: UploadStore, uploaded_file) -> StoredUpload:
+    """Store an uploaded file once per session upload; reruns reuse the stored copy."""
+    stored = st.session_state.setdefault("stored_uploads", {})
+    file_key = (getattr(uploaded_file, "file_id", None) or uploaded_file.name, uploaded_file.size)
+    # Stored again if the store pruned it since (another session's uploads count against the same cap)
+    if file_key not in stored or not os.path.exists(stored[file_key].path):
+        uploads.check_size(uploaded_file.size, uploaded_file.name)  # before reading it into memory
+        stored[file_key] = uploads.put(uploaded_file.getvalue(), uploaded_file.name)
+    return stored[file_key]
+
+
+def session_job(jobs: JobPool, slot: str, key: Hashable, fn: Callable, *args, name: str = "job") -> Job:
+    """The session's job for ``key``, submitting it when the inputs changed.
+
+    A failed job stays in the session (its error is shown) until the inputs change,
+    instead of being retried on every rerun.
+    """
+    job = st.session_state.get(slot)
+    if job is None or job.key != key:
+        job = jobs.submit(key, fn, *args, name=name)
+        st.session_state[slot] = job
+    return job
+
+
+def wait_for(job: Job):
+    """Show the job's progress and poll with a rerun until it has finished."""
+    if job.done():
+        return
+    st.progress(job.progress, text=f"{job.message} ({job.elapsed:.0f} s)")
+    time.sleep(POLL_INTERVAL)
+    st.rerun()
+
+
+def analyze_upload(model, scorer, data_path: str, training_mode: Optional[str], progress: Callable) -> dict:
+    """Background job: (optionally) train on the file, then predict uptime, energy stats and KPIs.
 
-def display_network_analysis(network_analyzer: NetworkAnalyzer):
+    Works on its own analyzer, so the session's model only changes once the
+    result is applied on the script thread.
+    """
+    from utils.network_analyzer import NetworkAnalyzer
+    from utils.storage import count_rows
+
+    analyzer = NetworkAnalyzer(model=model, scorer=scorer)
+    if training_mode is None:
+        # Predict-only: stream the file in chunks, never holding it whole in memory
+        total = max(count_rows(data_path), 1)
+        predictions, energy_stats = analyzer.analyze_file(
+            data_path, progress=lambda rows: progress(0.9 * rows / total, f"Scored {rows:,} of ~{total:,} rows"))
+    else:
+        progress(0.05, "Loading data")
+        df = analyzer.load_data(data_path)
+        features, target = analyzer.preprocess_data(df)
+        progress(0.2, f"Training on {len(df):,} rows")
+        if training_mode == "Incremental update":
+            analyzer.update_model(features, target)
+        else:
+            analyzer.train_model(features, target)
+        progress(0.8, "Predicting")
+        predictions = analyzer.predict_downtime(features)
+        energy_stats = analyzer.analyze_energy_efficiency(df)
+    progress(0.92, "Computing node KPIs")
+    result = {"model": analyzer.model, "predictions": predictions, "energy_stats": energy_stats,
+              "node_kpis": None, "fleet_kpis": None, "kpi_error": None}
+    try:
+        engine = analyzer.analyze_kpis(data_path)
+        if engine is not None:
+            result["node_kpis"], result["fleet_kpis"] = engine.node_kpis(), engine.fleet_kpis()
+    except Exception as e:
+        # KPIs are an add-on; the predictions are still worth showing without them
+        result["kpi_error"] = str(e)
+    return result
+
+
+def explain_upload(model, data_path: str, predictions: np.ndarray, cache_path: Optional[str],
+                   progress: Callable) -> dict:
+    """Background job: global feature importance and the drivers behind the lowest predictions."""
+    from utils.network_analyzer import FEATURE_COLUMNS, NetworkAnalyzer
+
+    analyzer = NetworkAnalyzer(model=model)
+    progress(0.05, "Loading data")
+    df = analyzer.load_data(data_path)
+    progress(0.2, "Computing feature importance")
+    importance = analyzer.feature_importance(df[FEATURE_COLUMNS], df['uptime'], cache_path=cache_path)
+    progress(0.7, f"Explaining the {EXPLAINED_ROWS:,} lowest predictions")
+    lowest = np.argsort(predictions, kind="stable")[:EXPLAINED_ROWS]
+    explained = analyzer.explain_predictions(df[FEATURE_COLUMNS].iloc[lowest])
+    explained.index = pd.Index(lowest + 1, name="Data Point")
+    return {"importance": importance, "explained": explained}
+
+
+def place_upload(geo_processor: "GeoProcessor", geo_path: str, coverage_radius_km: float,
+                 max_nodes: Optional[int], progress: Callable) -> dict:
+    """Background job: node placement, coverage distances and the rendered map for a GeoJSON file."""
+    progress(0.05, "Reading locations")
+    gdf = geo_processor.load_geo_data(geo_path)
+    progress(0.3, f"Placing nodes for {len(gdf):,} locations")
+    placement = geo_processor.place_nodes(gdf, max_nodes=max_nodes, coverage_radius_km=coverage_radius_km)
+    nodes = list(zip(placement["lat"].tolist(), placement["lon"].tolist()))
+    progress(0.7, "Measuring distances")
+    distances, _ = geo_processor.nearest_nodes(gdf, nodes)
+    progress(0.85, "Rendering map")
+    return {"locations": len(gdf), "coverage_fraction": placement["coverage_fraction"], "nodes": nodes,
+            "mean_distance_km": float(distances.mean()), "max_distance_km": float(distances.max()),
+            "map_html": geo_processor.render_map_html(nodes)}
+
+
+def display_network_analysis(network_analyzer: "NetworkAnalyzer", uploads: UploadStore, jobs: JobPool,
+                             telemetry: Optional["TelemetryStream"] = None):
     st.subheader("Network Analysis")
+    if telemetry is not None:
+        display_live_telemetry(telemetry)
     st.write(
-        "Upload a CSV file with network data (columns: bandwidth, latency, signal_strength, uptime) to predict network uptime and analyze energy efficiency.")
+        "Upload a CSV, Parquet or Arrow file with network data (columns: bandwidth, latency, signal_strength, uptime) to predict network uptime and analyze energy efficiency.")
 
-    uploaded_data = st.file_uploader("Upload network data (CSV)", type=["csv"], key="network_data")
+    training_mode = st.radio("Model update", TRAINING_MODES, horizontal=True, key="training_mode")
+    persisted_model = st.session_state.get("network_model")
+    if (training_mode == TRAINING_MODES[0] and persisted_model is not None
+            and network_analyzer.model is not persisted_model and network_analyzer.is_fitted(persisted_model)):
+        # Drop what this session retrained: this mode predicts with the shared, persisted model
+        network_analyzer.model = persisted_model
+        st.session_state.pop("network_training_key", None)
+    uploaded_data = st.file_uploader("Upload network data (CSV/Parquet/Arrow)",
+                                     type=["csv", "parquet", "arrow", "feather"], key="network_data")
     if uploaded_data:
-        temp_file = "temp_network_data.csv"
-        with open(temp_file, "wb") as f:
-            f.write(uploaded_data.read())
+        try:
+            upload = store_upload(uploads, uploaded_data)
+        except UploadTooLargeError as e:
+            st.error(str(e))
+            return
+
+        # Train at most once per (upload, mode); reruns reuse the session's model
+        training_key = (upload.digest, training_mode)
+        needs_training = st.session_state.get("network_training_key") != training_key and (
+            training_mode != TRAINING_MODES[0] or not network_analyzer.is_fitted())
+        model = network_analyzer.model
+        # Results are memoized per (file, starting model), so other sessions and repeat uploads reuse them;
+        # the model is part of the key by identity, which also keeps it alive while its results are cached
+        # (the pool's byte budget counts it)
+        if needs_training:
+            if training_mode == TRAINING_MODES[0]:
+                st.info("No pre-trained model available; training on the uploaded data.")
+            job = session_job(jobs, "network_job", ("network.train", upload.digest, training_mode, model),
+                              uploads.reading(upload.path, analyze_upload), model, None, upload.path,
+                              "Full retrain" if training_mode == TRAINING_MODES[0] else training_mode,
+                              name="network.train")
+        else:
+            job = session_job(jobs, "network_job", ("network.predict", upload.digest, model),
+                              uploads.reading(upload.path, analyze_upload), model, network_analyzer.scorer,
+                              upload.path, None,
+                              name="network.predict")
+        wait_for(job)
 
         # Load and process data
         try:
-            df = network_analyzer.load_data(temp_file)
-            features, target = network_analyzer.preprocess_data(df)
-            network_analyzer.train_model(features, target)
-            predictions = network_analyzer.predict_downtime(features)
-            energy_stats = network_analyzer.analyze_energy_efficiency(df)
+            result = job.result()
+            if needs_training:
+                network_analyzer.model = result["model"]
+                st.session_state.network_training_key = training_key
+                # The training job already scored the file with the new model
+                jobs.put(("network.predict", upload.digest, result["model"]), result, name="network.predict")
+            predictions, energy_stats = result["predictions"], result["energy_stats"]
 
             # Debugging: Log predictions length
             logger.debug(f"Number of predictions: {len(predictions)}")
             st.write(f"Debug: Total predictions generated: {len(predictions)}")
+            if network_analyzer.scorer is not None:
+                stats = network_analyzer.scorer.stats()
+                st.caption(f"Batch scorer: {stats['rows_per_sec']:,.0f} rows/s, "
+                           f"p95 request latency {stats['p95_ms']:.1f} ms over {stats['batches']} batches")
 
             # Display Predictions in a Table
             st.markdown("### Predicted Network Uptime")
@@ -51,44 +218,173 @@ def display_network_analysis(network_analyzer: NetworkAnalyzer):
             })
             st.table(energy_df)
 
+            node_kpis, fleet_kpis = result.get("node_kpis"), result.get("fleet_kpis")
+            if result.get("kpi_error"):
+                st.warning(f"Node KPIs could not be computed: {result['kpi_error']}")
+            elif node_kpis is not None and not node_kpis.empty:
+                display_kpis(node_kpis, fleet_kpis)
+
             # Plot Uptime Prediction Trend
             st.markdown("### Uptime Prediction Trend")
-            if predictions and len(predictions) > 0:
-                # Use all predictions if less than 10, otherwise first 10
-                num_points = min(10, len(predictions))
-                x_values = [f"Point {i + 1}" for i in range(num_points)]
-                y_values = predictions[:num_points]
-
-                fig = px.line(x=x_values, y=y_values,
-                              labels={"x": "Data Point", "y": "Predicted Uptime (fraction)"},
-                              title=f"Uptime Predictions (First {num_points} Points)")
-                fig.update_traces(mode="lines+markers")  # Add markers for clarity
-                st.plotly_chart(fig, use_container_width=True)
+            if len(predictions) > 0:
+                display_uptime_chart(predictions, job.key, upload.digest)
             else:
                 st.warning("No predictions available to plot.")
 
+            if len(predictions) > 0 and st.checkbox("Explain what drives low predicted uptime",
+                                                    key="explain_predictions"):
+                from utils.explainer import explanations_path
+                from utils.resource_manager import resource_manager
+
+                model = result["model"]
+                # Only the persisted model's results are cached next to its file; models retrained in a
+                # session would push its entries out of the cache
+                persisted = model is resource_manager.peek("network_model")
+                explain_job = session_job(jobs, "explain_job", ("network.explain", upload.digest, model),
+                                          uploads.reading(upload.path, explain_upload), model, upload.path,
+                                          predictions,
+                                          explanations_path(MODEL_PATH) if persisted else None,
+                                          name="network.explain")
+                wait_for(explain_job)
+                display_explanations(explain_job.result())
+
         except Exception as e:
             logger.error(f"Error in network analysis: {str(e)}")
             st.error(f"Error processing network data: {str(e)}")
 
-        # Cleanup
-        if os.path.exists(temp_file):
-            os.unlink(temp_file)
 
+def uptime_figure(predictions: np.ndarray, start: int, stop: int, method: str,
+                  max_points: int = MAX_CHART_POINTS) -> dict:
+    """Figure dict for ``predictions[start:stop]``, downsampled to ~``max_points`` and drawn with WebGL."""
+    import plotly.graph_objects as go
+
+    view = predictions[start:stop]
+    indices = downsample(view, max_points, method)
+    shown = f", {len(indices):,} of {len(view):,} shown" if len(indices) < len(view) else ""
+    fig = go.Figure(go.Scattergl(x=indices + start + 1, y=view[indices], name="Predicted uptime",
+                                 mode="lines+markers" if len(indices) <= 50 else "lines"))
+    fig.update_layout(title=f"Uptime Predictions (Points {start + 1:,}-{stop:,}{shown})",
+                      xaxis_title="Data Point", yaxis_title="Predicted Uptime (fraction)")
+    return fig.to_dict()
+
+
+def display_uptime_chart(predictions: np.ndarray, result_key: Hashable, digest: str):
+    """Full prediction series, downsampled server-side; the range slider zooms without sending every point."""
+    start, stop = 0, len(predictions)
+    method = "minmax"
+    if len(predictions) > MAX_CHART_POINTS:
+        col1, col2 = st.columns([3, 1])
+        # Keyed by series, so a shorter file never inherits an out-of-range selection and the
+        # live and upload charts can share a page
+        first, last = col1.slider("Point range", 1, len(predictions), (1, len(predictions)),
+                                  key=f"uptime_range_{digest[:16]}")
+        start, stop = first - 1, last
+        method = DOWNSAMPLING[col2.radio("Downsampling", list(DOWNSAMPLING),
+                                         key=f"uptime_downsampling_{digest[:16]}")]
+
+    key = (result_key, start, stop, method)
+    figure = _figures.get(key)
+    count("chart.figure_cache", result="hit" if figure is not None else "miss")
+    if figure is None:
+        figure = uptime_figure(predictions, start, stop, method)
+        _figures.set(key, figure)
+    st.plotly_chart(figure, use_container_width=True)
+
+
+def display_live_telemetry(stream: "TelemetryStream"):
+    st.markdown("### Live Telemetry")
+    stats = stream.stats()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Rows ingested", f"{stats['rows']:,}",
+                help=f"{stats['pages']:,} pages, {stats['rows_per_sec']:,.0f} rows/s")
+    col2.metric("Rows in memory", f"{stats['buffered_rows']:,}", help=f"{stats['dropped_rows']:,} older rows dropped")
+    col3.metric("Pages waiting", stats["queued_pages"], help="Fetching pauses while the scoring queue is full")
+    col4.metric("Retries", stats["retries"], help=f"{stats['bad_pages']:,} malformed pages skipped")
+    if stats["error"]:
+        st.error(f"Telemetry stream stopped: {stats['error']}")
+        if st.button("Reconnect"):
+            stream.start()
+            st.rerun()
+
+    recent = stream.buffer.to_frame()
+    predicted = recent["predicted_uptime"].to_numpy()
+    if len(recent) and not np.isnan(predicted).all():
+        display_uptime_chart(predicted, ("telemetry", stats["rows"]), "telemetry")
+        st.write("Newest rows with predicted uptime:")
+        st.dataframe(recent.tail(10).iloc[::-1], use_container_width=True, hide_index=True)
+    elif len(recent):
+        st.info("Telemetry is buffered, but there is no trained model to score it yet.")
+    elif stats["running"]:
+        st.info("Waiting for telemetry...")
+    st.button("Refresh", key="telemetry_refresh")  # any rerun shows the latest rows
+
+
+def display_explanations(explanation: dict):
+    st.markdown("### What Drives Predicted Uptime")
+    importance = explanation["importance"]
+    st.write("Average absolute contribution of each feature to the predicted uptime "
+             "(permutation importance: drop in R² when the feature is shuffled).")
+    st.bar_chart(importance["mean_abs_contribution"])
+    st.dataframe(importance, use_container_width=True)
 
-def display_node_placement(geo_processor: GeoProcessor):
+    explained = explanation["explained"]
+    st.write(f"The {len(explained):,} lowest predictions: the base rate plus each feature's contribution; "
+             "the driver is the feature pulling the prediction down the most.")
+    st.dataframe(explained, use_container_width=True)
+    st.bar_chart(explained["driver"].value_counts())
+
+
+def display_kpis(node_kpis: pd.DataFrame, fleet_kpis: pd.DataFrame):
+    st.markdown("### Node KPIs")
+    anomalous = int(node_kpis["anomaly"].sum())
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Nodes", f"{len(node_kpis):,}")
+    col2.metric("Anomalous nodes", f"{anomalous:,}",
+                help="Mean latency or uptime is a robust outlier relative to the rest of the fleet")
+    col3.metric("Anomalous windows", f"{int(node_kpis['anomalous_windows'].sum()):,}",
+                help="Hourly windows where a node deviates strongly from its own typical latency or uptime")
+    st.write("Per-node summary, anomalous nodes first.")
+    st.dataframe(node_kpis, use_container_width=True)
+
+    st.markdown("### Fleet Energy and Uptime per Hour")
+    st.line_chart(fleet_kpis[["energy"]])
+    st.line_chart(fleet_kpis[["uptime_mean"]])
+
+
+def display_node_placement(geo_processor: "GeoProcessor", uploads: UploadStore, jobs: JobPool):
     st.subheader("Node Placement Optimization")
     st.write("Upload a GeoJSON file with location data (e.g., schools) to suggest optimal network node placements.")
 
+    col1, col2 = st.columns(2)
+    coverage_radius_km = col1.number_input("Coverage radius (km)", min_value=0.5, max_value=100.0,
+                                           value=float(NODE_COVERAGE_RADIUS_KM), step=0.5)
+    max_nodes = col2.number_input("Maximum nodes (0 = full coverage)", min_value=0, value=MAX_NODES or 0, step=1)
+
     geo_file = st.file_uploader("Upload geo data (GeoJSON)", type=["geojson"], key="geo_data")
     if geo_file:
-        temp_file = "temp_geo_data.json"
-        with open(temp_file, "wb") as f:
-            f.write(geo_file.read())
+        try:
+            upload = store_upload(uploads, geo_file)
+        except UploadTooLargeError as e:
+            st.error(str(e))
+            return
+        job = session_job(jobs, "placement_job", ("geo.place", upload.digest, coverage_radius_km, int(max_nodes)),
+                          uploads.reading(upload.path, place_upload), geo_processor, upload.path,
+                          coverage_radius_km, int(max_nodes) or None,
+                          name="geo.place")
+        wait_for(job)
+        try:
+            result = job.result()
+        except Exception as e:
+            logger.error(f"Error in node placement: {str(e)}")
+            st.error(f"Error processing geo data: {str(e)}")
+            return
+        nodes = result["nodes"]
 
-        gdf = geo_processor.load_geo_data(temp_file)
-        nodes = geo_processor.suggest_node_placement(gdf)
-        map_obj = geo_processor.visualize_map(nodes)
+        col1, col2 = st.columns(2)
+        col1.metric("Population covered", f"{result['coverage_fraction']:.1%}",
+                    help=f"{len(nodes)} nodes for {result['locations']} locations within {coverage_radius_km:g} km")
+        col2.metric("Mean distance to serving node", f"{result['mean_distance_km']:.2f} km",
+                    help=f"Farthest location: {result['max_distance_km']:.2f} km")
 
         # Display Suggested Node Locations in a Table
         st.markdown("### Suggested Node Locations")
@@ -103,8 +399,4 @@ def display_node_placement(geo_processor: GeoProcessor):
         # Display Map
         st.markdown("### Node Placement Map")
         st.write("Interactive map showing all suggested node locations.")
-        st.components.v1.html(map_obj._repr_html_(), height=500)
-
-        # Cleanup
-        if os.path.exists(temp_file):
-            os.unlink(temp_file)
\ No newline at end of file
+        st.components.v1.html(result["map_html"], height=500)
@@ -1,19 +1,163 @@
+import time
+_import_start = time.perf_counter()
+
+import logging
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from typing import Callable
 import streamlit as st
-import asyncio
-from app.components.chat import chat_interface
-from app.components.sidebar import sidebar_controls
-from app.components.visualizations import display_network_analysis, display_node_placement  # Fixed typo
-from utils.api_handler import GeminiHandler, WeatherHandler
-from utils.context_manager import ConversationManager
-from utils.network_analyzer import NetworkAnalyzer
-from utils.geo_processor import GeoProcessor
-from config.settings import GEMINI_API_KEY, WEATHER_API_KEY
+from app.components.sidebar import sidebar_controls, display_timings
+from utils.metrics import metrics, profile_request, request_trace, start_metrics_server
+from utils.resource_manager import resource_manager
+from config.settings import get_settings
+
+# Only the shell is imported up front; each mode's subsystem (Gemini SDK, sklearn,
+# geopandas/folium, plotly) is imported the first time that mode is opened.
+if "import" not in resource_manager.timings:
+    resource_manager.record_timing("import", time.perf_counter() - _import_start)
+
+logger = logging.getLogger(__name__)
+
+
+def get_shared_model():
+    """The process-wide model and its batch scorer; both reload when the model file changes."""
+    from utils.batch_inference import BatchScorer
+    from utils.network_analyzer import NetworkAnalyzer
+
+    settings = get_settings()
+    model_path = settings.model_path
+    model = resource_manager.get("network_model", lambda: NetworkAnalyzer(
+        model_path=model_path, expected_data_hash=settings.model_data_hash or None).model, watch_path=model_path)
+    # One micro-batching scorer per process, so concurrent sessions share predict calls
+    previous = resource_manager.peek("batch_scorer")
+    scorer = resource_manager.get("batch_scorer", lambda: BatchScorer(model), watch_path=model_path)
+    if previous is not None and previous is not scorer:
+        # Serves what is still queued, then stops its worker thread; analyzers still holding it
+        # (running jobs, the telemetry stream) predict with their model directly from then on
+        previous.close()
+    return model, scorer
+
+
+def get_session_analyzer():
+    """Per-session analyzer wrapping the process-wide model; rebuilt when the model reloads."""
+    from utils.network_analyzer import NetworkAnalyzer
+
+    model, scorer = get_shared_model()
+    if st.session_state.get("network_model") is not model:
+        st.session_state.network_model = model
+        st.session_state.network_analyzer = NetworkAnalyzer(model=model, scorer=scorer)
+    return st.session_state.network_analyzer
+
+
+def get_upload_services():
+    """Process-wide content-addressed upload store and background analysis pool."""
+    from utils.jobs import JobPool
+    from utils.upload_store import UploadStore
+
+    settings = get_settings()
+    uploads = resource_manager.get("upload_store", lambda: UploadStore(
+        os.path.join(settings.ensure_upload_dir(), "uploads"), settings.max_file_size,
+        settings.upload_store_max_bytes))
+    jobs = resource_manager.get("job_pool", lambda: JobPool(max_workers=settings.analysis_workers,
+                                                            max_result_bytes=settings.analysis_results_max_bytes))
+    return uploads, jobs
+
+
+def get_telemetry_stream():
+    """Process-wide streaming ingestor when TELEMETRY_SOURCE_URL is set (else None).
+
+    It scores with the shared model, never a session's retrained one, and
+    switches over when the model file reloads.
+    """
+    from utils.data_fetcher import DataFetcher
+    from utils.network_analyzer import NetworkAnalyzer
+
+    settings = get_settings()
+    if not settings.telemetry_source_url:
+        return None
+    stream = resource_manager.get("telemetry_stream", lambda: DataFetcher(
+        settings.telemetry_api_key or None, settings.telemetry_source_url).stream(
+        page_size=settings.telemetry_page_size, poll_interval=settings.telemetry_poll_interval,
+        queue_pages=settings.telemetry_queue_pages, buffer_rows=settings.telemetry_buffer_rows))
+    model, scorer = get_shared_model()
+    if stream.analyzer is None or stream.analyzer.model is not model:
+        stream.analyzer = NetworkAnalyzer(model=model, scorer=scorer)
+    if not stream.running and stream.error is None:
+        stream.start()
+    return stream
+
+
+def load_chat_page() -> Callable[[], None]:
+    from app.components.chat import chat_interface
+    from utils.api_handler import GeminiHandler, WeatherHandler
+    from utils.context_manager import ConversationManager
+    from utils.conversation_store import create_conversation_store
+
+    def render():
+        settings = get_settings()
+        gemini_handler = resource_manager.get("gemini_handler", lambda: GeminiHandler(settings.gemini_api_key))
+        weather_handler = resource_manager.get("weather_handler", lambda: WeatherHandler(settings.weather_api_key))
+        conversation_store = resource_manager.get("conversation_store", create_conversation_store)
+        if "conversation_manager" not in st.session_state:
+            st.session_state.conversation_manager = ConversationManager(store=conversation_store,
+                                                                        session_id=st.session_state.session_id)
+        chat_interface(gemini_handler, weather_handler, st.session_state.conversation_manager)
+    return render
+
+
+def load_network_analysis_page() -> Callable[[], None]:
+    from app.components.visualizations import display_network_analysis
+
+    def render():
+        display_network_analysis(get_session_analyzer(), *get_upload_services(), telemetry=get_telemetry_stream())
+    return render
+
+
+def load_node_placement_page() -> Callable[[], None]:
+    from app.components.visualizations import display_node_placement
+    from utils.geo_processor import GeoProcessor
+
+    def render():
+        display_node_placement(resource_manager.get("geo_processor", GeoProcessor), *get_upload_services())
+    return render
+
+
+def load_diagnostics_page() -> Callable[[], None]:
+    from app.components.diagnostics import display_diagnostics
+
+    def render():
+        display_diagnostics(metrics)
+    return render
+
+
+PAGES = {
+    "Chat": load_chat_page,
+    "Network Analysis": load_network_analysis_page,
+    "Node Placement": load_node_placement_page,
+    "Diagnostics": load_diagnostics_page,
+}
+
+
+def serve_metrics(port: int):
+    """The metrics endpoint, or None when the port is taken (e.g. by another worker process)."""
+    try:
+        return start_metrics_server(port)
+    except OSError as e:
+        logger.warning(f"Metrics endpoint not started on port {port}: {str(e)}")
+        return None
+
+
+def cache_stats() -> dict:
+    """Hit rates of the API caches, for the handlers this process has already built."""
+    handlers = {"Gemini": resource_manager.peek("gemini_handler"), "Weather": resource_manager.peek("weather_handler")}
+    return {name: handler.cache_stats() for name, handler in handlers.items() if handler is not None}
+
 
 def main():
+    rerun_start = time.perf_counter()
+
     # Title with uppercase "Neural Nexus" and smaller "NetworkSync AI Assistant"
     st.markdown(
         """
@@ -24,21 +168,37 @@ def main():
         unsafe_allow_html=True
     )
 
-    gemini_handler = GeminiHandler(GEMINI_API_KEY)
-    weather_handler = WeatherHandler(WEATHER_API_KEY)
-    network_analyzer = NetworkAnalyzer(model_path="data/models/network_predictor.pkl")
-    geo_processor = GeoProcessor()
-    if "conversation_manager" not in st.session_state:
-        st.session_state.conversation_manager = ConversationManager()
+    settings = get_settings()
+    if settings.metrics_port:
+        # Cached even when the bind fails, so the failure is logged once per process, not per rerun
+        resource_manager.get("metrics_server", lambda: serve_metrics(settings.metrics_port))
+    if "session_id" not in st.session_state:
+        # Carried in the URL so a reload (or another worker behind the balancer) resumes the history.
+        # Only ids this app signed are accepted, so a URL cannot name someone else's conversation.
+        from utils.conversation_store import new_session_token, verify_session_token
+
+        token = st.query_params.get("session")
+        session_id = verify_session_token(token, settings.session_secret)
+        if session_id is None:
+            token = new_session_token(settings.session_secret)
+            session_id = verify_session_token(token, settings.session_secret)
+        st.session_state.session_id = session_id
+        st.query_params["session"] = token
 
     mode = sidebar_controls()
+    # A mode's modules are imported once per process; the cold import shows up as load.page.<mode>
+    render = resource_manager.get(f"page.{mode}", PAGES[mode])
+    if "startup" not in resource_manager.timings:
+        resource_manager.record_timing("startup", time.perf_counter() - resource_manager.started_at)
 
-    if mode == "Chat":
-        chat_interface(gemini_handler, weather_handler, st.session_state.conversation_manager)
-    elif mode == "Network Analysis":
-        display_network_analysis(network_analyzer)
-    elif mode == "Node Placement":
-        display_node_placement(geo_processor)
+    # Every instrumented call made while rendering the mode lands in this rerun's trace
+    with request_trace(f"rerun:{mode}"), profile_request(f"rerun:{mode}"):
+        render()
+
+    display_timings(resource_manager.get_timings(), st.session_state.get("rerun_timings", {}), cache_stats())
+    timings = st.session_state.setdefault("rerun_timings", {"count": 0})
+    timings["count"] += 1
+    timings["last"] = time.perf_counter() - rerun_start
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,203 @@
+# benchmarks/harness.py
+"""Timing, memory and baseline comparison helpers for the benchmark suite."""
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+# Metrics compared against the baseline, and whether larger values are better
+COMPARED_METRICS = {"p50_ms": False, "p95_ms": False, "peak_mem_mb": False}
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+class _RSSPeakSampler:
+    """Highest resident set size seen while running, sampled every millisecond.
+
+    Complements tracemalloc, which misses memory allocated outside Python's
+    allocators (Arrow buffers, sklearn trees, GEOS geometries).
+    """
+
+    def __init__(self, interval: float = 0.001):
+        self.interval = interval
+        self.start_rss = self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, _rss_bytes())
+
+    def __enter__(self):
+        self.start_rss = self.peak_rss = _rss_bytes()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_rss = max(self.peak_rss, _rss_bytes())
+
+    @property
+    def growth(self) -> int:
+        return self.peak_rss - self.start_rss
+
+
+def measure(fn: Callable[[], Any], repeat: int = 5, warmup: int = 1, items: Optional[int] = None,
+            setup: Optional[Callable[[], None]] = None) -> Dict[str, float]:
+    """Run ``fn`` ``repeat`` times and summarize latency, throughput and peak memory.
+
+    ``items`` is what one call processes (rows, points, messages); throughput is
+    reported in items per second. ``setup`` runs untimed before every call.
+    Peak memory is measured on one extra call, since tracemalloc slows allocation:
+    ``peak_mem_mb`` is the peak of Python-traced allocations, ``peak_rss_growth_mb``
+    how far the resident set grew above its starting size (noisier, but it also
+    covers native allocations).
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    if setup:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        with _RSSPeakSampler() as rss:
+            fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings_ms = np.asarray(timings) * 1000
+    median_s = float(np.median(timings))
+    return {
+        "repeat": repeat,
+        "mean_ms": float(timings_ms.mean()),
+        "p50_ms": float(np.percentile(timings_ms, 50)),
+        "p95_ms": float(np.percentile(timings_ms, 95)),
+        "p99_ms": float(np.percentile(timings_ms, 99)),
+        "min_ms": float(timings_ms.min()),
+        "throughput_per_s": (items or 1) / median_s if median_s > 0 else float("inf"),
+        "items": items or 1,
+        "peak_mem_mb": peak / 1e6,
+        "peak_rss_growth_mb": rss.growth / 1e6,
+    }
+
+
+# VmHWM rather than ru_maxrss: the latter survives exec, so it would include the parent's footprint
+_COLD_START_TEMPLATE = """
+import json, time
+start = time.perf_counter()
+{code}
+seconds = time.perf_counter() - start
+with open("/proc/self/status") as f:
+    hwm_kb = next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+print(json.dumps({{"seconds": seconds, "max_rss_mb": hwm_kb / 1024}}))
+"""
+
+
+def measure_cold_start(code: str, repeat: int = 5, cwd: Optional[str] = None,
+                       env: Optional[Dict[str, str]] = None) -> Dict[str, float]:
+    """Time ``code`` in ``repeat`` fresh interpreters (cold imports, nothing cached in-process).
+
+    Latency is measured inside the child, excluding interpreter start-up;
+    ``peak_mem_mb`` is the child's maximum resident set size. Same keys as ``measure``.
+    """
+    timings, peak_rss = [], []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-W", "ignore", "-c", _COLD_START_TEMPLATE.format(code=code)],
+                                cwd=cwd, env=env, capture_output=True, text=True, check=True).stdout
+        child = json.loads(output.strip().splitlines()[-1])
+        timings.append(child["seconds"])
+        peak_rss.append(child["max_rss_mb"])
+
+    timings_ms = np.asarray(timings) * 1000
+    median_s = float(np.median(timings))
+    return {
+        "repeat": repeat,
+        "mean_ms": float(timings_ms.mean()),
+        "p50_ms": float(np.percentile(timings_ms, 50)),
+        "p95_ms": float(np.percentile(timings_ms, 95)),
+        "p99_ms": float(np.percentile(timings_ms, 99)),
+        "min_ms": float(timings_ms.min()),
+        "throughput_per_s": 1 / median_s if median_s > 0 else float("inf"),
+        "items": 1,
+        "peak_mem_mb": float(np.median(peak_rss)),
+        "peak_rss_growth_mb": float(np.median(peak_rss)),
+    }
+
+
+def environment() -> Dict[str, str]:
+    """Enough about the machine to tell whether two result files are comparable."""
+    import sklearn
+    import pandas
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "numpy": np.__version__,
+        "pandas": pandas.__version__,
+        "sklearn": sklearn.__version__,
+    }
+
+
+def write_results(path: str, results: Dict[str, Dict[str, float]], meta: Dict[str, Any]):
+    with open(path, "w") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2, sort_keys=True)
+
+
+def load_results(path: str) -> Dict[str, Dict[str, float]]:
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            threshold: float = 0.25, min_delta_ms: float = 1.0) -> List[Dict[str, Any]]:
+    """Benchmarks whose compared metrics got worse than the baseline by more than ``threshold``.
+
+    Latency changes smaller than ``min_delta_ms`` are ignored, as timer noise
+    dominates sub-millisecond benchmarks.
+    """
+    regressions = []
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (old - new) / old if higher_is_better else (new - old) / old
+            if metric.endswith("_ms") and abs(new - old) < min_delta_ms:
+                continue
+            if metric == "peak_mem_mb" and abs(new - old) < 1.0:
+                continue
+            if change > threshold:
+                regressions.append({"benchmark": name, "metric": metric, "baseline": old,
+                                    "current": new, "change": change})
+    return regressions
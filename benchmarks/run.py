@@ -0,0 +1,268 @@
+# benchmarks/run.py
+"""Offline benchmark suite for the analyzer, ingestion, geo and chat hot paths.
+
+Usage (from the repository root)::
+
+    python -m benchmarks.run                      # small datasets, compare to baseline
+    python -m benchmarks.run --sizes small medium --output results.json
+    python -m benchmarks.run --update-baseline    # accept the current numbers
+
+The startup group times cold imports of the app and of each page in fresh
+interpreters. Datasets are generated into a temporary directory with generate_sample_data's
+chunk generators; the LLM and weather backends are stubbed and telemetry is served
+by a local stub server (benchmarks/stubs.py), so nothing leaves the machine. Results (latency percentiles, throughput, peak
+traced and resident memory) are written as JSON and compared with benchmarks/baseline.json;
+the exit status is 1 when a benchmark regressed by more than ``--threshold``.
+Baselines are machine- and dependency-specific, so none is committed: create
+one with ``--update-baseline`` on the machine (and installed stack) that runs the
+comparison, e.g. on the base branch before benchmarking a change.
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import sys
+import tempfile
+from datetime import datetime, timezone
+from typing import Callable, Dict
+
+# Settings validate the API keys at import; nothing in the suite uses them
+os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+os.environ.setdefault("WEATHER_API_KEY", "offline-benchmark")
+
+from sklearn.ensemble import RandomForestRegressor  # noqa: E402
+
+from app.components.chat import process_message  # noqa: E402
+from benchmarks.harness import (compare, environment, load_results, measure, measure_cold_start,  # noqa: E402
+                                write_results)
+from benchmarks.stubs import StubGenerationBackend, StubTelemetryServer, StubWeatherHandler  # noqa: E402
+from generate_sample_data import GEO_SCENARIOS, NETWORK_SCENARIOS, generate_geo_data, generate_network_stats  # noqa: E402
+from utils.api_handler import GeminiHandler  # noqa: E402
+from utils.cache import ResponseCache  # noqa: E402
+from utils.context_manager import ConversationManager  # noqa: E402
+from utils.data_fetcher import TelemetryStream  # noqa: E402
+from utils.geo_processor import GeoProcessor  # noqa: E402
+from utils.network_analyzer import NetworkAnalyzer  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PAGES = ["Chat", "Network Analysis", "Node Placement"]
+GROUPS = ["startup", "analyzer", "ingest", "geo", "chat"]  # accepted by --only
+
+SIZES = {
+    "small": {"rows": 10_000, "schools": 2_000, "turns": 200, "messages": 200},
+    "medium": {"rows": 200_000, "schools": 20_000, "turns": 2_000, "messages": 1_000},
+    "large": {"rows": 2_000_000, "schools": 200_000, "turns": 20_000, "messages": 5_000},
+}
+MAX_TRAIN_ROWS = 50_000  # forests are O(n log n) per tree; larger sizes train on a prefix
+EXPLAIN_ROWS = 2_000
+INGEST_PAGE_ROWS = 5_000
+
+
+def build_datasets(size: Dict[str, int], data_dir: str) -> Dict[str, str]:
+    """Telemetry as CSV and Parquet, schools as GeoJSON, generated reproducibly."""
+    network = {**NETWORK_SCENARIOS["mixed"], "num_rows": size["rows"]}
+    geo = {**GEO_SCENARIOS["rural"], "num_locations": size["schools"]}
+    generate_network_stats("network_stats.csv", **network, out_dir=data_dir, workers=1)
+    generate_geo_data("schools.geojson", **geo, out_dir=data_dir, workers=1)
+    return {
+        "csv": os.path.join(data_dir, "network_stats.csv"),
+        "parquet": os.path.join(data_dir, "network_stats.parquet"),
+        "geojson": os.path.join(data_dir, "schools.geojson"),
+    }
+
+
+def analyzer_benchmarks(paths: Dict[str, str], size: Dict[str, int], repeat: int) -> Dict[str, dict]:
+    rows = size["rows"]
+    analyzer = NetworkAnalyzer(model=RandomForestRegressor(n_estimators=20, min_samples_leaf=5,
+                                                           n_jobs=-1, random_state=0))
+    results = {
+        "analyzer.load_data.csv": measure(lambda: analyzer.load_data(paths["csv"]), repeat=repeat, items=rows),
+        "analyzer.load_data.parquet": measure(lambda: analyzer.load_data(paths["parquet"]),
+                                              repeat=repeat, items=rows),
+    }
+    df = analyzer.load_data(paths["parquet"])
+    features, target = analyzer.preprocess_data(df)
+    train_rows = min(rows, MAX_TRAIN_ROWS)
+    results["analyzer.train_model"] = measure(
+        lambda: analyzer.train_model(features.iloc[:train_rows], target.iloc[:train_rows]),
+        repeat=max(repeat // 2, 1), warmup=0, items=train_rows)
+    results["analyzer.predict_downtime"] = measure(lambda: analyzer.predict_downtime(features),
+                                                   repeat=repeat, items=rows)
+    results["analyzer.analyze_energy_efficiency"] = measure(lambda: analyzer.analyze_energy_efficiency(df),
+                                                            repeat=repeat, items=rows)
+    results["analyzer.analyze_kpis"] = measure(lambda: analyzer.analyze_kpis(paths["parquet"]),
+                                               repeat=repeat, items=rows)
+    explained = features.iloc[:EXPLAIN_ROWS]
+    analyzer.explainer()  # built once per model; the benchmark times explaining a batch
+    results["analyzer.explain_predictions"] = measure(lambda: analyzer.explain_predictions(explained),
+                                                      repeat=repeat, items=len(explained))
+    return results
+
+
+def ingest_benchmarks(paths: Dict[str, str], size: Dict[str, int], repeat: int) -> Dict[str, dict]:
+    rows = size["rows"]
+    df = NetworkAnalyzer().load_data(paths["parquet"], columns=["node_id", "timestamp", "bandwidth", "latency",
+                                                                 "signal_strength", "uptime"])
+    analyzer = NetworkAnalyzer(model=RandomForestRegressor(n_estimators=20, min_samples_leaf=5,
+                                                           n_jobs=-1, random_state=0))
+    features, target = analyzer.preprocess_data(df.iloc[:MAX_TRAIN_ROWS])
+    analyzer.train_model(features, target)
+
+    with StubTelemetryServer(df) as server:
+        def drain():
+            stream = TelemetryStream(server.url, analyzer, page_size=INGEST_PAGE_ROWS, buffer_rows=rows)
+            asyncio.run(stream.run(until_caught_up=True))
+        # Fetch, parse, score and buffer every row; the stub's JSON encoding is included
+        return {"ingest.stream": measure(drain, repeat=max(repeat // 2, 1), items=rows)}
+
+
+def geo_benchmarks(paths: Dict[str, str], size: Dict[str, int], repeat: int) -> Dict[str, dict]:
+    schools = size["schools"]
+    geo = GeoProcessor()
+    results = {"geo.load_geo_data": measure(lambda: geo.load_geo_data(paths["geojson"], cache_dir=None),
+                                            repeat=repeat, items=schools)}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        geo.load_geo_data(paths["geojson"], cache_dir=cache_dir)
+        results["geo.load_geo_data.cached"] = measure(
+            lambda: geo.load_geo_data(paths["geojson"], cache_dir=cache_dir), repeat=repeat, items=schools)
+
+    gdf = geo.load_geo_data(paths["geojson"], cache_dir=None)
+    results["geo.suggest_node_placement"] = measure(lambda: geo.suggest_node_placement(gdf),
+                                                    repeat=repeat, items=schools)
+    nodes = geo.suggest_node_placement(gdf)
+    # The HTML render is part of what a user waits for, so it is included
+    results["geo.visualize_map"] = measure(lambda: geo.visualize_map(nodes).get_root().render(),
+                                           repeat=repeat, items=len(nodes))
+    return results
+
+
+def chat_benchmarks(size: Dict[str, int], repeat: int) -> Dict[str, dict]:
+    turns, messages = size["turns"], size["messages"]
+    question = "How can we reduce latency for rural schools on the northern links? " * 3
+    answer = "Consider adding relay nodes and rebalancing bandwidth between the busiest links. " * 6
+    state = {}
+
+    def fresh_manager():
+        state["manager"] = ConversationManager()
+
+    def add_turns():
+        manager = state["manager"]
+        for _ in range(turns):
+            manager.add_to_context(question, answer)
+
+    results = {"conversation.add_to_context": measure(add_turns, repeat=repeat, items=turns, setup=fresh_manager)}
+
+    full = ConversationManager()
+    for _ in range(turns):
+        full.add_to_context(question, answer)
+    results["conversation.render_prompt"] = measure(
+        lambda: [full.render_prompt(question) for _ in range(messages)], repeat=repeat, items=messages)
+
+    counter = itertools.count()
+    gemini = GeminiHandler("offline", backend=StubGenerationBackend(), cache=ResponseCache(maxsize=messages * 4))
+    weather = StubWeatherHandler(cache_ttl=3600)
+    manager = ConversationManager()
+
+    def dispatch(make_prompt: Callable[[int], str]):
+        async def run():
+            for _ in range(messages):
+                await process_message(make_prompt(next(counter)), None, gemini, weather, manager)
+        asyncio.run(run())
+
+    try:
+        results["chat.process_message.gemini"] = measure(
+            lambda: dispatch(lambda i: f"Summarize the outages of node {i}"), repeat=repeat, items=messages)
+        results["chat.process_message.gemini_cached"] = measure(
+            lambda: dispatch(lambda i: "Summarize the outages of node 0"), repeat=repeat, items=messages)
+        results["chat.process_message.weather"] = measure(
+            lambda: dispatch(lambda i: f"What is the weather in city{i}?"), repeat=repeat, items=messages)
+        results["chat.process_message.weather_cached"] = measure(
+            lambda: dispatch(lambda i: "What is the weather in Nairobi?"), repeat=repeat, items=messages)
+    finally:
+        weather.close()
+    return results
+
+
+def startup_benchmarks(repeat: int) -> Dict[str, dict]:
+    """Cold import of the app shell, and of the shell plus each page's subsystem, in fresh processes."""
+    results = {"startup.import_app": measure_cold_start("import app.main", repeat=repeat, cwd=REPO_ROOT)}
+    for page in APP_PAGES:
+        code = f"import app.main\napp.main.PAGES[{page!r}]()"
+        results[f"startup.page.{page}"] = measure_cold_start(code, repeat=repeat, cwd=REPO_ROOT)
+    return results
+
+
+def run_suite(sizes, repeat: int, only: str = None) -> Dict[str, dict]:
+    results = {}
+    if only is None or only == "startup":
+        # Independent of the dataset size
+        for name, stats in startup_benchmarks(repeat).items():
+            results[name] = stats
+            print(f"{name:<50} p50 {stats['p50_ms']:>10.2f} ms  p95 {stats['p95_ms']:>10.2f} ms  "
+                  f"max rss {stats['peak_mem_mb']:>8.1f} MB")
+        if only == "startup":
+            return results
+    for size_name in sizes:
+        size = SIZES[size_name]
+        print(f"== {size_name}: {size}")
+        with tempfile.TemporaryDirectory(prefix="nn_bench_") as data_dir:
+            paths = build_datasets(size, data_dir)
+            groups = {"analyzer": lambda: analyzer_benchmarks(paths, size, repeat),
+                      "ingest": lambda: ingest_benchmarks(paths, size, repeat),
+                      "geo": lambda: geo_benchmarks(paths, size, repeat),
+                      "chat": lambda: chat_benchmarks(size, repeat)}
+            for group, run in groups.items():
+                if only is not None and only != group:
+                    continue
+                for name, stats in run().items():
+                    key = f"{size_name}/{name}"
+                    results[key] = stats
+                    print(f"{key:<50} p50 {stats['p50_ms']:>10.2f} ms  p95 {stats['p95_ms']:>10.2f} ms  "
+                          f"{stats['throughput_per_s']:>14,.0f}/s  peak {stats['peak_mem_mb']:>8.1f} MB "
+                          f"(rss +{stats['peak_rss_growth_mb']:.1f} MB)")
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite.")
+    parser.add_argument("--sizes", nargs="+", default=["small"], choices=list(SIZES), help="Dataset sizes")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark")
+    parser.add_argument("--only", default=None, choices=GROUPS, help="Run one benchmark group")
+    parser.add_argument("--output", default="benchmarks/results.json", help="Where to write the results JSON")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Relative slowdown (or memory growth) reported as a regression")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Merge the current results into the baseline instead of comparing")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    results = run_suite(args.sizes, args.repeat, args.only)
+    meta = {"created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "sizes": args.sizes, "repeat": args.repeat, "environment": environment()}
+    write_results(args.output, results, meta)
+    print(f"Wrote {args.output}")
+
+    if args.update_baseline:
+        merged = load_results(args.baseline) if os.path.exists(args.baseline) else {}
+        merged.update(results)
+        write_results(args.baseline, merged, meta)
+        print(f"Updated baseline {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+        return 0
+    regressions = compare(results, load_results(args.baseline), args.threshold)
+    for r in regressions:
+        print(f"REGRESSION {r['benchmark']} {r['metric']}: {r['baseline']:.2f} -> {r['current']:.2f} "
+              f"(+{r['change']:.0%})")
+    if not regressions:
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+# benchmarks/stubs.py
+"""Offline stand-ins for the Gemini, OpenWeather and telemetry backends.
+
+They replace only the network round trip, so the handlers' own caching,
+coalescing, concurrency limiting and formatting are still what gets measured.
+The telemetry and weather stubs are real local HTTP servers, so the streaming
+ingestor's and the weather handler's clients, retries, caching and backpressure
+are exercised end to end.
+"""
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from utils.api_handler import GenerationBackend, WeatherHandler
+
+
+class StubGenerationBackend(GenerationBackend):
+    """Streams a canned answer in ``chunks`` pieces, ``chunk_delay`` seconds apart."""
+
+    def __init__(self, chunks: int = 8, chunk_delay: float = 0.0, chunk_text: str = "Network insight. "):
+        self.chunks = chunks
+        self.chunk_delay = chunk_delay
+        self.chunk_text = chunk_text
+        self.calls = 0
+
+    async def stream(self, contents: List[Any]) -> AsyncIterator[str]:
+        self.calls += 1
+        for _ in range(self.chunks):
+            if self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+            yield self.chunk_text
+
+
+class StubWeatherHandler(WeatherHandler):
+    """WeatherHandler whose HTTP request is replaced by a fixed-latency canned payload."""
+
+    def __init__(self, latency: float = 0.0, **kwargs):
+        super().__init__(api_key="offline", **kwargs)
+        self.latency = latency
+        self.requests = 0
+
+    async def _request(self, location: Union[str, Tuple[float, float]]) -> Dict[str, Any]:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        name = location if isinstance(location, str) else f"{location[0]:.2f},{location[1]:.2f}"
+        return {"name": name.title(), "weather": [{"description": "clear sky"}],
+                "main": {"temp": 21.5, "humidity": 40}}
+
+
+class _StubServer:
+    """Local aiohttp server on its own thread answering GET ``path`` with ``_handle``.
+
+    Use as a context manager; ``url`` is set once started and ``requests`` counts calls.
+    """
+
+    path = "/"
+
+    def __init__(self):
+        self.requests = 0
+        self.url: Optional[str] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner = None
+
+    def __enter__(self):
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name=f"{type(self).__name__}", daemon=True).start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        return self
+
+    def __exit__(self, *exc):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    async def _start(self):
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get(self.path, self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://127.0.0.1:{port}{self.path}"
+
+    async def _handle(self, request):
+        raise NotImplementedError
+
+
+class StubWeatherServer(_StubServer):
+    """Local HTTP stand-in for the OpenWeather current-weather endpoint.
+
+    Answers ``q=<city>`` or ``lat``/``lon`` queries with a canned payload after
+    ``latency`` seconds; cities in ``unknown_cities`` get a 404 like the real API.
+    """
+
+    path = "/weather"
+
+    def __init__(self, latency: float = 0.0, unknown_cities: Tuple[str, ...] = ()):
+        super().__init__()
+        self.latency = latency
+        self.unknown_cities = {city.lower() for city in unknown_cities}
+
+    async def _handle(self, request):
+        from aiohttp import web
+
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        name = request.query.get("q") or f"{request.query['lat']},{request.query['lon']}"
+        if name.lower() in self.unknown_cities:
+            return web.json_response({"cod": "404", "message": "city not found"}, status=404)
+        return web.json_response({"name": name.title(), "weather": [{"description": "clear sky"}],
+                                  "main": {"temp": 21.5, "humidity": 40}})
+
+
+class StubTelemetryServer(_StubServer):
+    """Local HTTP telemetry source serving ``rows`` in cursor-paginated pages.
+
+    Speaks the protocol ``TelemetryStream`` expects. ``fail_every`` makes every
+    n-th request answer 503, to exercise retries; ``latency`` delays each page.
+    Runs on its own thread; use as a context manager, ``url`` is set once started.
+    """
+
+    path = "/telemetry"
+
+    def __init__(self, rows: pd.DataFrame, latency: float = 0.0, fail_every: int = 0):
+        super().__init__()
+        self.rows = rows
+        self.latency = latency
+        self.fail_every = fail_every
+        self._columns = {col: rows[col].astype(str).tolist() if col == "timestamp" else rows[col].tolist()
+                         for col in rows.columns}
+
+    async def _handle(self, request):
+        from aiohttp import web
+
+        self.requests += 1
+        if self.fail_every and self.requests % self.fail_every == 0:
+            return web.json_response({"error": "unavailable"}, status=503)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        start = int(request.query.get("cursor", 0))
+        end = min(start + int(request.query.get("limit", 1000)), len(self.rows))
+        return web.json_response({
+            "rows": {col: values[start:end] for col, values in self._columns.items()},
+            "next_cursor": end,
+            "has_more": end < len(self.rows),
+        })
@@ -1,42 +1,223 @@
 # config/settings.py
+"""Application settings, parsed once from the environment into an immutable object.
+
+``get_settings()`` loads ``.env``, reads and validates every setting on first use
+and returns a frozen ``Settings``; importing this module has no side effects.
+The upper-case module attributes (``from config.settings import MODEL_PATH``)
+still work and resolve lazily to the fields of that same object.
+"""
+import logging
 import os
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
-
-# API Keys
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")
-
-# Gemini Model Configuration
-GEMINI_MODEL = "gemini-1.5-pro"  # Adjust based on available models
-
-# Context Manager Configuration
-MAX_CONTEXT_LENGTH = int(os.getenv("MAX_CONTEXT_LENGTH", 10))
-
-# Allowed File Types for Upload
-ALLOWED_FILE_TYPES = [
-    'png', 'jpg', 'jpeg', 'gif', 'bmp',           # Images
-    'pdf', 'doc', 'docx', 'txt', 'rtf',           # Documents
-    'mp3', 'wav', 'ogg',                          # Audio
-    'mp4', 'avi', 'mov', 'mkv',                   # Video
-    'csv', 'geojson'                              # Data files for hackathon
-]
-
-# Temporary Upload Directory
-TEMP_UPLOAD_DIR = os.getenv("TEMP_UPLOAD_DIR", os.path.join(os.path.expanduser("~"), "temp_uploads"))
-if not os.path.exists(TEMP_UPLOAD_DIR):
-    os.makedirs(TEMP_UPLOAD_DIR)
-
-# Maximum File Size (10MB)
-MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", 10 * 1024 * 1024))
-
-# Logging Configuration (optional, can be set in main app)
-LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
-
-# Validate critical settings
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY is not set in .env file")
-if not WEATHER_API_KEY:
-    raise ValueError("WEATHER_API_KEY is not set in .env file")
\ No newline at end of file
+from dataclasses import dataclass, fields
+from functools import lru_cache
+from typing import List, Mapping, Optional, Tuple
+
+CONVERSATION_STORES = ("memory", "sqlite", "redis")
+
+
+class ConfigError(ValueError):
+    """One or more settings are missing or invalid; ``problems`` lists each of them."""
+
+    def __init__(self, problems: List[str]):
+        super().__init__("Invalid settings: " + "; ".join(problems))
+        self.problems = list(problems)
+
+
+@dataclass(frozen=True)
+class Settings:
+    # API Keys
+    gemini_api_key: str
+    weather_api_key: str
+
+    # Weather API (override the URL to point at a local stub server)
+    weather_api_url: str = "https://api.openweathermap.org/data/2.5/weather"
+    weather_cache_ttl: int = 600  # seconds
+
+    # Gemini Model Configuration
+    gemini_model: str = "gemini-1.5-pro"  # Adjust based on available models
+    gemini_max_concurrency: int = 4  # in-flight calls per process
+    gemini_timeout: float = 60.0  # seconds per call
+    gemini_max_retries: int = 3
+
+    # Gemini response cache (set RESPONSE_CACHE_PATH to a .sqlite file to persist/share it)
+    response_cache_size: int = 1024
+    response_cache_ttl: int = 24 * 60 * 60  # seconds
+    response_cache_path: str = ""
+
+    # Pre-trained network model artifact (legacy .pkl pickles still load)
+    model_path: str = "data/models/network_predictor.joblib"
+    # Training-data hash the model must match (printed by train_model.py; empty: not checked)
+    model_data_hash: str = ""
+
+    # Node placement (MAX_NODES 0/unset: as many as needed for full coverage)
+    node_coverage_radius_km: float = 5.0
+    max_nodes: Optional[int] = None
+
+    # Directory for persisted spatial indexes (empty: keep them in memory only)
+    spatial_index_dir: str = ""
+
+    # Map rendering: individual markers up to the threshold, clustering up to MAP_MAX_POINTS, then binning
+    map_cluster_threshold: int = 200
+    map_max_points: int = 20000
+
+    # Context Manager Configuration
+    max_context_length: int = 10  # turns kept in full
+    max_context_tokens: int = 2000  # budget for full turns
+    max_summary_tokens: int = 500  # budget for compacted older turns
+
+    # Conversation history store: "memory", "sqlite" or "redis"
+    conversation_store: str = "memory"
+    conversation_db_path: str = "data/conversations.sqlite"
+    redis_url: str = "redis://localhost:6379/0"
+    conversation_page_size: int = 20  # messages rendered per page
+    # Key signing the ?session= token in the URL; set it when several workers must resume the same
+    # history (empty: a random key per process)
+    session_secret: str = ""
+
+    # Allowed File Types for Upload (ALLOWED_FILE_TYPES is a comma-separated list)
+    allowed_file_types: Tuple[str, ...] = (
+        'png', 'jpg', 'jpeg', 'gif', 'bmp',           # Images
+        'pdf', 'doc', 'docx', 'txt', 'rtf',           # Documents
+        'mp3', 'wav', 'ogg',                          # Audio
+        'mp4', 'avi', 'mov', 'mkv',                   # Video
+        'csv', 'geojson'                              # Data files for hackathon
+    )
+
+    # Temporary Upload Directory (created on first use, see ensure_upload_dir)
+    temp_upload_dir: str = os.path.join(os.path.expanduser("~"), "temp_uploads")
+
+    # Directory for GeoParquet copies of uploaded GeoJSON, keyed by content hash
+    # (defaults to TEMP_UPLOAD_DIR/geo_cache; set empty to disable)
+    geo_cache_dir: str = ""
+
+    # Maximum File Size (10MB)
+    max_file_size: int = 10 * 1024 * 1024
+
+    # Uploads are kept content-addressed under TEMP_UPLOAD_DIR/uploads, pruned oldest-first beyond this size
+    upload_store_max_bytes: int = 1024 * 1024 * 1024
+
+    # Background workers for upload analysis (training, scoring, node placement)
+    analysis_workers: int = 2
+    # Memory budget for memoized analysis results (predictions, KPI tables, retrained models)
+    analysis_results_max_bytes: int = 512 * 1024 * 1024
+
+    # Streaming telemetry ingestion (empty TELEMETRY_SOURCE_URL disables it; see utils/data_fetcher.py)
+    telemetry_source_url: str = ""
+    telemetry_api_key: str = ""
+    telemetry_page_size: int = 1000
+    telemetry_poll_interval: float = 5.0  # seconds between polls once the source is drained
+    telemetry_queue_pages: int = 8  # fetched pages waiting to be scored before fetching pauses
+    telemetry_buffer_rows: int = 100_000  # newest rows kept in memory
+
+    # Logging Configuration (optional, can be set in main app)
+    log_level: str = "INFO"
+
+    # Diagnostics: Prometheus/JSON metrics endpoint (0 disables it) and the Diagnostics mode
+    metrics_port: int = 0
+    diagnostics_enabled: bool = False
+
+    @classmethod
+    def from_env(cls, env: Mapping[str, str] = None) -> "Settings":
+        """Build settings from the environment variables named like the fields, upper-cased."""
+        env = os.environ if env is None else env
+        values, errors = {}, []
+        for field in fields(cls):
+            raw = env.get(field.name.upper())
+            if raw is None or (raw == "" and field.type is not str):
+                continue
+            try:
+                values[field.name] = _parse(field.type, raw)
+            except ValueError:
+                errors.append(f"{field.name.upper()}={raw!r} is not a valid {_type_name(field.type)}")
+
+        if values.get("max_nodes") == 0:
+            values["max_nodes"] = None
+        if "GEO_CACHE_DIR" not in env:
+            values["geo_cache_dir"] = os.path.join(values.get("temp_upload_dir", cls.temp_upload_dir), "geo_cache")
+        values.setdefault("gemini_api_key", "")
+        values.setdefault("weather_api_key", "")
+        try:
+            settings = cls(**values)
+        except ConfigError as e:
+            # Report values that failed to parse together with those that failed validation
+            raise ConfigError(errors + e.problems) from None
+        if errors:
+            raise ConfigError(errors)
+        return settings
+
+    def __post_init__(self):
+        # Validate critical settings, reporting every problem at once
+        errors = []
+        if not self.gemini_api_key:
+            errors.append("GEMINI_API_KEY is not set in .env file")
+        if not self.weather_api_key:
+            errors.append("WEATHER_API_KEY is not set in .env file")
+        for name in ("gemini_max_concurrency", "gemini_timeout", "response_cache_size", "node_coverage_radius_km",
+                     "max_context_length", "max_context_tokens", "conversation_page_size", "max_file_size",
+                     "upload_store_max_bytes", "analysis_workers", "analysis_results_max_bytes", "telemetry_page_size", "telemetry_queue_pages",
+                     "telemetry_buffer_rows"):
+            if getattr(self, name) <= 0:
+                errors.append(f"{name.upper()} must be positive")
+        for name in ("weather_cache_ttl", "gemini_max_retries", "response_cache_ttl", "map_cluster_threshold",
+                     "map_max_points", "max_summary_tokens", "telemetry_poll_interval"):
+            if getattr(self, name) < 0:
+                errors.append(f"{name.upper()} must not be negative")
+        if self.max_nodes is not None and self.max_nodes < 0:
+            errors.append("MAX_NODES must not be negative")
+        if self.conversation_store not in CONVERSATION_STORES:
+            errors.append(f"CONVERSATION_STORE must be one of {', '.join(CONVERSATION_STORES)}")
+        if not 0 <= self.metrics_port <= 65535:
+            errors.append("METRICS_PORT must be between 0 and 65535")
+        if not isinstance(logging.getLevelName(self.log_level.upper()), int):
+            errors.append(f"LOG_LEVEL {self.log_level!r} is not a logging level")
+        if errors:
+            raise ConfigError(errors)
+
+    def ensure_upload_dir(self) -> str:
+        """Create the temporary upload directory if needed and return its path."""
+        os.makedirs(self.temp_upload_dir, exist_ok=True)
+        return self.temp_upload_dir
+
+
+def _parse(annotation, raw: str):
+    if annotation in (int, Optional[int]):
+        return int(raw)
+    if annotation is float:
+        return float(raw)
+    if annotation is bool:
+        if raw.lower() in ("1", "true", "yes", "on"):
+            return True
+        if raw.lower() in ("0", "false", "no", "off"):
+            return False
+        raise ValueError(raw)
+    if annotation == Tuple[str, ...]:
+        return tuple(item.strip().lower() for item in raw.split(",") if item.strip())
+    return raw
+
+
+def _type_name(annotation) -> str:
+    return {int: "integer", Optional[int]: "integer", float: "number", bool: "boolean"}.get(annotation, "value")
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """The process-wide settings, read from ``.env`` and the environment on first call."""
+    from dotenv import load_dotenv
+
+    # Load environment variables from .env file
+    load_dotenv()
+    return Settings.from_env()
+
+
+_SETTING_NAMES = frozenset(field.name.upper() for field in fields(Settings))
+
+
+def __getattr__(name: str):
+    # Compatibility with the former module constants: MODEL_PATH -> get_settings().model_path
+    if name in _SETTING_NAMES:
+        return getattr(get_settings(), name.lower())
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted([*globals(), *_SETTING_NAMES])
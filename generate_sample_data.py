@@ -1,97 +1,310 @@
 # generate_sample_data.py
-import pandas as pd
-import numpy as np
-import geopandas as gpd
-from shapely.geometry import Point
+"""Synthetic network telemetry and school locations, from sample to benchmark scale.
+
+Every dataset is generated in fixed-size chunks. Each chunk has its own
+``np.random.Generator``, spawned from a ``SeedSequence`` keyed on the seed, the
+dataset and the scenario. Output is therefore reproducible for a given seed and
+chunk size, whatever the number of worker processes. Chunks are generated with
+vectorized NumPy/shapely calls in a process pool and streamed to disk in order, so
+memory stays bounded by a few chunks even for 10M+ rows.
+
+Run without arguments to (re)create the small sample files in
+data/sample_network_data; see ``--help`` for benchmark-sized output, e.g.::
+
+    python generate_sample_data.py --rows 10000000 --schools 1000000 \\
+        --scenarios mixed urban --formats parquet geoparquet --out-dir data/benchmark
+"""
+import argparse
+import json
 import os
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+import pyproj
+import shapely
+
+SAMPLE_DIR = "data/sample_network_data"
+DEFAULT_CHUNK_ROWS = 500_000
+TELEMETRY_START = np.datetime64("2024-01-01T00:00:00", "s")
+TELEMETRY_INTERVAL_S = 300  # one reading per node every 5 minutes
+
+# Rural: low bandwidth, high latency, weaker signal; urban: the opposite; mixed: varied
+NETWORK_SCENARIOS = {
+    "rural": {"num_rows": 50, "bandwidth_range": (1, 20), "latency_range": (100, 300),
+              "signal_range": (20, 60), "uptime_range": (0.7, 0.9)},
+    "urban": {"num_rows": 50, "bandwidth_range": (50, 100), "latency_range": (10, 50),
+              "signal_range": (80, 100), "uptime_range": (0.9, 1.0)},
+    "mixed": {"num_rows": 100, "bandwidth_range": (5, 80), "latency_range": (20, 200),
+              "signal_range": (30, 90), "uptime_range": (0.75, 0.98)},
+}
+
+# Rural: sparse locations near the equator in Eastern Africa; urban: a dense city-like cluster (New York)
+GEO_SCENARIOS = {
+    "rural": {"num_locations": 10, "lat_range": (-5, 5), "lon_range": (20, 30), "population_range": (50, 200)},
+    "urban": {"num_locations": 30, "lat_range": (40, 41), "lon_range": (-74, -73), "population_range": (200, 1000)},
+}
+
+WGS84_PROJJSON = pyproj.CRS.from_epsg(4326).to_json_dict()
+
+
+def chunk_seeds(seed: int, dataset: str, n_chunks: int) -> List[np.random.SeedSequence]:
+    """Independent, reproducible seed per chunk; different datasets never share a stream."""
+    root = np.random.SeedSequence([seed, zlib.crc32(dataset.encode())])
+    return root.spawn(n_chunks)
+
+
+def _chunk_bounds(total: int, chunk_rows: int) -> List[Tuple[int, int]]:
+    return [(start, min(chunk_rows, total - start)) for start in range(0, total, chunk_rows)]
+
+
+def _sequential_names(prefix: str, start: int, rows: int) -> pa.Array:
+    numbers = pc.cast(pa.array(np.arange(start + 1, start + rows + 1)), pa.string())
+    return pc.binary_join_element_wise(prefix, numbers, "")
+
+
+# 1. Network telemetry
+def network_chunk(seed: np.random.SeedSequence, start: int, rows: int, ranges: Dict[str, tuple],
+                  num_nodes: int) -> pa.Table:
+    """One chunk of telemetry rows; row ``i`` is node ``i % num_nodes`` at reading ``i // num_nodes``."""
+    rng = np.random.default_rng(seed)
+    index = np.arange(start, start + rows)
+    node_codes = (index % num_nodes).astype(np.int32)
+    node_names = _sequential_names("Node_", 0, num_nodes)
+    timestamps = TELEMETRY_START + (index // num_nodes) * np.timedelta64(TELEMETRY_INTERVAL_S, "s")
+
+    def uniform(low_high):
+        return rng.uniform(low_high[0], low_high[1], rows)
+
+    return pa.table({
+        "node_id": pa.DictionaryArray.from_arrays(node_codes, node_names),
+        "timestamp": pa.array(timestamps),
+        "bandwidth": uniform(ranges["bandwidth_range"]),  # Mbps
+        "latency": uniform(ranges["latency_range"]),  # ms
+        "signal_strength": uniform(ranges["signal_range"]),  # dBm
+        "uptime": uniform(ranges["uptime_range"]),  # Fraction
+    })
+
+
+# 2. School locations
+def school_chunk(seed: np.random.SeedSequence, start: int, rows: int, ranges: Dict[str, tuple]) -> pa.Table:
+    """One chunk of school points, geometry as WKB built with a single ``shapely.points`` call."""
+    rng = np.random.default_rng(seed)
+    lats = rng.uniform(ranges["lat_range"][0], ranges["lat_range"][1], rows)
+    lons = rng.uniform(ranges["lon_range"][0], ranges["lon_range"][1], rows)
+    population = rng.integers(ranges["population_range"][0], ranges["population_range"][1], rows)
+    return pa.table({
+        "name": _sequential_names("School_", start, rows),
+        "population": population,
+        "lon": lons,
+        "lat": lats,
+        "geometry": pa.array(shapely.to_wkb(shapely.points(lons, lats)), type=pa.binary()),
+    })
 
-# Ensure the directory exists
-os.makedirs("data/sample_network_data", exist_ok=True)
+
+def _run_chunk(task):
+    fn, args = task
+    return fn(*args)
+
+
+def _ordered(tasks: Sequence[tuple], executor: Optional[Executor], window: int) -> Iterator[pa.Table]:
+    """Results in task order, with at most ``window`` chunks in flight."""
+    if executor is None:
+        for task in tasks:
+            yield _run_chunk(task)
+        return
+    pending = deque()
+    for task in tasks:
+        pending.append(executor.submit(_run_chunk, task))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class _ChunkWriter:
+    """Streams Arrow chunks to CSV, Parquet, GeoJSON or GeoParquet."""
+
+    def __init__(self, path: str, fmt: str):
+        self.path = path
+        self.fmt = fmt
+        self._tmp_path = f"{path}.tmp"
+        self._writer = None
+        self._file = None
+        self._first_feature = True
+
+    def write(self, table: pa.Table):
+        if self.fmt == "csv":
+            table = table.drop_columns([c for c in ("lon", "lat", "geometry") if c in table.column_names])
+            if self._writer is None:
+                self._writer = pa_csv.CSVWriter(self._tmp_path, table.schema,
+                                                write_options=pa_csv.WriteOptions(quoting_style="needed"))
+            self._writer.write_table(table)
+        elif self.fmt in ("parquet", "geoparquet"):
+            table = self._parquet_table(table)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self._tmp_path, table.schema, compression="zstd")
+            self._writer.write_table(table)
+        elif self.fmt == "geojson":
+            self._write_geojson(table)
+        else:
+            raise ValueError(f"Unsupported format: {self.fmt}")
+
+    def _parquet_table(self, table: pa.Table) -> pa.Table:
+        if "geometry" not in table.column_names:
+            # float32 halves the size and is what the analyzer reads anyway
+            return table.cast(pa.schema([
+                pa.field(f.name, pa.float32() if pa.types.is_floating(f.type) else f.type)
+                for f in table.schema]))
+        table = table.drop_columns(["lon", "lat"])
+        geo = {"version": "1.0.0", "primary_column": "geometry",
+               "columns": {"geometry": {"encoding": "WKB", "geometry_types": ["Point"], "crs": WGS84_PROJJSON}}}
+        return table.replace_schema_metadata({b"geo": json.dumps(geo).encode()})
+
+    def _write_geojson(self, table: pa.Table):
+        if self._file is None:
+            self._file = open(self._tmp_path, "w")
+            self._file.write('{"type": "FeatureCollection", "crs": {"type": "name", "properties": '
+                             '{"name": "urn:ogc:def:crs:OGC:1.3:CRS84"}}, "features": [\n')
+        columns = [table.column(c).to_pylist() for c in ("name", "population", "lon", "lat")]
+        features = ",\n".join(
+            f'{{"type": "Feature", "properties": {{"name": "{name}", "population": {population}}}, '
+            f'"geometry": {{"type": "Point", "coordinates": [{lon:.6f}, {lat:.6f}]}}}}'
+            for name, population, lon, lat in zip(*columns))
+        if features:
+            self._file.write(features if self._first_feature else ",\n" + features)
+            self._first_feature = False
+
+    def close(self, commit: bool):
+        """Finish the output and, with ``commit``, publish it at ``path``; otherwise discard it."""
+        try:
+            if self._writer is not None:
+                self._writer.close()
+            if self._file is not None:
+                if commit:
+                    self._file.write("\n]}\n")
+                self._file.close()
+            if commit and os.path.exists(self._tmp_path):
+                os.replace(self._tmp_path, self.path)
+        finally:
+            # A failed or interrupted run must not leave a truncated (but valid-looking) dataset behind
+            if os.path.exists(self._tmp_path):
+                os.unlink(self._tmp_path)
+
+
+def _generate(paths: Dict[str, str], tasks: Sequence[tuple], workers: int):
+    writers = [_ChunkWriter(path, fmt) for fmt, path in paths.items()]
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    completed = False
+    try:
+        for table in _ordered(tasks, executor, window=max(workers, 1) * 2):
+            for writer in writers:
+                writer.write(table)
+        completed = True
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        for writer in writers:
+            writer.close(commit=completed)
 
 
-# 1. Generate Network Stats CSVs
 def generate_network_stats(filename: str, num_rows: int, bandwidth_range: tuple, latency_range: tuple,
-                           signal_range: tuple, uptime_range: tuple):
-    """Generate a CSV with network performance data."""
-    np.random.seed(42)  # For reproducibility
-    data = {
-        "node_id": [f"Node_{i + 1}" for i in range(num_rows)],
-        "bandwidth": np.random.uniform(bandwidth_range[0], bandwidth_range[1], num_rows),  # Mbps
-        "latency": np.random.uniform(latency_range[0], latency_range[1], num_rows),  # ms
-        "signal_strength": np.random.uniform(signal_range[0], signal_range[1], num_rows),  # dBm
-        "uptime": np.random.uniform(uptime_range[0], uptime_range[1], num_rows)  # Percentage
-    }
-    df = pd.DataFrame(data)
-    df.to_csv(f"data/sample_network_data/{filename}", index=False)
-    print(f"Generated {filename}")
-
-
-# 2. Generate Geospatial GeoJSONs
+                           signal_range: tuple, uptime_range: tuple, write_parquet: bool = True,
+                           out_dir: str = SAMPLE_DIR, seed: int = 42, num_nodes: Optional[int] = None,
+                           chunk_rows: int = DEFAULT_CHUNK_ROWS, workers: int = 1, write_csv: bool = True):
+    """Generate network telemetry as CSV and/or a float32 Parquet copy.
+
+    ``num_nodes`` nodes report every five minutes (default: one reading per node,
+    capped at 10,000 nodes so large datasets become per-node time series).
+    """
+    ranges = {"bandwidth_range": bandwidth_range, "latency_range": latency_range,
+              "signal_range": signal_range, "uptime_range": uptime_range}
+    num_nodes = num_nodes or min(num_rows, 10_000)
+    bounds = _chunk_bounds(num_rows, chunk_rows)
+    seeds = chunk_seeds(seed, f"network:{filename}", len(bounds))
+    tasks = [(network_chunk, (chunk_seed, start, rows, ranges, num_nodes))
+             for chunk_seed, (start, rows) in zip(seeds, bounds)]
+
+    base = os.path.join(out_dir, os.path.splitext(filename)[0])
+    paths = {}
+    if write_csv:
+        paths["csv"] = f"{base}.csv"
+    if write_parquet:
+        paths["parquet"] = f"{base}.parquet"
+    _generate(paths, tasks, workers)
+    for path in paths.values():
+        print(f"Generated {path}")
+
+
 def generate_geo_data(filename: str, num_locations: int, lat_range: tuple, lon_range: tuple,
-                      population_range: tuple):
-    """Generate a GeoJSON with school locations."""
-    np.random.seed(42)
-    lats = np.random.uniform(lat_range[0], lat_range[1], num_locations)
-    lons = np.random.uniform(lon_range[0], lon_range[1], num_locations)
-    points = [Point(lon, lat) for lon, lat in zip(lons, lats)]
-
-    gdf = gpd.GeoDataFrame(
-        {"name": [f"School_{i + 1}" for i in range(num_locations)],
-         "population": np.random.randint(population_range[0], population_range[1], num_locations)},
-        geometry=points,
-        crs="EPSG:4326"
-    )
-    gdf.to_file(f"data/sample_network_data/{filename}", driver="GeoJSON")
-    print(f"Generated {filename}")
+                      population_range: tuple, out_dir: str = SAMPLE_DIR, seed: int = 42,
+                      chunk_rows: int = DEFAULT_CHUNK_ROWS, workers: int = 1, write_geojson: bool = True,
+                      write_geoparquet: bool = False):
+    """Generate school locations as GeoJSON and/or GeoParquet."""
+    ranges = {"lat_range": lat_range, "lon_range": lon_range, "population_range": population_range}
+    bounds = _chunk_bounds(num_locations, chunk_rows)
+    seeds = chunk_seeds(seed, f"geo:{filename}", len(bounds))
+    tasks = [(school_chunk, (chunk_seed, start, rows, ranges)) for chunk_seed, (start, rows) in zip(seeds, bounds)]
+
+    base = os.path.join(out_dir, os.path.splitext(filename)[0])
+    paths = {}
+    if write_geojson:
+        paths["geojson"] = f"{base}.geojson"
+    if write_geoparquet:
+        paths["geoparquet"] = f"{base}.parquet"
+    _generate(paths, tasks, workers)
+    for path in paths.values():
+        print(f"Generated {path}")
+
+
+def _timed(label: str, fn: Callable, *args, **kwargs):
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    print(f"  {label} took {time.perf_counter() - start:.1f}s")
 
 
 if __name__ == "__main__":
-    # Network Stats Scenarios
-    # Rural: Low bandwidth, high latency, weaker signal
-    generate_network_stats(
-        "network_stats_rural.csv",
-        num_rows=50,
-        bandwidth_range=(1, 20),
-        latency_range=(100, 300),
-        signal_range=(20, 60),
-        uptime_range=(0.7, 0.9)
-    )
-
-    # Urban: High bandwidth, low latency, strong signal
-    generate_network_stats(
-        "network_stats_urban.csv",
-        num_rows=50,
-        bandwidth_range=(50, 100),
-        latency_range=(10, 50),
-        signal_range=(80, 100),
-        uptime_range=(0.9, 1.0)
-    )
-
-    # Mixed: Varied conditions
-    generate_network_stats(
-        "network_stats_mixed.csv",
-        num_rows=100,
-        bandwidth_range=(5, 80),
-        latency_range=(20, 200),
-        signal_range=(30, 90),
-        uptime_range=(0.75, 0.98)
-    )
-
-    # Geospatial Scenarios
-    # Rural: Sparse locations (e.g., rural Africa)
-    generate_geo_data(
-        "school_locations_rural.geojson",
-        num_locations=10,
-        lat_range=(-5, 5),  # Near equator
-        lon_range=(20, 30),  # Eastern Africa
-        population_range=(50, 200)
-    )
-
-    # Urban: Dense locations (e.g., city-like cluster)
-    generate_geo_data(
-        "school_locations_urban.geojson",
-        num_locations=30,
-        lat_range=(40, 41),  # Near a city (e.g., New York latitude)
-        lon_range=(-74, -73),  # New York longitude
-        population_range=(200, 1000)
-    )
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate synthetic network telemetry and school locations.")
+    parser.add_argument("--out-dir", default=SAMPLE_DIR, help="Output directory")
+    parser.add_argument("--rows", type=int, default=None,
+                        help="Telemetry rows per network scenario (default: small sample sizes)")
+    parser.add_argument("--nodes", type=int, default=None, help="Distinct node_ids per network scenario")
+    parser.add_argument("--schools", type=int, default=None,
+                        help="School locations per geo scenario (default: small sample sizes)")
+    parser.add_argument("--scenarios", nargs="+", default=None,
+                        help=f"Subset of scenarios (network: {', '.join(NETWORK_SCENARIOS)}; "
+                             f"geo: {', '.join(GEO_SCENARIOS)})")
+    parser.add_argument("--formats", nargs="+", default=["csv", "parquet", "geojson"],
+                        choices=["csv", "parquet", "geojson", "geoparquet"], help="Output formats")
+    parser.add_argument("--seed", type=int, default=42, help="Root seed")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Rows generated per chunk")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Generator processes")
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    common = {"out_dir": args.out_dir, "seed": args.seed, "chunk_rows": args.chunk_rows, "workers": args.workers}
+
+    if "csv" in args.formats or "parquet" in args.formats:
+        for name, params in NETWORK_SCENARIOS.items():
+            if args.scenarios and name not in args.scenarios:
+                continue
+            params = {**params, "num_rows": args.rows or params["num_rows"]}
+            _timed(f"network_stats_{name}", generate_network_stats, f"network_stats_{name}.csv", **params,
+                   write_csv="csv" in args.formats, write_parquet="parquet" in args.formats,
+                   num_nodes=args.nodes, **common)
+
+    if "geojson" in args.formats or "geoparquet" in args.formats:
+        for name, params in GEO_SCENARIOS.items():
+            if args.scenarios and name not in args.scenarios:
+                continue
+            params = {**params, "num_locations": args.schools or params["num_locations"]}
+            _timed(f"school_locations_{name}", generate_geo_data, f"school_locations_{name}.geojson", **params,
+                   write_geojson="geojson" in args.formats, write_geoparquet="geoparquet" in args.formats,
+                   **common)
@@ -0,0 +1,8 @@
+# tests/conftest.py
+import os
+import sys
+
+# Settings validate the API keys on first use; nothing under test calls the real APIs
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("WEATHER_API_KEY", "test")
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
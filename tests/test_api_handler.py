@@ -0,0 +1,178 @@
+# tests/test_api_handler.py
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.api_handler import (GeminiBackend, GeminiHandler, GenerationBackend, GenerationError, WeatherError,
+                               WeatherHandler)
+from utils.cache import ResponseCache
+
+
+class FakeBackend(GenerationBackend):
+    """Streams ``chunks`` after ``delay`` seconds each; fails with ``failures`` first."""
+
+    retryable_exceptions = (ConnectionError,)
+
+    def __init__(self, chunks=("Hello", " world"), delay=0.0, failures=0):
+        self.chunks = chunks
+        self.delay = delay
+        self.failures = failures
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+
+    async def stream(self, contents):
+        self.calls += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("unavailable")
+            for chunk in self.chunks:
+                await asyncio.sleep(self.delay)
+                yield chunk
+        finally:
+            self.active -= 1
+
+
+def _handler(backend, **kwargs):
+    return GeminiHandler("test", backend=backend, cache=ResponseCache(maxsize=16), **kwargs)
+
+
+def test_backend_must_implement_stream():
+    with pytest.raises(TypeError):
+        GenerationBackend()
+
+
+def test_streams_and_caches_response():
+    backend = FakeBackend()
+    handler = _handler(backend)
+    assert asyncio.run(handler.generate_response("hi")) == "Hello world"
+    assert asyncio.run(handler.generate_response("hi")) == "Hello world"
+    assert backend.calls == 1
+
+
+def test_retries_retryable_errors(monkeypatch):
+    monkeypatch.setattr("utils.api_handler.random.random", lambda: -1.0)  # no backoff delay
+    backend = FakeBackend(failures=2)
+    assert asyncio.run(_handler(backend).generate_response("hi")) == "Hello world"
+    assert backend.calls == 3
+
+
+def test_caps_concurrent_calls():
+    backend = FakeBackend(delay=0.01)
+    handler = _handler(backend, max_concurrency=2)
+
+    async def ask_many():
+        return await asyncio.gather(*(handler.generate_response(f"question {i}") for i in range(6)))
+
+    assert asyncio.run(ask_many()) == ["Hello world"] * 6
+    assert backend.max_active == 2
+
+
+def test_timeout_releases_slot():
+    handler = _handler(FakeBackend(delay=1.0), max_concurrency=1, timeout=0.05, max_retries=0)
+    with pytest.raises(GenerationError):
+        asyncio.run(handler.generate_response("slow"))
+    handler.backend = FakeBackend()
+    assert asyncio.run(handler.generate_response("fast")) == "Hello world"
+
+
+def test_slot_is_shared_across_event_loops():
+    handler = _handler(FakeBackend(delay=0.05), max_concurrency=1)
+    results = []
+    threads = [threading.Thread(target=lambda i=i: results.append(asyncio.run(handler.generate_response(f"q{i}"))))
+               for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["Hello world"] * 3
+    assert handler.backend.max_active == 1
+
+
+class SlowSdkModel:
+    """Stands in for the Gemini SDK model: a blocking iterator of chunks."""
+
+    def __init__(self, chunks=20, delay=0.02):
+        self.chunks = chunks
+        self.delay = delay
+        self.produced = 0
+
+    def generate_content(self, contents, stream=False, request_options=None):
+        for _ in range(self.chunks):
+            time.sleep(self.delay)
+            self.produced += 1
+            yield type("Chunk", (), {"text": "x"})()
+
+
+def test_abandoned_sdk_call_stops_producing():
+    backend = GeminiBackend("test", max_workers=1)
+    backend._model = SlowSdkModel()
+    handler = _handler(backend, timeout=0.05, max_retries=0)
+    with pytest.raises(GenerationError):
+        asyncio.run(handler.generate_response("slow"))
+    time.sleep(0.1)
+    produced = backend._model.produced
+    time.sleep(0.1)
+    assert backend._model.produced == produced < backend._model.chunks
+
+
+def test_partial_weather_payload_raises_weather_error(monkeypatch):
+    async def fetch(location):
+        return {"name": "Lahore", "weather": []}
+
+    handler = WeatherHandler("test")
+    monkeypatch.setattr(handler, "_fetch", fetch)
+    try:
+        with pytest.raises(WeatherError):
+            handler.get_weather_info("weather in Lahore")
+    finally:
+        handler.close()
+
+
+@pytest.fixture
+def weather_server():
+    pytest.importorskip("aiohttp")
+    from benchmarks.stubs import StubWeatherServer
+
+    with StubWeatherServer(latency=0.2, unknown_cities=("atlantis",)) as server:
+        yield server
+
+
+@pytest.fixture
+def weather(weather_server):
+    handler = WeatherHandler("test", base_url=weather_server.url, cache_ttl=60)
+    yield handler
+    handler.close()
+
+
+def test_weather_lookups_are_cached(weather_server, weather):
+    assert weather.get_weather_info("weather in Lahore") == weather.get_weather_info("What's the weather in lahore?")
+    assert weather_server.requests == 1
+    assert weather.cache_stats()["hits"] == 1
+
+
+def test_concurrent_identical_lookups_share_one_request(weather_server, weather):
+    results = asyncio.run(weather.get_weather_batch(["Lahore"] * 5 + [(31.5204, 74.3587)] * 3))
+    assert results[:5] == [results[0]] * 5 and results[0]["name"] == "Lahore"
+    assert weather_server.requests == 2
+
+
+def test_weather_batch_returns_none_for_failed_lookups(weather_server, weather):
+    results = asyncio.run(weather.get_weather_batch(["Lahore", "Atlantis", (33.68, 73.05)]))
+    assert results[0]["name"] == "Lahore" and results[2] is not None
+    assert results[1] is None
+
+
+def test_cancelled_lookup_does_not_strand_coalesced_callers(weather_server, weather):
+    first = weather._submit(weather._weather_info("weather in Lahore"))
+    time.sleep(0.05)
+    second = weather._submit(weather._weather_info("weather in Lahore"))
+    time.sleep(0.05)
+    assert first.cancel()
+    assert second.result(timeout=5).startswith("Weather in Lahore")
+    assert weather_server.requests == 2
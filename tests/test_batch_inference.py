@@ -0,0 +1,83 @@
+# tests/test_batch_inference.py
+import threading
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from utils.batch_inference import BatchScorer
+from utils.network_analyzer import FEATURE_COLUMNS, NetworkAnalyzer
+
+
+class SlowModel:
+    """Blocks in predict until released, so requests can be cancelled while queued."""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def predict(self, X):
+        self.release.wait(5)
+        return np.zeros(len(X))
+
+
+@pytest.fixture
+def model():
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0, 100, (200, len(FEATURE_COLUMNS)))
+    return RandomForestRegressor(n_estimators=5, n_jobs=1, random_state=0).fit(X, X[:, 0])
+
+
+def test_scorer_does_not_change_shared_model(model):
+    scorer = BatchScorer(model, n_jobs=-1)
+    try:
+        X = np.random.default_rng(1).uniform(0, 100, (50, len(FEATURE_COLUMNS)))
+        np.testing.assert_allclose(scorer.predict(X), model.predict(X.astype(np.float32)))
+        assert model.n_jobs == 1
+        assert scorer.model is model
+    finally:
+        scorer.close()
+
+
+def test_cancelled_request_does_not_stop_worker():
+    model = SlowModel()
+    scorer = BatchScorer(model, max_wait_ms=0)
+    try:
+        first = scorer.submit(np.zeros((1, len(FEATURE_COLUMNS))))
+        cancelled = scorer.submit(np.zeros((1, len(FEATURE_COLUMNS))))
+        assert cancelled.cancel()
+        model.release.set()
+        assert len(first.result(timeout=5)) == 1
+        assert len(scorer.predict(np.zeros((3, len(FEATURE_COLUMNS))))) == 3
+    finally:
+        scorer.close()
+    scorer.close()  # closing twice is a no-op
+
+
+def test_analyzer_predicts_directly_once_its_scorer_is_closed(model):
+    scorer = BatchScorer(model)
+    analyzer = NetworkAnalyzer(model=model, scorer=scorer)
+    X = np.random.default_rng(2).uniform(0, 100, (20, len(FEATURE_COLUMNS)))
+    scorer.close()  # e.g. the model file reloaded while a job still holds this analyzer
+    with pytest.raises(RuntimeError):
+        scorer.submit(X)
+    np.testing.assert_allclose(analyzer.predict_downtime(X), model.predict(X))
+
+
+def test_requests_racing_close_never_hang():
+    scorer = BatchScorer(SlowModel(), max_wait_ms=0)
+    scorer._estimator.release.set()
+    futures = []
+
+    def submit_many():
+        for _ in range(200):
+            try:
+                futures.append(scorer.submit(np.zeros((1, len(FEATURE_COLUMNS)))))
+            except RuntimeError:
+                return
+
+    thread = threading.Thread(target=submit_many)
+    thread.start()
+    scorer.close()
+    thread.join()
+    for future in futures:
+        assert len(future.result(timeout=5)) == 1
@@ -0,0 +1,75 @@
+# tests/test_conversation_store.py
+import pytest
+
+from utils.conversation_store import (ConversationStore, InMemoryConversationStore, RedisConversationStore,
+                                      SQLiteConversationStore, new_session_token, verify_session_token)
+
+
+class FakeRedis:
+    """The list commands RedisConversationStore uses, with Redis' inclusive ``lrange`` end."""
+
+    def __init__(self):
+        self.lists = {}
+
+    def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(v.encode() for v in values)
+        return len(self.lists[key])
+
+    def llen(self, key):
+        return len(self.lists.get(key, []))
+
+    def lrange(self, key, start, end):
+        values = self.lists.get(key, [])
+        return values[start:] if end == -1 else values[start:end + 1]
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryConversationStore()
+    if request.param == "sqlite":
+        return SQLiteConversationStore(str(tmp_path / "conversations.sqlite"))
+    return RedisConversationStore(client=FakeRedis())
+
+
+def _messages(n, start=0):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}"}
+            for i in range(start, start + n)]
+
+
+def test_append_and_page_through_history(store):
+    store.append("a", _messages(3))
+    store.append("a", _messages(2, start=3))
+    store.append("b", _messages(1))
+
+    assert store.count("a") == 5
+    assert store.count("b") == 1
+    assert store.count("missing") == 0
+    assert store.load("a") == _messages(5)
+    assert store.load("a", offset=1, limit=2) == _messages(2, start=1)
+    assert store.load("a", offset=4, limit=10) == _messages(1, start=4)
+    assert store.load("a", limit=0) == []
+    assert store.load_recent("a", 2) == _messages(2, start=3)
+    assert store.load_recent("b", 10) == _messages(1)
+
+
+def test_sqlite_history_survives_reopen(tmp_path):
+    path = str(tmp_path / "conversations.sqlite")
+    SQLiteConversationStore(path).append("a", _messages(2))
+    assert SQLiteConversationStore(path).load("a") == _messages(2)
+
+
+def test_store_interface_is_abstract():
+    with pytest.raises(TypeError):
+        ConversationStore()
+
+
+def test_session_tokens_must_be_signed():
+    token = new_session_token("secret")
+    session_id = verify_session_token(token, "secret")
+    assert session_id and token.startswith(session_id)
+    assert verify_session_token(token, "other secret") is None
+    assert verify_session_token(session_id, "secret") is None
+    assert verify_session_token(f"attacker.{token.partition('.')[2]}", "secret") is None
+    assert verify_session_token(None) is None
+    assert verify_session_token(new_session_token()) is not None
@@ -0,0 +1,67 @@
+# tests/test_downsample.py
+import numpy as np
+import pytest
+
+from utils.downsample import METHODS, downsample, lttb_indices, minmax_indices
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(0)
+    return np.sin(np.linspace(0, 30, 1000)) + rng.normal(0, 0.1, 1000)
+
+
+@pytest.mark.parametrize("method", METHODS)
+@pytest.mark.parametrize("n_out", [2, 3, 4, 5, 50, 101, 999])
+def test_output_is_sorted_bounded_and_keeps_the_ends(series, method, n_out):
+    indices = downsample(series, n_out, method)
+    assert len(indices) <= n_out
+    assert np.all(np.diff(indices) > 0)
+    assert indices[0] == 0 and indices[-1] == len(series) - 1
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_short_input_is_returned_unchanged(series, method):
+    np.testing.assert_array_equal(downsample(series[:40], 40, method), np.arange(40))
+    np.testing.assert_array_equal(downsample(series[:10], 40, method), np.arange(10))
+
+
+def test_minmax_keeps_every_bucket_min_and_max(series):
+    series[[123, 777]] = [-50.0, 50.0]
+    indices = set(minmax_indices(series, 102))  # 50 buckets of 20 points plus both ends
+    for start in range(0, len(series), 20):
+        bucket = series[start:start + 20]
+        assert start + int(bucket.argmin()) in indices
+        assert start + int(bucket.argmax()) in indices
+    assert {123, 777} <= indices
+
+
+def test_minmax_ignores_nans_within_a_bucket(series):
+    series[[0, 5, 500, 501, 999]] = np.nan
+    indices = minmax_indices(series, 102)
+    assert len(indices) <= 102
+    assert indices[0] == 0 and indices[-1] == len(series) - 1
+    for start in range(0, len(series), 20):
+        bucket = series[start:start + 20]
+        assert start + int(np.nanargmin(bucket)) in indices
+        assert start + int(np.nanargmax(bucket)) in indices
+
+
+def test_lttb_skips_nans_unless_a_bucket_has_nothing_else(series):
+    series[100:110] = np.nan
+    series[500] = np.nan
+    indices = lttb_indices(series, 50)
+    assert len(indices) == 50
+    assert not np.isnan(series[indices]).any()
+    series[:] = np.nan
+    assert len(lttb_indices(series, 50)) == 50
+
+
+def test_lttb_keeps_an_isolated_spike(series):
+    series[640] = 25.0
+    assert 640 in lttb_indices(series, 50)
+
+
+def test_unknown_method_is_rejected(series):
+    with pytest.raises(ValueError, match="Unknown downsampling method"):
+        downsample(series, 10, "mean")
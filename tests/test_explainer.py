@@ -0,0 +1,60 @@
+# tests/test_explainer.py
+import gc
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from utils import explainer as explainer_module
+from utils.explainer import explanations_path, get_explainer
+
+FEATURES = ['bandwidth', 'latency', 'signal_strength']
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.uniform(0, 100, (500, 3)), columns=FEATURES)
+    return X, 0.8 + 0.002 * X['bandwidth'] - 0.001 * X['latency'] + rng.normal(0, 0.01, len(X))
+
+
+def _fit(X, y, seed=0):
+    return RandomForestRegressor(n_estimators=5, random_state=seed).fit(X, y)
+
+
+def test_contributions_sum_to_prediction(data):
+    X, y = data
+    model = _fit(X, y)
+    explained = get_explainer(model, FEATURES).explain(X.iloc[:50])
+    np.testing.assert_allclose(explained['prediction'], model.predict(X.iloc[:50]), rtol=1e-5)
+
+
+def test_cached_explainer_does_not_keep_model_alive(data):
+    X, y = data
+    model = _fit(X, y)
+    explainer = get_explainer(model, FEATURES)
+    assert get_explainer(model, FEATURES) is explainer
+    assert model in explainer_module._explainers
+    del model
+    gc.collect()
+    assert len(explainer_module._explainers) == 0
+    with pytest.raises(ReferenceError):
+        explainer.model
+
+
+def test_global_importance_is_cached_per_model(tmp_path, data):
+    X, y = data
+    cache_path = explanations_path(str(tmp_path / "model.joblib"))
+    models = [_fit(X, y, seed) for seed in range(explainer_module.MAX_CACHED_MODELS + 1)]
+    first = get_explainer(models[0], FEATURES).global_importance(X, y, n_repeats=2, cache_path=cache_path)
+    pd.testing.assert_frame_equal(
+        get_explainer(models[0], FEATURES).global_importance(X, y, n_repeats=2, cache_path=cache_path), first)
+    for model in models[1:]:
+        get_explainer(model, FEATURES).global_importance(X, n_repeats=2, cache_path=cache_path)
+
+    cache = explainer_module._load_explanations(cache_path)
+    assert len(cache) == explainer_module.MAX_CACHED_MODELS
+    assert get_explainer(models[0], FEATURES).fingerprint not in cache
+    assert os.listdir(tmp_path) == [os.path.basename(cache_path)]  # no temp files left behind
@@ -0,0 +1,32 @@
+# tests/test_generate_sample_data.py
+import os
+
+import pyarrow.parquet as pq
+import pytest
+
+from generate_sample_data import GEO_SCENARIOS, _generate, chunk_seeds, generate_network_stats, school_chunk
+
+
+def _interrupt():
+    raise KeyboardInterrupt
+
+
+def test_output_does_not_depend_on_worker_count(tmp_path):
+    tables = []
+    for workers in (1, 2):
+        out_dir = tmp_path / f"workers_{workers}"
+        out_dir.mkdir()
+        generate_network_stats("stats.csv", 2500, (1, 20), (100, 300), (20, 60), (0.7, 0.9), out_dir=str(out_dir),
+                               num_nodes=7, chunk_rows=400, workers=workers, write_csv=False)
+        tables.append(pq.read_table(out_dir / "stats.parquet"))
+    assert tables[0].num_rows == 2500
+    assert tables[0].equals(tables[1])
+
+
+def test_failed_run_leaves_no_partial_output(tmp_path):
+    path = str(tmp_path / "partial.geojson")
+    ranges = {key: value for key, value in GEO_SCENARIOS["rural"].items() if key != "num_locations"}
+    tasks = [(school_chunk, (chunk_seeds(42, "geo:partial", 1)[0], 0, 10, ranges)), (_interrupt, ())]
+    with pytest.raises(KeyboardInterrupt):
+        _generate({"geojson": path}, tasks, workers=1)
+    assert os.listdir(tmp_path) == []
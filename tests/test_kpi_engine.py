@@ -0,0 +1,100 @@
+# tests/test_kpi_engine.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.kpi_engine import NetworkKPIEngine
+from utils.network_analyzer import NetworkAnalyzer
+
+
+@pytest.fixture
+def telemetry():
+    rng = np.random.default_rng(0)
+    n = 2000
+    return pd.DataFrame({
+        "node_id": [f"node_{i % 5}" for i in range(n)],
+        "timestamp": pd.date_range("2024-01-01", periods=n, freq="min").astype(str),
+        "bandwidth": rng.uniform(1, 100, n),
+        "latency": rng.uniform(10, 200, n),
+        "signal_strength": rng.uniform(20, 100, n),
+        "uptime": rng.uniform(0.8, 1.0, n),
+    })
+
+
+def test_unparseable_timestamps_are_dropped(telemetry):
+    telemetry.loc[[3, 10], "timestamp"] = ["not a time", ""]
+    engine = NetworkKPIEngine("1h")
+    engine.append(telemetry)
+    assert engine.rows == len(telemetry) - 2
+    assert engine.node_kpis()["rows"].sum() == len(telemetry) - 2
+
+
+def test_chunked_file_matches_whole_frame(tmp_path, telemetry):
+    path = str(tmp_path / "telemetry.csv")
+    telemetry.sample(frac=1, random_state=0).to_csv(path, index=False)  # not sorted by time
+
+    chunked = NetworkAnalyzer(model=object()).analyze_kpis(path, chunk_size=300)
+    whole = NetworkKPIEngine("1h")
+    whole.append(telemetry)
+    pd.testing.assert_frame_equal(chunked.window_kpis(), whole.window_kpis(), check_categorical=False,
+                                  check_index_type=False, check_dtype=False, rtol=1e-4)
+
+
+def test_upload_analysis_returns_predictions_when_kpis_fail(tmp_path, telemetry, monkeypatch):
+    from sklearn.ensemble import RandomForestRegressor
+
+    from app.components.visualizations import analyze_upload
+    from utils.network_analyzer import FEATURE_COLUMNS
+
+    def fail(*args, **kwargs):
+        raise ValueError("broken KPI input")
+
+    monkeypatch.setattr(NetworkAnalyzer, "analyze_kpis", fail)
+    path = str(tmp_path / "telemetry.csv")
+    telemetry.to_csv(path, index=False)
+    model = RandomForestRegressor(n_estimators=3, random_state=0).fit(telemetry[FEATURE_COLUMNS],
+                                                                      telemetry["uptime"])
+    result = analyze_upload(model, None, path, None, lambda *args: None)
+    assert len(result["predictions"]) == len(telemetry)
+    assert result["node_kpis"] is None and "broken KPI input" in result["kpi_error"]
+
+
+def test_unsorted_chunks_give_percentiles_within_a_percent(telemetry):
+    shuffled = telemetry.sample(frac=1, random_state=1)
+    engine = NetworkKPIEngine("1h")
+    for start in range(0, len(shuffled), 300):
+        engine.append(shuffled.iloc[start:start + 300])
+    prepared = engine.prepare(telemetry)
+    latency = prepared.groupby(["node_id", "window_start"], observed=True)["latency"]
+    windows = engine.window_kpis()
+    for column, quantile in (("latency_p50", 0.5), ("latency_p95", 0.95)):
+        exact = latency.quantile(quantile).reindex(windows.index)
+        np.testing.assert_allclose(windows[column], exact, rtol=0.01)
+    np.testing.assert_allclose(windows["latency_mean"], latency.mean().reindex(windows.index), rtol=1e-6)
+
+
+def test_memory_does_not_grow_with_rows_per_window(telemetry):
+    engine = NetworkKPIEngine("1D")
+    for _ in range(5):
+        engine.append(telemetry.assign(node_id="node_0"))
+    assert engine.rows == 5 * len(telemetry)
+    assert len(engine.window_kpis()) == 2
+    # latency spans 10-200 ms: ~150 histogram buckets per window whatever the row count
+    assert len(engine._latency_histogram) <= 2 * 160
+
+
+def test_retention_drops_old_windows(telemetry):
+    engine = NetworkKPIEngine("1h", retention="6h")
+    engine.append(telemetry)
+    windows = engine.window_kpis().index.get_level_values("window_start")
+    assert windows.max() - windows.min() <= pd.Timedelta("6h")
+    assert engine.rows < len(telemetry)
+
+
+def test_windows_without_latency_readings_have_no_percentiles(telemetry):
+    engine = NetworkKPIEngine("1h")
+    engine.append(telemetry.iloc[:60].assign(latency=np.nan))
+    engine.append(telemetry.iloc[60:120])
+    windows = engine.window_kpis()
+    assert windows["latency_p95"].isna().sum() == 5  # node_0..4 in the first hour
+    assert windows["latency_p95"].notna().sum() == 5
@@ -0,0 +1,27 @@
+# tests/test_metrics.py
+import threading
+
+from utils.metrics import MetricsRegistry, profile_request
+
+
+def test_concurrent_requests_are_profiled_one_at_a_time():
+    registry = MetricsRegistry()
+    inside, release = threading.Event(), threading.Event()
+
+    def first():
+        with profile_request("first", registry, enabled=True):
+            inside.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=first)
+    thread.start()
+    inside.wait(5)
+    with profile_request("second", registry, enabled=True):
+        pass
+    release.set()
+    thread.join()
+
+    assert [profile["name"] for profile in registry.profiles] == ["first"]
+    with profile_request("third", registry, enabled=True):
+        pass
+    assert [profile["name"] for profile in registry.profiles] == ["first", "third"]
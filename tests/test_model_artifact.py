@@ -0,0 +1,53 @@
+# tests/test_model_artifact.py
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from utils.model_artifact import (ModelArtifactError, check_header, dataset_hash, load_model_artifact,
+                                  read_header, save_model_artifact)
+
+FEATURES = ['bandwidth', 'latency', 'signal_strength']
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.uniform(0, 100, (2000, 3)), columns=FEATURES)
+    df['uptime'] = 0.8 + 0.002 * df['bandwidth'] - 0.001 * df['latency'] + rng.normal(0, 0.01, len(df))
+    # Missing values in training, so splits learn a direction for NaN rows
+    for col in FEATURES:
+        df.loc[rng.random(len(df)) < 0.1, col] = np.nan
+    df['uptime'] += df[FEATURES].isna().any(axis=1) * rng.normal(0, 0.5, len(df))
+    return df
+
+
+@pytest.mark.parametrize("options", [{}, {"float32": False}])
+def test_round_trip_with_missing_values(tmp_path, data, options):
+    model = RandomForestRegressor(n_estimators=10, random_state=0).fit(data[FEATURES], data['uptime'])
+    path = str(tmp_path / "model.joblib")
+    save_model_artifact(model, path, FEATURES, **options)
+    loaded, header = load_model_artifact(path, expected_features=FEATURES)
+
+    probe = data[FEATURES].iloc[:500]
+    assert probe.isna().any(axis=1).any()
+    np.testing.assert_allclose(loaded.predict(probe), model.predict(probe), atol=1e-6)
+    assert header["n_trees"] == 10
+
+
+def test_rejects_stale_model(tmp_path, data):
+    model = RandomForestRegressor(n_estimators=2, random_state=0).fit(data[FEATURES].fillna(0), data['uptime'])
+    path = str(tmp_path / "model.joblib")
+    save_model_artifact(model, path, FEATURES, training_data_hash=dataset_hash(data))
+    load_model_artifact(path, expected_data_hash=dataset_hash(data))
+    with pytest.raises(ModelArtifactError, match="stale"):
+        load_model_artifact(path, expected_data_hash=dataset_hash(data.iloc[:10]))
+
+
+def test_rejects_packed_trees_from_other_sklearn_version(tmp_path, data):
+    model = RandomForestRegressor(n_estimators=2, random_state=0).fit(data[FEATURES].fillna(0), data['uptime'])
+    path = str(tmp_path / "model.joblib")
+    save_model_artifact(model, path, FEATURES)
+    header = dict(read_header(path), sklearn_version="0.1.0")
+    with pytest.raises(ModelArtifactError, match="scikit-learn 0.1.0"):
+        check_header(header, path)
@@ -0,0 +1,23 @@
+# tests/test_network_analyzer.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.network_analyzer import ENERGY_SCALE, NetworkAnalyzer
+
+
+@pytest.fixture
+def telemetry():
+    return pd.DataFrame({"bandwidth": [10.0, np.nan, 30.0, 40.0], "uptime": [1.0, 0.5, np.nan, 0.5]})
+
+
+def test_energy_stats_skip_rows_with_missing_values(telemetry):
+    stats = NetworkAnalyzer(model=object()).analyze_energy_efficiency(telemetry)
+    assert stats["total_energy_usage"] == pytest.approx(30.0 * ENERGY_SCALE)
+    assert stats["avg_energy_usage"] == pytest.approx(15.0 * ENERGY_SCALE)
+
+
+def test_chunked_energy_stats_match_whole_frame(telemetry):
+    analyzer = NetworkAnalyzer(model=object())
+    chunked = analyzer.analyze_energy_efficiency_chunks([telemetry.iloc[:2], telemetry.iloc[2:3], telemetry.iloc[3:]])
+    assert chunked == pytest.approx(analyzer.analyze_energy_efficiency(telemetry))
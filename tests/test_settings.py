@@ -0,0 +1,79 @@
+# tests/test_settings.py
+import os
+
+import pytest
+
+import config.settings as settings_module
+from config.settings import ConfigError, Settings, get_settings
+
+KEYS = {"GEMINI_API_KEY": "gemini", "WEATHER_API_KEY": "weather"}
+
+
+def test_defaults_from_minimal_environment():
+    settings = Settings.from_env(KEYS)
+    assert settings.gemini_api_key == "gemini" and settings.weather_api_key == "weather"
+    assert settings.max_nodes is None
+    assert settings.model_path == Settings.model_path
+
+
+def test_every_invalid_setting_is_reported_at_once():
+    env = {"WEATHER_API_KEY": "weather", "MAX_NODES": "many", "GEMINI_TIMEOUT": "soon",
+           "DIAGNOSTICS_ENABLED": "maybe", "ANALYSIS_WORKERS": "0", "METRICS_PORT": "70000",
+           "CONVERSATION_STORE": "mongo", "LOG_LEVEL": "chatty"}
+    with pytest.raises(ConfigError) as excinfo:
+        Settings.from_env(env)
+    problems = excinfo.value.problems
+    assert len(problems) == 8
+    for name in ("GEMINI_API_KEY", "MAX_NODES", "GEMINI_TIMEOUT", "DIAGNOSTICS_ENABLED", "ANALYSIS_WORKERS",
+                 "METRICS_PORT", "CONVERSATION_STORE", "LOG_LEVEL"):
+        assert name in str(excinfo.value)
+
+
+def test_max_nodes_zero_means_unlimited():
+    assert Settings.from_env({**KEYS, "MAX_NODES": "0"}).max_nodes is None
+    assert Settings.from_env({**KEYS, "MAX_NODES": "12"}).max_nodes == 12
+    with pytest.raises(ConfigError, match="MAX_NODES must not be negative"):
+        Settings.from_env({**KEYS, "MAX_NODES": "-1"})
+
+
+def test_geo_cache_dir_defaults_under_upload_dir(tmp_path):
+    uploads = str(tmp_path / "uploads")
+    settings = Settings.from_env({**KEYS, "TEMP_UPLOAD_DIR": uploads})
+    assert settings.geo_cache_dir == os.path.join(uploads, "geo_cache")
+    assert Settings.from_env(KEYS).geo_cache_dir == os.path.join(Settings.temp_upload_dir, "geo_cache")
+    assert Settings.from_env({**KEYS, "TEMP_UPLOAD_DIR": uploads, "GEO_CACHE_DIR": ""}).geo_cache_dir == ""
+
+
+def test_allowed_file_types_are_split_into_a_tuple():
+    settings = Settings.from_env({**KEYS, "ALLOWED_FILE_TYPES": "CSV, geojson,,parquet "})
+    assert settings.allowed_file_types == ("csv", "geojson", "parquet")
+
+
+def test_empty_values_fall_back_to_defaults():
+    settings = Settings.from_env({**KEYS, "ANALYSIS_WORKERS": "", "DIAGNOSTICS_ENABLED": "yes"})
+    assert settings.analysis_workers == Settings.analysis_workers
+    assert settings.diagnostics_enabled is True
+
+
+def test_settings_are_immutable():
+    settings = Settings.from_env(KEYS)
+    with pytest.raises(AttributeError):
+        settings.max_nodes = 3
+
+
+@pytest.fixture
+def fresh_settings():
+    get_settings.cache_clear()
+    yield
+    get_settings.cache_clear()
+
+
+def test_module_constants_resolve_to_settings_fields(monkeypatch, fresh_settings):
+    monkeypatch.setenv("MODEL_PATH", "models/custom.joblib")
+    monkeypatch.setenv("MAX_NODES", "7")
+    from config.settings import MODEL_PATH
+    assert MODEL_PATH == "models/custom.joblib"
+    assert settings_module.MAX_NODES == 7
+    assert "MODEL_PATH" in dir(settings_module)
+    with pytest.raises(AttributeError):
+        settings_module.NOT_A_SETTING
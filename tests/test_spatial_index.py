@@ -0,0 +1,111 @@
+# tests/test_spatial_index.py
+import os
+
+import numpy as np
+import pytest
+
+from utils.spatial_index import EARTH_RADIUS_KM, SpatialIndex, coordinates_digest
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+@pytest.fixture
+def points():
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(-80, 80, 500)
+    lon = rng.uniform(-180, 180, 500)
+    # A cluster straddling the antimeridian: neighbours in km, ~360 degrees apart in longitude
+    lat[:6] = [10.0, 10.0, 10.1, 9.9, 10.0, -10.0]
+    lon[:6] = [179.9, -179.9, 179.95, -179.95, 170.0, 180.0]
+    return lat, lon
+
+
+@pytest.fixture
+def queries():
+    return np.array([10.0, 10.0, -45.0, 89.0]), np.array([-180.0, 179.99, 60.0, 0.0])
+
+
+def test_nearest_matches_brute_force_haversine(points, queries):
+    lat, lon = points
+    distances, indices = SpatialIndex(lat, lon).query_nearest(*queries, k=3)
+    assert distances.shape == indices.shape == (4, 3)
+    for q, (qlat, qlon) in enumerate(zip(*queries)):
+        brute = haversine_km(qlat, qlon, lat, lon)
+        expected = np.argsort(brute)[:3]
+        np.testing.assert_array_equal(indices[q], expected)
+        np.testing.assert_allclose(distances[q], brute[expected], rtol=1e-9, atol=1e-6)
+
+
+def test_nearest_neighbours_cross_the_antimeridian(points):
+    distances, indices = SpatialIndex(*points).query_nearest(10.0, 180.0, k=4)
+    assert set(indices[0]) == {0, 1, 2, 3}
+    assert distances.max() < 20.0
+
+
+def test_radius_matches_brute_force_haversine(points, queries):
+    lat, lon = points
+    radius_km = 1500.0
+    indices, distances = SpatialIndex(lat, lon).query_radius(*queries, radius_km)
+    assert len(indices) == len(distances) == 4
+    for q, (qlat, qlon) in enumerate(zip(*queries)):
+        brute = haversine_km(qlat, qlon, lat, lon)
+        inside = np.flatnonzero(brute <= radius_km)
+        np.testing.assert_array_equal(np.sort(indices[q]), inside)
+        assert np.all(np.diff(distances[q]) >= 0)  # nearest first
+        np.testing.assert_allclose(distances[q], brute[indices[q]], rtol=1e-9, atol=1e-6)
+
+
+def test_radius_across_the_antimeridian(points):
+    index = SpatialIndex(*points)
+    indices, distances = index.query_radius(10.0, -179.99, 25.0)
+    assert set(indices[0]) == {0, 1, 2, 3}
+    assert index.count_within(10.0, -179.99, 25.0).tolist() == [4]
+
+
+def test_radius_without_hits_gives_empty_results(points):
+    index = SpatialIndex(*points)
+    indices, distances = index.query_radius([10.0, -45.0], [-180.0, 60.0], 20.0)
+    assert len(indices[0]) == 4
+    assert len(indices[1]) == 0 and len(distances[1]) == 0
+    assert indices[1].dtype == np.int64
+    assert index.count_within([-45.0], [60.0], 20.0).tolist() == [0]
+
+
+def test_load_or_build_reuses_index_for_same_coordinates(tmp_path, points, monkeypatch):
+    lat, lon = points
+    built = SpatialIndex.load_or_build(lat, lon, str(tmp_path))
+    path = tmp_path / f"{coordinates_digest(lat, lon)}.kdtree.joblib"
+    assert path.exists()
+
+    monkeypatch.setattr(SpatialIndex, "__init__", lambda *args, **kwargs: pytest.fail("index was rebuilt"))
+    reloaded = SpatialIndex.load_or_build(lat.copy(), lon.copy(), str(tmp_path))
+    assert reloaded.digest == built.digest and reloaded.size == built.size
+    np.testing.assert_array_equal(reloaded.query_nearest(10.0, 180.0, k=4)[1],
+                                  built.query_nearest(10.0, 180.0, k=4)[1])
+
+
+def test_load_or_build_rebuilds_when_coordinates_change(tmp_path, points):
+    lat, lon = points
+    first = SpatialIndex.load_or_build(lat, lon, str(tmp_path))
+    moved = lon.copy()
+    moved[10] += 0.5
+    second = SpatialIndex.load_or_build(lat, moved, str(tmp_path))
+    assert second.digest != first.digest
+    assert len(os.listdir(tmp_path)) == 2
+    assert second.query_nearest(lat[10], moved[10])[0][0, 0] == pytest.approx(0.0, abs=1e-6)
+
+
+def test_load_or_build_replaces_an_index_for_different_data(tmp_path, points):
+    lat, lon = points
+    path = tmp_path / f"{coordinates_digest(lat, lon)}.kdtree.joblib"
+    SpatialIndex(lat[:10], lon[:10]).save(str(path))  # right file name, wrong contents
+    with pytest.raises(ValueError, match="different data"):
+        SpatialIndex.load(str(path), expected_digest=coordinates_digest(lat, lon))
+
+    index = SpatialIndex.load_or_build(lat, lon, str(tmp_path))
+    assert index.size == len(lat)
+    assert SpatialIndex.load(str(path), expected_digest=index.digest).size == len(lat)
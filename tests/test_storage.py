@@ -0,0 +1,89 @@
+# tests/test_storage.py
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from utils.storage import (NUMERIC_COLUMNS, convert_network_stats, count_rows, detect_format, iter_network_stats,
+                           read_columns, read_network_stats)
+
+COLUMNS = ["node_id", "timestamp", *NUMERIC_COLUMNS]
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 1000
+    df = pd.DataFrame({
+        "node_id": [f"node_{i % 7}" for i in range(n)],
+        "timestamp": pd.date_range("2024-01-01", periods=n, freq="min").astype(str),
+        "bandwidth": rng.uniform(1, 100, n),
+        "latency": rng.uniform(10, 200, n),
+        "signal_strength": rng.uniform(20, 100, n),
+        "uptime": rng.uniform(0.8, 1.0, n),
+    })
+    df.loc[[3, 500], "latency"] = np.nan
+    path = tmp_path / "stats.csv"
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".arrow"])
+def test_round_trip_matches_csv(tmp_path, csv_path, suffix):
+    dst = convert_network_stats(csv_path, str(tmp_path / f"stats{suffix}"), chunk_size=64)
+    assert detect_format(dst) == suffix[1:]
+    assert read_columns(dst) == COLUMNS
+
+    converted = read_network_stats(dst)
+    expected = read_network_stats(csv_path)
+    assert all(converted[col].dtype == np.float32 for col in NUMERIC_COLUMNS)
+    # pyarrow stores parsed timestamps where pandas reads the CSV text back
+    pd.testing.assert_series_equal(pd.to_datetime(converted.pop("timestamp")),
+                                   pd.to_datetime(expected.pop("timestamp")), check_dtype=False)
+    pd.testing.assert_frame_equal(converted, expected, check_dtype=False)
+    assert converted["latency"].isna().sum() == 2
+
+    projected = read_network_stats(dst, columns=["node_id", "latency"])
+    assert projected.columns.tolist() == ["node_id", "latency"]
+    assert projected["latency"].dtype == np.float32
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".arrow"])
+def test_chunks_respect_chunk_size(tmp_path, csv_path, suffix):
+    dst = convert_network_stats(csv_path, str(tmp_path / f"stats{suffix}"), chunk_size=64)
+    columns = ["node_id", "bandwidth", "uptime"]
+    chunks = list(iter_network_stats(dst, columns, chunk_size=50))
+    assert all(0 < len(chunk) <= 50 for chunk in chunks)
+    assert all(chunk.columns.tolist() == columns for chunk in chunks)
+    assert all(chunk["bandwidth"].dtype == np.float32 for chunk in chunks)
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), read_network_stats(csv_path, columns=columns),
+                                  check_dtype=False)
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".parquet", ".arrow"])
+def test_count_rows(tmp_path, csv_path, suffix):
+    path = csv_path if suffix == ".csv" else convert_network_stats(csv_path, str(tmp_path / f"stats{suffix}"),
+                                                                  chunk_size=64)
+    assert count_rows(path) == 1000
+
+
+def test_csv_without_trailing_newline_counts_last_row(tmp_path):
+    path = tmp_path / "short.csv"
+    path.write_text("node_id,bandwidth\nn1,1.0\nn2,2.0")
+    assert count_rows(str(path)) == 2
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".arrow"])
+def test_header_only_csv_converts_to_empty_file(tmp_path, suffix):
+    src = tmp_path / "empty.csv"
+    src.write_text("node_id,bandwidth,latency\n")
+    dst = convert_network_stats(str(src), str(tmp_path / f"empty{suffix}"))
+    assert count_rows(dst) == 0
+    assert read_columns(dst) == ["node_id", "bandwidth", "latency"]
+    assert list(iter_network_stats(dst, ["bandwidth"], chunk_size=10)) == []
+
+
+def test_csv_destination_is_rejected(tmp_path, csv_path):
+    with pytest.raises(ValueError, match="Parquet or Arrow"):
+        convert_network_stats(csv_path, str(tmp_path / "copy.csv"))
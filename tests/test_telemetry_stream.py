@@ -0,0 +1,91 @@
+# tests/test_telemetry_stream.py
+import asyncio
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from benchmarks.stubs import StubTelemetryServer  # noqa: E402
+from utils.data_fetcher import TelemetryStream  # noqa: E402
+
+
+class SlowAnalyzer:
+    """Scores slowly and records how many requests the server had seen at each page."""
+
+    def __init__(self, server: StubTelemetryServer, delay: float = 0.0):
+        self.server = server
+        self.delay = delay
+        self.requests_seen = []
+
+    def is_fitted(self):
+        return True
+
+    def predict_downtime(self, features):
+        self.requests_seen.append(self.server.requests)
+        time.sleep(self.delay)
+        return np.full(len(features), 0.9)
+
+
+def _rows(n):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "node_id": [f"node_{i % 7}" for i in range(n)],
+        "timestamp": pd.date_range("2024-01-01", periods=n, freq="min"),
+        "bandwidth": rng.uniform(1, 100, n),
+        "latency": rng.uniform(10, 200, n),
+        "signal_strength": rng.uniform(20, 100, n),
+        "uptime": rng.uniform(0.8, 1.0, n),
+    })
+
+
+def _drain(stream):
+    asyncio.run(stream.run(until_caught_up=True))
+
+
+def test_retries_failed_requests():
+    rows = _rows(100)
+    with StubTelemetryServer(rows, fail_every=3) as server:
+        stream = TelemetryStream(server.url, page_size=10, backoff=0.001)
+        _drain(stream)
+    assert stream.retries > 0
+    assert stream.buffer.total_rows == 100
+    pd.testing.assert_series_equal(stream.buffer.to_frame()["timestamp"], rows["timestamp"].astype("datetime64[ns]"),
+                                   check_names=False)
+
+
+def test_buffer_keeps_newest_rows_when_it_wraps_around():
+    rows = _rows(95)
+    with StubTelemetryServer(rows) as server:
+        stream = TelemetryStream(server.url, page_size=10, buffer_rows=32)
+        _drain(stream)
+    buffered = stream.buffer.to_frame()
+    assert len(buffered) == 32
+    assert stream.buffer.dropped_rows == 63
+    np.testing.assert_array_equal(buffered["bandwidth"], rows["bandwidth"].iloc[-32:].to_numpy(np.float32))
+
+
+def test_slow_scoring_throttles_fetching():
+    queue_pages = 2
+    with StubTelemetryServer(_rows(200)) as server:
+        analyzer = SlowAnalyzer(server, delay=0.02)
+        stream = TelemetryStream(server.url, analyzer=analyzer, page_size=10, queue_pages=queue_pages)
+        _drain(stream)
+    assert stream.pages == 20
+    # While page i is scored, at most the queued pages and one blocked fetch can be ahead of it
+    assert all(seen <= i + 1 + queue_pages + 1 for i, seen in enumerate(analyzer.requests_seen))
+    assert (stream.buffer.to_frame()["predicted_uptime"] == np.float32(0.9)).all()
+
+
+def test_skips_page_with_unparseable_timestamps():
+    rows = _rows(30).astype({"timestamp": str})
+    rows.loc[15, "timestamp"] = "yesterday"
+    with StubTelemetryServer(rows) as server:
+        stream = TelemetryStream(server.url, page_size=10)
+        _drain(stream)
+    assert stream.error is None
+    assert stream.bad_pages == 1 and len(stream.quarantine) == 1
+    assert stream.buffer.total_rows == 20
+    assert stream.stats()["bad_pages"] == 1
@@ -0,0 +1,26 @@
+# tests/test_train_model.py
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from train_model import FEATURES, measure_inference, select_model
+
+
+def _result(name, cv_mae, latency, deployable):
+    return {"name": name, "cv_mae": cv_mae, "batch_ms_per_1k_rows": latency, "size_bytes": 1,
+            "deployable": deployable}
+
+
+def test_select_model_only_picks_deployable_candidates():
+    results = [_result("linear", 0.01, 0.1, False), _result("hgb_50", 0.02, 0.5, False),
+               _result("rf_25", 0.05, 1.0, True), _result("rf_100", 0.049, 3.0, True)]
+    assert select_model(results)["name"] == "rf_25"
+    with pytest.raises(ValueError, match="deployable"):
+        select_model(results[:2])
+
+
+def test_measure_inference_leaves_model_untouched():
+    X = np.random.default_rng(0).uniform(0, 1, (100, len(FEATURES)))
+    model = RandomForestRegressor(n_estimators=3, n_jobs=-1, random_state=0).fit(X, X[:, 0])
+    measure_inference(model, X, batch_rows=100, repeats=1)
+    assert model.n_jobs == -1
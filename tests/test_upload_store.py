@@ -0,0 +1,41 @@
+# tests/test_upload_store.py
+import os
+
+import numpy as np
+
+from utils.jobs import JobPool, result_nbytes
+from utils.upload_store import UploadStore
+
+
+def test_prune_skips_files_being_read(tmp_path):
+    store = UploadStore(str(tmp_path), max_file_size=1000)
+    first = store.put(b"a" * 400, "first.csv")
+    os.utime(first.path, (1, 1))  # oldest
+    second = store.put(b"b" * 400, "second.csv")
+
+    with store.in_use(first.path):
+        assert store.prune(500) == 1
+    assert os.path.exists(first.path) and not os.path.exists(second.path)
+
+    seen = []
+    store.reading(first.path, lambda: seen.append(store.prune(0)))()
+    assert seen == [0] and os.path.exists(first.path)
+    assert store.prune(0) == 1
+
+
+def test_job_memo_is_bounded_by_result_size():
+    pool = JobPool(max_workers=1, max_result_bytes=3 * 8000)
+    for i in range(5):
+        pool.put(("predict", i), {"predictions": np.zeros(1000)})
+    assert pool.get(("predict", 0)) is None
+    assert pool.get(("predict", 4)) is not None
+    assert pool.stats()["weight"] <= 3 * 8000
+    # A result larger than the budget is still kept while it is the newest
+    pool.put("large", {"predictions": np.zeros(10_000)})
+    assert pool.get("large") is not None and pool.stats()["size"] == 1
+    pool.shutdown()
+
+
+def test_result_nbytes_counts_shared_objects_once():
+    predictions = np.zeros(1000)
+    assert result_nbytes({"a": predictions, "b": [predictions, "text"]}) == predictions.nbytes
@@ -1,26 +1,212 @@
 # train_model.py
-import pandas as pd
-from sklearn.ensemble import RandomForestRegressor
-import pickle
+"""Train the network uptime model.
+
+Runs a cross-validated search over model families and sizes (random forests,
+HistGradientBoosting, linear baselines) in a process pool. The dataset is dumped
+once and memory-mapped by every worker, and each candidate's CV result is cached
+with ``joblib.Memory``, so re-running with the same data and candidates is nearly
+free. Every candidate is then timed for inference and sized as a saved artifact,
+and the fastest random forest within the accuracy bar is saved; the other
+families are reported as baselines only, since incremental updates
+(``NetworkAnalyzer.update_model``) and explanations need a random forest.
+"""
+import argparse
+import copy
+import glob
+import json
 import os
+import shutil
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+from joblib import Memory, Parallel, delayed
+from sklearn.base import clone
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.model_selection import KFold, cross_validate
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+from utils.model_artifact import dataset_hash, save_model_artifact
+from utils.storage import read_network_stats
+
+FEATURES = ['bandwidth', 'latency', 'signal_strength']
+TARGET = 'uptime'
+MODEL_OUTPUT = "data/models/network_predictor.joblib"
+DEFAULT_DATA = "data/sample_network_data/network_stats_*.csv"
+CACHE_DIR = "data/models/.cache"
+
+
+def candidate_models(random_state: int = 42) -> Dict[str, object]:
+    """Model families and sizes to compare; every model is single-threaded inside a worker."""
+    candidates = {
+        "linear": LinearRegression(),
+        "ridge": make_pipeline(StandardScaler(), Ridge(alpha=1.0)),
+    }
+    for n_estimators in (25, 50, 100, 200):
+        candidates[f"rf_{n_estimators}"] = RandomForestRegressor(
+            n_estimators=n_estimators, min_samples_leaf=2, n_jobs=1, random_state=random_state)
+    for max_iter in (50, 100, 200):
+        candidates[f"hgb_{max_iter}"] = HistGradientBoostingRegressor(
+            max_iter=max_iter, learning_rate=0.1, early_stopping=False, random_state=random_state)
+    return candidates
+
+
+def load_training_data(paths: List[str]) -> pd.DataFrame:
+    """Read and concatenate the model columns (float32) of every training file."""
+    frames = [read_network_stats(path, columns=FEATURES + [TARGET]) for path in paths]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _cross_validate(name: str, model, X: np.ndarray, y: np.ndarray, folds: int, random_state: int) -> dict:
+    # The arguments are hashed by joblib.Memory, so an unchanged (data, model, folds) reuses the result
+    cv = KFold(n_splits=folds, shuffle=True, random_state=random_state)
+    scores = cross_validate(model, pd.DataFrame(X, columns=FEATURES, copy=False), y, cv=cv,
+                            scoring=("neg_mean_absolute_error", "r2"), n_jobs=1)
+    return {
+        "name": name,
+        "cv_mae": float(-scores["test_neg_mean_absolute_error"].mean()),
+        "cv_mae_std": float(scores["test_neg_mean_absolute_error"].std()),
+        "cv_r2": float(scores["test_r2"].mean()),
+        "fit_seconds": float(scores["fit_time"].mean()),
+    }
+
+
+def _fit(model, X: np.ndarray, y: np.ndarray):
+    return clone(model).fit(pd.DataFrame(X, columns=FEATURES, copy=False), y)
+
+
+def search_models(X: np.ndarray, y: np.ndarray, candidates: Dict[str, object], folds: int = 5,
+                  n_jobs: int = -1, cache_dir: Optional[str] = CACHE_DIR, random_state: int = 42):
+    """Cross-validate and refit every candidate in parallel; returns (results, fitted models)."""
+    memory = Memory(cache_dir, verbose=0)
+    cached_cv = memory.cache(_cross_validate)
+    cached_fit = memory.cache(_fit)
+    # Dump the dataset once; loky workers then share it as a read-only memory map
+    data_dir = tempfile.mkdtemp(prefix="train_data_", dir=cache_dir)
+    data_path = os.path.join(data_dir, "dataset.joblib")
+    joblib.dump((np.ascontiguousarray(X), np.ascontiguousarray(y)), data_path)
+    X_mm, y_mm = joblib.load(data_path, mmap_mode="r")
+    try:
+        with Parallel(n_jobs=n_jobs, backend="loky") as parallel:
+            results = parallel(delayed(cached_cv)(name, model, X_mm, y_mm, folds, random_state)
+                               for name, model in candidates.items())
+            fitted = parallel(delayed(cached_fit)(model, X_mm, y_mm) for model in candidates.values())
+    finally:
+        del X_mm, y_mm
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return results, dict(zip(candidates, fitted))
+
+
+def measure_inference(model, X: np.ndarray, batch_rows: int = 10_000, repeats: int = 5) -> Dict[str, float]:
+    """Median batch latency (per 1k rows) and single-row latency, both single-threaded."""
+    if hasattr(model, "n_jobs"):
+        model = copy.copy(model)  # the fitted model is saved as-is; only the timing copy is pinned to one thread
+        model.n_jobs = 1
+    batch = pd.DataFrame(np.resize(X, (batch_rows, X.shape[1])), columns=FEATURES)
+    single = batch.iloc[:1]
+    model.predict(batch)  # warm-up
+
+    def median_seconds(frame):
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model.predict(frame)
+            timings.append(time.perf_counter() - start)
+        return float(np.median(timings))
+
+    return {
+        "batch_ms_per_1k_rows": median_seconds(batch) * 1000 / (batch_rows / 1000),
+        "single_row_ms": median_seconds(single) * 1000,
+    }
+
+
+def artifact_size(model) -> int:
+    """Size in bytes of the model saved in the artifact format."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model.joblib")
+        save_model_artifact(model, path, FEATURES)
+        return os.path.getsize(path)
+
+
+def select_model(results: List[dict], max_mae: Optional[float] = None, tolerance: float = 0.05) -> dict:
+    """Fastest deployable candidate meeting the accuracy bar.
+
+    Only results marked ``deployable`` (random forests) are considered. The bar
+    is ``max_mae`` if given, otherwise their best CV MAE plus ``tolerance``
+    (relative). Ties on latency go to the smaller model.
+    """
+    deployable = [r for r in results if r.get("deployable")]
+    if not deployable:
+        raise ValueError("No deployable candidate (random forest) was trained")
+    bar = max_mae if max_mae is not None else min(r["cv_mae"] for r in deployable) * (1 + tolerance)
+    eligible = [r for r in deployable if r["cv_mae"] <= bar]
+    if not eligible:
+        raise ValueError(f"No candidate reaches the accuracy bar (CV MAE <= {bar:.4f})")
+    return min(eligible, key=lambda r: (r["batch_ms_per_1k_rows"], r["size_bytes"]))
+
+
+def print_report(results: List[dict], selected: dict):
+    print(f"{'model':<10} {'cv_mae':>10} {'cv_r2':>8} {'fit_s':>7} {'ms/1k rows':>11} {'1-row ms':>9} {'size_kb':>9}")
+    for r in sorted(results, key=lambda r: r["cv_mae"]):
+        marker = "  <- selected" if r["name"] == selected["name"] else ("" if r["deployable"] else "  (baseline)")
+        print(f"{r['name']:<10} {r['cv_mae']:>10.5f} {r['cv_r2']:>8.3f} {r['fit_seconds']:>7.3f} "
+              f"{r['batch_ms_per_1k_rows']:>11.3f} {r['single_row_ms']:>9.3f} {r['size_bytes'] / 1024:>9.1f}{marker}")
+
+
+def train_and_save_model(data_paths: List[str] = None, output: str = MODEL_OUTPUT, folds: int = 5,
+                         n_jobs: int = -1, max_mae: Optional[float] = None, tolerance: float = 0.05,
+                         cache_dir: Optional[str] = CACHE_DIR) -> dict:
+    data_paths = data_paths or sorted(glob.glob(DEFAULT_DATA))
+    if not data_paths:
+        raise FileNotFoundError(f"No training data found (looked for {DEFAULT_DATA}); "
+                                f"run generate_sample_data.py first")
+    df = load_training_data(data_paths)
+    X = df[FEATURES].to_numpy(np.float32)
+    y = df[TARGET].to_numpy(np.float64)
+    folds = min(folds, len(df))
+    print(f"Training on {len(df)} rows from {len(data_paths)} file(s), {folds}-fold CV")
 
-# Ensure the directory exists
-os.makedirs("data/models", exist_ok=True)
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    results, fitted = search_models(X, y, candidate_models(), folds=folds, n_jobs=n_jobs, cache_dir=cache_dir)
+    for result in results:
+        model = fitted[result["name"]]
+        result.update(measure_inference(model, X))
+        result["size_bytes"] = artifact_size(model)
+        result["deployable"] = isinstance(model, RandomForestRegressor)
 
-def train_and_save_model():
-    # Load sample data
-    df = pd.read_csv("data/sample_network_data/network_stats.csv")
-    features = df[['bandwidth', 'latency', 'signal_strength']]
-    target = df['uptime']
+    selected = select_model(results, max_mae, tolerance)
+    print_report(results, selected)
 
-    # Train model
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
-    model.fit(features, target)
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    metrics = {k: selected[k] for k in ("cv_mae", "cv_r2", "batch_ms_per_1k_rows", "size_bytes")}
+    data_hash = dataset_hash(df)
+    save_model_artifact(fitted[selected["name"]], output, FEATURES, training_data_hash=data_hash,
+                        extra={"candidate": selected["name"], "metrics": metrics})
+    report_path = os.path.splitext(output)[0] + ".report.json"
+    with open(report_path, "w") as f:
+        json.dump({"data": data_paths, "rows": len(df), "selected": selected["name"], "results": results}, f, indent=2)
+    print(f"Saved {selected['name']} to {output} (report: {report_path})")
+    print(f"Training data hash: {data_hash} (set MODEL_DATA_HASH to reject models trained on other data)")
+    return selected
 
-    # Save model
-    with open("data/models/network_predictor.pkl", "wb") as f:
-        pickle.dump(model, f)
-    print("Trained and saved network_predictor.pkl")
 
 if __name__ == "__main__":
-    train_and_save_model()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train the network uptime model.")
+    parser.add_argument("--data", nargs="+", default=None,
+                        help=f"Training data (.csv, .parquet or .arrow/.feather); default {DEFAULT_DATA}")
+    parser.add_argument("--output", default=MODEL_OUTPUT, help="Model artifact path")
+    parser.add_argument("--folds", type=int, default=5, help="Cross-validation folds")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Worker processes (-1: all cores)")
+    parser.add_argument("--max-mae", type=float, default=None,
+                        help="Accuracy bar: maximum CV mean absolute error (default: best MAE + tolerance)")
+    parser.add_argument("--tolerance", type=float, default=0.05,
+                        help="Relative slack over the best CV MAE when --max-mae is not given")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="joblib cache for CV results and fits")
+    args = parser.parse_args()
+    train_and_save_model(args.data, args.output, args.folds, args.n_jobs, args.max_mae, args.tolerance,
+                         args.cache_dir)
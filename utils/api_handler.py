@@ -1,21 +1,186 @@
 # utils/api_handler.py
-import google.generativeai as genai
-import requests
+import abc
+import asyncio
+import concurrent.futures
 import logging
-from typing import Dict, Any, Union, List
+import random
+import threading
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Any, Optional, Tuple, Union, List
 from PIL import Image
 import mimetypes
 import os
-from config.settings import GEMINI_MODEL
+from config.settings import (GEMINI_MODEL, GEMINI_MAX_CONCURRENCY, GEMINI_TIMEOUT, GEMINI_MAX_RETRIES,
+                             RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_PATH,
+                             WEATHER_API_URL, WEATHER_CACHE_TTL)
+from utils.cache import ResponseCache, TTLCache, file_digest
+from utils.context_manager import render_context
+from utils.metrics import count, metrics, timed
 
 logger = logging.getLogger(__name__)
 
 
+class GenerationError(RuntimeError):
+    """The model call failed; raised to the caller instead of being returned as an answer."""
+
+
+class WeatherError(RuntimeError):
+    """The weather lookup failed."""
+
+
+class GenerationBackend(abc.ABC):
+    """Interface for the model behind GeminiHandler; swap in a fake for local testing."""
+
+    # Exceptions worth retrying (in addition to timeouts)
+    retryable_exceptions: Tuple[type, ...] = ()
+
+    @abc.abstractmethod
+    async def stream(self, contents: List[Any]) -> AsyncIterator[str]:
+        """Yield response text chunks as the model produces them.
+
+        Closing the generator early (e.g. on a timeout) must stop the work behind it.
+        """
+        yield ""
+
+
+class _SharedSemaphore:
+    """Counting semaphore shared by every thread and event loop of the process.
+
+    A waiter parks on a future of its own event loop, and ``release`` hands the
+    slot straight to the oldest waiter, so nothing polls.
+    """
+
+    def __init__(self, value: int):
+        self._value = value
+        self._lock = threading.Lock()
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+
+    async def acquire(self, timeout: Optional[float] = None):
+        """Wait for a slot; raises ``asyncio.TimeoutError`` after ``timeout`` seconds."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._value > 0:
+                self._value -= 1
+                return
+            waiter = loop.create_future()
+            self._waiters.append((loop, waiter))
+        try:
+            # shield: only release() completes the waiter, so a granted slot is never lost
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except BaseException:
+            with self._lock:
+                granted = (loop, waiter) not in self._waiters
+                if not granted:
+                    self._waiters.remove((loop, waiter))
+            if granted:
+                waiter.add_done_callback(lambda _: self.release())  # give back the slot once it lands
+            raise
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                loop, waiter = self._waiters.popleft()
+                try:
+                    loop.call_soon_threadsafe(waiter.set_result, None)
+                    return
+                except RuntimeError:  # that waiter's loop has closed
+                    continue
+            self._value += 1
+
+
+class GeminiBackend(GenerationBackend):
+    """Google Gemini via google.generativeai, streamed from a worker thread.
+
+    The SDK takes over a second to import, so it is loaded on the first request
+    (in the worker pool) rather than when the app starts.
+    """
+
+    def __init__(self, api_key: str, model_name: str = GEMINI_MODEL, max_workers: int = GEMINI_MAX_CONCURRENCY,
+                 timeout: float = GEMINI_TIMEOUT):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.timeout = timeout  # per SDK call, so an abandoned call does not hold a worker for long
+        self._model = None
+        self._model_lock = threading.Lock()
+        # A dedicated pool: the blocking SDK iterator never occupies the caller's event loop
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                               thread_name_prefix="gemini")
+
+    @property
+    def retryable_exceptions(self) -> Tuple[type, ...]:
+        # Only evaluated when a call has failed, by which time the SDK is loaded
+        from google.api_core import exceptions as google_exceptions
+        return (
+            google_exceptions.ResourceExhausted,
+            google_exceptions.ServiceUnavailable,
+            google_exceptions.DeadlineExceeded,
+            google_exceptions.InternalServerError,
+        )
+
+    @property
+    def model(self):
+        with self._model_lock:
+            if self._model is None:
+                import google.generativeai as genai
+                genai.configure(api_key=self.api_key)
+                self._model = genai.GenerativeModel(self.model_name)
+            return self._model
+
+    async def stream(self, contents: List[Any]) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        cancelled = threading.Event()
+        done = object()
+
+        def put(item):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:  # consumer's loop already closed
+                cancelled.set()
+
+        def produce():
+            # The consumer sets ``cancelled`` when it stops (timeout, error, early close); the SDK call
+            # itself cannot be interrupted, so the flag is checked before it starts and between chunks
+            if cancelled.is_set():
+                return
+            try:
+                response = self.model.generate_content(contents, stream=True,
+                                                       request_options={"timeout": self.timeout})
+                for chunk in response:
+                    if cancelled.is_set():
+                        return
+                    put(chunk.text)
+                put(done)
+            except Exception as e:
+                if not cancelled.is_set():
+                    put(e)
+
+        self._executor.submit(produce)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                if item:
+                    yield item
+        finally:
+            cancelled.set()
+
+
 class GeminiHandler:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, backend: GenerationBackend = None,
+                 max_concurrency: int = GEMINI_MAX_CONCURRENCY, timeout: float = GEMINI_TIMEOUT,
+                 max_retries: int = GEMINI_MAX_RETRIES, cache: ResponseCache = None):
         self.api_key = api_key
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(GEMINI_MODEL)
+        self.backend = backend or GeminiBackend(api_key, timeout=timeout)
+        self.cache = cache or ResponseCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL,
+                                            path=RESPONSE_CACHE_PATH or None)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        # Process-wide cap; the handler is shared by sessions running on different threads/loops
+        self._semaphore = _SharedSemaphore(max_concurrency)
 
     def _process_file_input(self, file_path: str) -> Union[str, Image.Image, None]:
         """Process uploaded files based on MIME type."""
@@ -29,50 +194,248 @@ class GeminiHandler:
                 return f.read()
         return None
 
+    def _build_contents(self, prompt: str, file_path: str = None,
+                        context: List[Dict] = None) -> Optional[List[Any]]:
+        """Model request contents, or None when the file type is unsupported."""
+        text = render_context(context, prompt)
+        if not file_path:
+            return [text]
+        content = self._process_file_input(file_path)
+        if content is None:
+            return None
+        if isinstance(content, Image.Image):
+            return [text, content]
+        return [text, str(content)]
+
     async def generate_response(self, prompt: str, file_path: str = None, context: List[Dict] = None) -> str:
         """Generate a response using Gemini API."""
+        chunks = [chunk async for chunk in self.stream_response(prompt, file_path, context)]
+        return "".join(chunks)
+
+    async def stream_response(self, prompt: str, file_path: str = None,
+                              context: List[Dict] = None) -> AsyncIterator[str]:
+        """Stream a response chunk by chunk as the model generates it.
+
+        Calls are capped by a process-wide semaphore, bounded by ``timeout`` and
+        retried with exponential backoff while no text has been emitted yet.
+        Failures raise ``GenerationError`` (chunks already yielded stay valid).
+        """
         try:
             if not context:
                 context = []
 
-            if file_path:
-                content = self._process_file_input(file_path)
-                if content is None:
-                    return "Unsupported file type."
-                if isinstance(content, Image.Image):
-                    response = self.model.generate_content([prompt, content])
-                else:
-                    response = self.model.generate_content([prompt, str(content)])
-            else:
-                response = self.model.generate_content(prompt)
-
-            return response.text
+            contents = self._build_contents(prompt, file_path, context)
+            if contents is None:
+                yield "Unsupported file type."
+                return
+
+            # Repeat questions about the same file in the same context are answered from cache
+            cache_key = self.cache.make_key(prompt, file_digest(file_path) if file_path else None, context)
+            cached = self.cache.get(cache_key)
+            count("gemini.cache", result="miss" if cached is None else "hit")
+            if cached is not None:
+                yield cached
+                return
+
+            with timed("gemini.queue_wait"):
+                await self._acquire()
+            try:
+                attempt = 0
+                while True:
+                    chunks = []
+                    try:
+                        with timed("gemini.request"):
+                            start = asyncio.get_running_loop().time()
+                            async for chunk in self._stream_with_timeout(contents):
+                                if not chunks:
+                                    metrics.observe("gemini.first_chunk", asyncio.get_running_loop().time() - start)
+                                chunks.append(chunk)
+                                yield chunk
+                        self.cache.set(cache_key, "".join(chunks))
+                        return
+                    except (asyncio.TimeoutError, *self.backend.retryable_exceptions) as e:
+                        if chunks or attempt >= self.max_retries:
+                            raise
+                        delay = min(2 ** attempt, 30) * (0.5 + random.random() / 2)
+                        logger.warning(f"Gemini call failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                        count("gemini.retries", type=type(e).__name__)
+                        attempt += 1
+                        await asyncio.sleep(delay)
+            finally:
+                self._semaphore.release()
         except Exception as e:
-            logger.error(f"Gemini API error: {str(e)}")
-            return f"Error processing request: {str(e)}"
+            message = str(e) or type(e).__name__
+            logger.error(f"Gemini API error: {message}")
+            raise GenerationError(f"Error processing request: {message}") from e
+
+    def cache_stats(self) -> Dict[str, float]:
+        return self.cache.stats()
+
+    async def _stream_with_timeout(self, contents: List[Any]) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        stream = self.backend.stream(contents)
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), max(deadline - loop.time(), 0))
+                except StopAsyncIteration:
+                    return
+                yield chunk
+        finally:
+            await stream.aclose()
+
+    async def _acquire(self):
+        """Wait for a concurrency slot without blocking the event loop."""
+        try:
+            await self._semaphore.acquire(self.timeout)
+        except asyncio.TimeoutError:
+            raise asyncio.TimeoutError("Timed out waiting for a free Gemini slot") from None
 
 
 class WeatherHandler:
-    def __init__(self, api_key: str):
+    """OpenWeather client with a pooled aiohttp session, TTL cache and request coalescing.
+
+    All network I/O runs on one background event loop owned by the handler, so the
+    connection pool, cache and in-flight requests are shared by every caller in the
+    process regardless of which thread or event loop it runs on.
+    """
+
+    def __init__(self, api_key: str, base_url: str = WEATHER_API_URL, timeout: float = 10.0,
+                 cache_ttl: float = WEATHER_CACHE_TTL, max_connections: int = 20):
         self.api_key = api_key
-        self.base_url = "https://api.openweathermap.org/data/2.5/weather"
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._cache = TTLCache(maxsize=4096, ttl=cache_ttl)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session = None
+        self._lock = threading.Lock()
 
     def get_weather_info(self, query: str) -> str:
-        """Fetch weather info for a location."""
+        """Fetch weather info for a location (blocking)."""
+        return self._submit(self._weather_info(query)).result()
+
+    async def get_weather_info_async(self, query: str) -> str:
+        """Fetch weather info for a location without blocking the caller's event loop."""
+        return await asyncio.wrap_future(self._submit(self._weather_info(query)))
+
+    async def get_weather_batch(self, locations: List[Union[str, Tuple[float, float]]]) -> List[Optional[Dict[str, Any]]]:
+        """Fetch raw weather data for many cities or (lat, lon) node locations concurrently.
+
+        Results are aligned with ``locations``; failed lookups are ``None``.
+        """
+        return await asyncio.wrap_future(self._submit(self._fetch_many(locations)))
+
+    def close(self):
+        """Close the connection pool and stop the background loop."""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._session is not None:
+            asyncio.run_coroutine_threadsafe(self._session.close(), loop).result()
+            self._session = None
+        loop.call_soon_threadsafe(loop.stop)
+
+    def cache_stats(self) -> Dict[str, float]:
+        return self._cache.stats()
+
+    def _submit(self, coro) -> concurrent.futures.Future:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="weather-io", daemon=True).start()
+            return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    async def _weather_info(self, query: str) -> str:
+        import aiohttp
+
         try:
             city = self._extract_city(query)
-            params = {"q": city, "appid": self.api_key, "units": "metric"}
-            response = requests.get(self.base_url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            return self._format_weather_response(data)
-        except requests.RequestException as e:
+            data = await self._fetch(city)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             logger.error(f"Weather API error: {str(e)}")
-            return f"Error fetching weather: {str(e)}"
+            raise WeatherError(f"Error fetching weather: {str(e) or type(e).__name__}") from e
+        try:
+            return self._format_weather_response(data)
+        except (KeyError, IndexError, TypeError) as e:
+            logger.error(f"Unexpected weather API response for {city}: {e!r}")
+            raise WeatherError(f"Incomplete weather data for {city}") from e
+
+    async def _fetch_many(self, locations: List[Union[str, Tuple[float, float]]]) -> List[Optional[Dict[str, Any]]]:
+        results = await asyncio.gather(*(self._fetch(location) for location in locations), return_exceptions=True)
+        for location, result in zip(locations, results):
+            if isinstance(result, Exception):
+                logger.error(f"Weather API error for {location}: {str(result)}")
+        return [None if isinstance(result, Exception) else result for result in results]
+
+    async def _fetch(self, location: Union[str, Tuple[float, float]]) -> Dict[str, Any]:
+        """Cached, coalesced lookup; runs on the handler's loop."""
+        key = self._cache_key(location)
+        cached = self._cache.get(key)
+        if cached is not None:
+            count("weather.cache", result="hit")
+            return cached
+
+        # Identical requests already on the wire share a single round trip
+        pending = self._inflight.get(key)
+        if pending is not None:
+            count("weather.cache", result="coalesced")
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():  # this caller was cancelled
+                    raise
+                # The caller that owned the request was cancelled; make the request ourselves
+                return await self._fetch(location)
+
+        count("weather.cache", result="miss")
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            with timed("weather.request"):
+                data = await self._request(location)
+            self._cache.set(key, data)
+            future.set_result(data)
+            return data
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else is waiting
+            raise
+        finally:
+            del self._inflight[key]
+            if not future.done():  # cancelled mid-request: release the coalesced waiters
+                future.cancel()
+
+    async def _request(self, location: Union[str, Tuple[float, float]]) -> Dict[str, Any]:
+        import aiohttp  # imported on the first lookup; it is not needed until then
+
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        params = {"appid": self.api_key, "units": "metric"}
+        if isinstance(location, str):
+            params["q"] = location
+        else:
+            params["lat"], params["lon"] = location
+        async with self._session.get(self.base_url, params=params) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    @staticmethod
+    def _cache_key(location: Union[str, Tuple[float, float]]) -> str:
+        if isinstance(location, str):
+            return " ".join(location.lower().split())
+        lat, lon = location
+        return f"{lat:.2f},{lon:.2f}"
 
     def _extract_city(self, query: str) -> str:
         """Extract city name from query."""
-        words = query.lower().split()
+        words = query.lower().strip(" ?!.").split()
         try:
             idx = words.index("in")
             return " ".join(words[idx + 1:])
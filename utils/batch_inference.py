@@ -0,0 +1,181 @@
+# utils/batch_inference.py
+import concurrent.futures
+import copy
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, Optional, Union
+
+import numpy as np
+import pandas as pd
+from utils.metrics import metrics
+from utils.network_analyzer import FEATURE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+
+class BatchScorer:
+    """Micro-batching inference service around a fitted model.
+
+    Requests from concurrent sessions are queued; a worker thread drains the queue
+    into one batch (up to ``max_batch_rows`` rows or ``max_wait_ms`` after the first
+    request), scores it with a single ``predict`` call using all cores, and hands
+    each caller its slice of the result. Inputs and outputs stay NumPy arrays.
+    Predictions come from a shallow copy of ``model`` (the fitted trees are
+    shared), so setting its ``n_jobs`` leaves the caller's model untouched.
+    """
+
+    def __init__(self, model, max_batch_rows: int = 65_536, max_wait_ms: float = 5.0, n_jobs: int = -1):
+        self.model = model
+        self._estimator = model
+        if hasattr(model, "n_jobs"):
+            self._estimator = copy.copy(model)
+            self._estimator.n_jobs = n_jobs
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue" = queue.Queue()
+        self._latencies = deque(maxlen=10_000)
+        self._rows = 0
+        self._batches = 0
+        self._predict_seconds = 0.0
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="batch-scorer", daemon=True)
+        self._thread.start()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def submit(self, features: Union[pd.DataFrame, np.ndarray]) -> concurrent.futures.Future:
+        """Queue rows for scoring; the future resolves to a 1-D array of predictions."""
+        X = self._as_array(features)
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        # Under the lock, so nothing can be queued behind close()'s stop sentinel
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("BatchScorer is closed.")
+            self._queue.put((X, future, time.perf_counter()))
+        return future
+
+    def predict(self, features: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+        """Blocking convenience wrapper around ``submit``."""
+        return self.submit(features).result()
+
+    def score_chunks(self, chunks: Iterable[pd.DataFrame], out_path: Optional[str] = None) -> np.ndarray:
+        """Score a stream of chunks out-of-core, bypassing the micro-batch queue.
+
+        With ``out_path`` predictions are appended to a raw float32 file and returned
+        as a read-only memory map, so neither input nor output has to fit in RAM.
+        """
+        if out_path is None:
+            parts = [self._timed_predict(self._as_array(chunk)) for chunk in chunks]
+            return np.concatenate(parts) if parts else np.empty(0, dtype=np.float64)
+
+        with open(out_path, "wb") as f:
+            for chunk in chunks:
+                self._timed_predict(self._as_array(chunk)).astype(np.float32).tofile(f)
+        if os.path.getsize(out_path) == 0:
+            return np.empty(0, dtype=np.float32)
+        return np.memmap(out_path, dtype=np.float32, mode="r")
+
+    def stats(self) -> Dict[str, float]:
+        """Throughput and request latency percentiles since start-up."""
+        latencies = np.asarray(self._latencies, dtype=np.float64) * 1000
+        return {
+            "rows": self._rows,
+            "batches": self._batches,
+            "rows_per_sec": self._rows / self._predict_seconds if self._predict_seconds else 0.0,
+            "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+            "p95_ms": float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+        }
+
+    def close(self):
+        """Stop the worker after the queued requests have been served."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+        self._fail_pending()
+
+    def _fail_pending(self):
+        # Anything still queued once the worker has stopped would otherwise never resolve
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(RuntimeError("BatchScorer is closed."))
+
+    @staticmethod
+    def _as_array(features: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+        if isinstance(features, pd.DataFrame):
+            features = features[FEATURE_COLUMNS].to_numpy()
+        # Trees split on float32 anyway; converting once here avoids a copy per tree
+        return np.ascontiguousarray(features, dtype=np.float32)
+
+    def _timed_predict(self, X: np.ndarray) -> np.ndarray:
+        if len(X) == 0:
+            return np.empty(0, dtype=np.float64)
+        start = time.perf_counter()
+        # Keep column names so models fitted on DataFrames don't warn; no data copy
+        predictions = self._estimator.predict(pd.DataFrame(X, columns=FEATURE_COLUMNS, copy=False))
+        seconds = time.perf_counter() - start
+        metrics.observe("scorer.predict", seconds)
+        metrics.increment("scorer.rows", len(X))
+        with self._lock:
+            self._predict_seconds += seconds
+            self._rows += len(X)
+            self._batches += 1
+        return predictions
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            rows = len(item[0])
+            deadline = time.perf_counter() + self.max_wait
+            stop = False
+            while rows < self.max_batch_rows:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+                rows += len(item[0])
+
+            # Drop requests cancelled while queued; the rest can no longer be cancelled
+            batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+            if not batch:
+                if stop:
+                    return
+                continue
+            try:
+                predictions = self._timed_predict(np.concatenate([X for X, _, _ in batch]))
+                offsets = np.cumsum([len(X) for X, _, _ in batch])[:-1]
+                now = time.perf_counter()
+                for (_, future, submitted), result in zip(batch, np.split(predictions, offsets)):
+                    self._latencies.append(now - submitted)
+                    metrics.observe("scorer.request", now - submitted)
+                    future.set_result(result)
+            except Exception as e:
+                logger.error(f"Error scoring batch: {str(e)}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            if stop:
+                return
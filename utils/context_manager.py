@@ -1,29 +1,130 @@
 # utils/context_manager.py
-from typing import List, Dict
+from collections import deque
+from typing import Callable, Deque, Dict, List
 import logging
-from config.settings import MAX_CONTEXT_LENGTH
+from config.settings import MAX_CONTEXT_LENGTH, MAX_CONTEXT_TOKENS, MAX_SUMMARY_TOKENS
+from utils.conversation_store import ConversationStore
+from utils.metrics import timed
 
 logger = logging.getLogger(__name__)
 
+CHARS_PER_TOKEN = 4  # rough estimate, good enough for budgeting
+SUMMARY_SNIPPET_CHARS = 120
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate from the character count."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def summarize_turn(user_input: str, bot_response: str) -> str:
+    """Default extractive compaction: the start of each side of a turn."""
+    def snippet(text: str) -> str:
+        text = " ".join(text.split())
+        return text if len(text) <= SUMMARY_SNIPPET_CHARS else text[:SUMMARY_SNIPPET_CHARS] + "…"
+    return f"- User asked: {snippet(user_input)} / Assistant: {snippet(bot_response)}"
+
+
+def render_context(context: List[Dict[str, str]], prompt: str) -> str:
+    """Render conversation context and the new prompt into a single model request text."""
+    if not context:
+        return prompt
+    labels = {"system": "Earlier conversation (summary)", "user": "User", "assistant": "Assistant"}
+    parts = ["Conversation so far:"]
+    parts.extend(f"{labels.get(message['role'], message['role'])}: {message['content']}" for message in context)
+    parts.append(f"\nUser: {prompt}")
+    return "\n".join(parts)
+
+
 class ConversationManager:
-    def __init__(self):
-        self.context: List[Dict[str, str]] = []
+    """Bounded conversation buffer.
+
+    Turns live in a deque so adding and evicting are O(1). The buffer is limited by
+    both a turn count (``MAX_CONTEXT_LENGTH``) and a token budget; turns pushed out
+    are compacted into a short running summary instead of being dropped outright.
+
+    With a ``store`` and ``session_id`` every turn is also persisted, and the
+    buffer is rebuilt from the most recent stored turns on construction.
+    """
+
+    def __init__(self, max_tokens: int = MAX_CONTEXT_TOKENS, max_summary_tokens: int = MAX_SUMMARY_TOKENS,
+                 summarizer: Callable[[str, str], str] = summarize_turn, store: ConversationStore = None,
+                 session_id: str = None):
+        self.context: Deque[Dict[str, str]] = deque()
         self.max_context_length = MAX_CONTEXT_LENGTH
+        self.max_tokens = max_tokens
+        self.max_summary_tokens = max_summary_tokens
+        self.summarizer = summarizer
+        self.summary: Deque[str] = deque()
+        self._tokens = 0
+        self._summary_tokens = 0
+        self.store = store
+        self.session_id = session_id
+        if store is not None and session_id:
+            self._restore()
+
+    def _restore(self):
+        """Rebuild the buffer from the tail of the stored history (never the full history)."""
+        with timed("conversation.store_load"):
+            recent = self.store.load_recent(self.session_id, self.max_context_length * 2)
+        if len(recent) % 2:
+            recent = recent[1:]
+        for user, assistant in zip(recent[::2], recent[1::2]):
+            self._add(user["content"], assistant["content"])
 
     def add_to_context(self, user_input: str, bot_response: str):
         """Add user input and bot response to context."""
         try:
-            self.context.append({"role": "user", "content": user_input})
-            self.context.append({"role": "assistant", "content": bot_response})
-            if len(self.context) > self.max_context_length * 2:
-                self.context = self.context[-self.max_context_length * 2:]
+            self._add(user_input, bot_response)
+            if self.store is not None and self.session_id:
+                with timed("conversation.store_append"):
+                    self.store.append(self.session_id, [{"role": "user", "content": user_input},
+                                                        {"role": "assistant", "content": bot_response}])
         except Exception as e:
             logger.error(f"Error adding to context: {str(e)}")
 
+    def _add(self, user_input: str, bot_response: str):
+        # A single oversized message may use at most half of the budget
+        limit = self.max_tokens * CHARS_PER_TOKEN // 2
+        for role, content in (("user", user_input), ("assistant", bot_response)):
+            if len(content) > limit:
+                content = content[:limit] + "…"
+            self.context.append({"role": role, "content": content})
+            self._tokens += estimate_tokens(content)
+
+        while len(self.context) > 2 and (len(self.context) > self.max_context_length * 2
+                                         or self._tokens > self.max_tokens):
+            self._compact_oldest_turn()
+
+    def _compact_oldest_turn(self):
+        user = self.context.popleft()
+        assistant = self.context.popleft()
+        self._tokens -= estimate_tokens(user["content"]) + estimate_tokens(assistant["content"])
+
+        line = self.summarizer(user["content"], assistant["content"])
+        self.summary.append(line)
+        self._summary_tokens += estimate_tokens(line)
+        while len(self.summary) > 1 and self._summary_tokens > self.max_summary_tokens:
+            self._summary_tokens -= estimate_tokens(self.summary.popleft())
+
     def get_context(self) -> List[Dict[str, str]]:
-        """Retrieve current conversation context."""
-        return self.context
+        """Retrieve current conversation context (summary of older turns first)."""
+        context = list(self.context)
+        if self.summary:
+            context.insert(0, {"role": "system", "content": "\n".join(self.summary)})
+        return context
+
+    def render_prompt(self, prompt: str) -> str:
+        """The new prompt with the bounded context rendered in front of it."""
+        return render_context(self.get_context(), prompt)
+
+    def token_count(self) -> int:
+        """Estimated tokens the context adds to a request."""
+        return self._tokens + self._summary_tokens
 
     def clear_context(self):
         """Clear the conversation context."""
-        self.context = []
\ No newline at end of file
+        self.context.clear()
+        self.summary.clear()
+        self._tokens = 0
+        self._summary_tokens = 0
@@ -0,0 +1,168 @@
+# utils/conversation_store.py
+import abc
+import hashlib
+import hmac
+import json
+import logging
+import secrets
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+from config.settings import CONVERSATION_STORE, CONVERSATION_DB_PATH, REDIS_URL
+
+logger = logging.getLogger(__name__)
+
+_process_secret = secrets.token_bytes(32)
+
+
+def _signature(session_id: str, secret: str) -> str:
+    key = secret.encode() if secret else _process_secret
+    return hmac.new(key, session_id.encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def new_session_token(secret: str = "") -> str:
+    """A fresh session id with its signature, ``<id>.<hmac>``, safe to put in a URL."""
+    session_id = uuid.uuid4().hex
+    return f"{session_id}.{_signature(session_id, secret)}"
+
+
+def verify_session_token(token: Optional[str], secret: str = "") -> Optional[str]:
+    """The session id of a token minted by ``new_session_token`` with the same secret, else None."""
+    session_id, _, signature = (token or "").partition(".")
+    if not session_id or not hmac.compare_digest(signature, _signature(session_id, secret)):
+        return None
+    return session_id
+
+
+class ConversationStore(abc.ABC):
+    """Append-only message history, indexed by session id.
+
+    Messages of a session are numbered 0..n-1 in insertion order; ``load`` returns
+    a slice of that sequence so callers can page through long histories.
+    """
+
+    @abc.abstractmethod
+    def append(self, session_id: str, messages: List[Dict[str, str]]):
+        """Append messages (dicts with ``role`` and ``content``) to a session."""
+
+    @abc.abstractmethod
+    def count(self, session_id: str) -> int:
+        """Number of messages stored for a session."""
+
+    @abc.abstractmethod
+    def load(self, session_id: str, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, str]]:
+        """Messages ``offset``..``offset + limit`` of a session, oldest first."""
+
+    def load_recent(self, session_id: str, limit: int) -> List[Dict[str, str]]:
+        """The last ``limit`` messages of a session, oldest first."""
+        return self.load(session_id, max(self.count(session_id) - limit, 0), limit)
+
+
+class InMemoryConversationStore(ConversationStore):
+    """Process-local store; history is lost on restart."""
+
+    def __init__(self):
+        self._sessions: Dict[str, List[Dict[str, str]]] = {}
+        self._lock = threading.Lock()
+
+    def append(self, session_id: str, messages: List[Dict[str, str]]):
+        with self._lock:
+            self._sessions.setdefault(session_id, []).extend(dict(m) for m in messages)
+
+    def count(self, session_id: str) -> int:
+        return len(self._sessions.get(session_id, []))
+
+    def load(self, session_id: str, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, str]]:
+        history = self._sessions.get(session_id, [])
+        end = None if limit is None else offset + limit
+        return [dict(m) for m in history[offset:end]]
+
+
+class SQLiteConversationStore(ConversationStore):
+    """Single-file store shared by every worker process on the host (WAL mode)."""
+
+    def __init__(self, path: str = CONVERSATION_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        # Autocommit mode; append() manages its own transaction
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10.0, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "session_id TEXT NOT NULL, seq INTEGER NOT NULL, role TEXT NOT NULL, content TEXT NOT NULL, "
+            "created_at REAL NOT NULL, PRIMARY KEY (session_id, seq))"
+        )
+
+    def append(self, session_id: str, messages: List[Dict[str, str]]):
+        now = time.time()
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock, so seq numbers stay dense across processes
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                start = self._conn.execute(
+                    "SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE session_id = ?", (session_id,)
+                ).fetchone()[0]
+                self._conn.executemany(
+                    "INSERT INTO messages (session_id, seq, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
+                    [(session_id, start + i, m["role"], m["content"], now) for i, m in enumerate(messages)],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def count(self, session_id: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+
+    def load(self, session_id: str, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, str]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT role, content FROM messages WHERE session_id = ? AND seq >= ? ORDER BY seq LIMIT ?",
+                (session_id, offset, -1 if limit is None else limit),
+            ).fetchall()
+        return [{"role": role, "content": content} for role, content in rows]
+
+
+class RedisConversationStore(ConversationStore):
+    """One Redis list per session; works with any client exposing rpush/llen/lrange."""
+
+    def __init__(self, client: Any = None, url: str = REDIS_URL, prefix: str = "neuralnexus:conversation:"):
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise ImportError("The redis package is required for the Redis conversation store") from e
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.prefix}{session_id}"
+
+    def append(self, session_id: str, messages: List[Dict[str, str]]):
+        self.client.rpush(self._key(session_id), *(json.dumps(m) for m in messages))
+
+    def count(self, session_id: str) -> int:
+        return int(self.client.llen(self._key(session_id)))
+
+    def load(self, session_id: str, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, str]]:
+        end = -1 if limit is None else offset + limit - 1
+        if limit == 0:
+            return []
+        return [json.loads(raw) for raw in self.client.lrange(self._key(session_id), offset, end)]
+
+
+def create_conversation_store(backend: str = CONVERSATION_STORE) -> ConversationStore:
+    """Build the store configured by ``CONVERSATION_STORE`` (memory, sqlite or redis)."""
+    if backend == "memory":
+        return InMemoryConversationStore()
+    if backend == "sqlite":
+        return SQLiteConversationStore()
+    if backend == "redis":
+        return RedisConversationStore()
+    raise ValueError(f"Unknown conversation store backend: {backend}")
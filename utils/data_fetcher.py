@@ -1,16 +1,59 @@
 # utils/data_fetcher.py
+"""Network telemetry sources: sample data, one-shot API pulls and a streaming ingestion mode.
+
+``TelemetryStream`` polls an HTTP source page by page on its own event loop. The
+source is expected to answer ``GET <url>?limit=<n>[&cursor=<c>][&key=<api key>]``
+with JSON. The response is ``{"rows": [...], "next_cursor": ..., "has_more": bool}``,
+where ``rows`` is a list of records or a dict of column lists. Without
+``next_cursor`` every poll is treated as a fresh snapshot; a bare list is one
+page of rows.
+
+Fetched pages go through a bounded queue to a consumer, which scores them with
+``NetworkAnalyzer`` and appends them (with ``predicted_uptime``) to a fixed-size
+columnar ring buffer. When scoring falls behind, the queue fills up and the
+fetcher stops pulling until there is room, so memory stays bounded by
+``queue_pages`` pages plus the buffer. A page whose values cannot be converted
+(e.g. a non-ISO 8601 timestamp) is skipped and kept in ``quarantine`` for
+inspection; the stream carries on with the next page.
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import deque
 import requests
 import pandas as pd
 import numpy as np
 import logging
-from typing import Dict, Any
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from utils.metrics import count, metrics, timed
+
+if TYPE_CHECKING:
+    from utils.network_analyzer import NetworkAnalyzer
 
 logger = logging.getLogger(__name__)
 
+METRIC_COLUMNS = ['bandwidth', 'latency', 'signal_strength', 'uptime']
+FEATURE_COLUMNS = ['bandwidth', 'latency', 'signal_strength']
+BUFFER_COLUMNS = {
+    'node_id': object,
+    'timestamp': 'datetime64[ns]',
+    **{col: np.float32 for col in METRIC_COLUMNS},
+    'predicted_uptime': np.float32,
+}
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+QUARANTINE_PAGES = 8  # most recent malformed pages kept for inspection
+
+
+class TelemetryError(RuntimeError):
+    """The telemetry source failed (after retries) or returned an unreadable page."""
+
+
 class DataFetcher:
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, base_url: str = None):
         self.api_key = api_key
-        self.base_url = None  # Placeholder for real API (e.g., Giga API)
+        self.base_url = base_url  # e.g. a Giga API endpoint; see TelemetryStream for the expected format
 
     def fetch_network_data(self, source: str = "sample") -> pd.DataFrame:
         """Fetch network data from an API or generate sample data."""
@@ -46,4 +89,257 @@ class DataFetcher:
             return pd.DataFrame(data)
         except Exception as e:
             logger.error(f"Error generating sample data: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    def stream(self, analyzer: "NetworkAnalyzer" = None, **kwargs) -> "TelemetryStream":
+        """A streaming ingestor for ``base_url`` (not started); ``kwargs`` go to ``TelemetryStream``."""
+        if not self.base_url:
+            raise ValueError("API URL not configured.")
+        return TelemetryStream(self.base_url, analyzer=analyzer, api_key=self.api_key, **kwargs)
+
+
+class TelemetryBuffer:
+    """Fixed-capacity columnar ring buffer holding the newest ``capacity`` telemetry rows.
+
+    Each column is one preallocated NumPy array, so appends are slice copies and
+    memory does not grow; the oldest rows are overwritten first. Thread-safe.
+    """
+
+    def __init__(self, capacity: int, columns: Dict[str, Any] = None):
+        if capacity <= 0:
+            raise ValueError("Buffer capacity must be positive.")
+        self.capacity = capacity
+        self._columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in (columns or BUFFER_COLUMNS).items()}
+        self._next = 0  # write position
+        self._size = 0
+        self.total_rows = 0  # rows ever appended
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def dropped_rows(self) -> int:
+        return self.total_rows - self._size
+
+    def append(self, df: pd.DataFrame):
+        """Append a batch; columns missing from it are filled with NaN/NaT/None.
+
+        Every column is converted before any is written, so a batch that fails to
+        convert (``ValueError``/``TypeError``) leaves the buffer unchanged.
+        """
+        total = len(df)
+        if total > self.capacity:
+            df = df.iloc[total - self.capacity:]
+        n = len(df)
+        converted = {name: self._values(df, name, column.dtype, n) for name, column in self._columns.items()}
+        with self._lock:
+            self.total_rows += total
+            first = min(n, self.capacity - self._next)  # rows before wrapping around
+            for name, column in self._columns.items():
+                values = converted[name]
+                column[self._next:self._next + first] = values[:first]
+                column[:n - first] = values[first:]
+            self._next = (self._next + n) % self.capacity
+            self._size = min(self._size + n, self.capacity)
+
+    @staticmethod
+    def _values(df: pd.DataFrame, name: str, dtype: np.dtype, n: int) -> np.ndarray:
+        if name not in df.columns:
+            return np.full(n, np.datetime64("NaT") if dtype.kind == "M" else np.nan if dtype.kind == "f" else None,
+                           dtype=dtype)
+        if dtype.kind == "M":  # stored as naive UTC
+            return pd.to_datetime(df[name], format="ISO8601", utc=True).dt.tz_localize(None).to_numpy(dtype)
+        return df[name].to_numpy(dtype)
+
+    def to_frame(self, last: Optional[int] = None) -> pd.DataFrame:
+        """A copy of the buffered rows (or the newest ``last`` of them), oldest first."""
+        with self._lock:
+            n = self._size if last is None else min(last, self._size)
+            positions = (self._next - n + np.arange(n)) % self.capacity
+            return pd.DataFrame({name: column[positions] for name, column in self._columns.items()})
+
+
+class TelemetryStream:
+    """Continuous, paginated ingestion from an HTTP telemetry source into a ``TelemetryBuffer``.
+
+    ``start()`` runs the fetch/score pipeline on a background thread; ``run()`` is the
+    same pipeline as a coroutine (with ``until_caught_up`` it returns once the source
+    has no more rows, which is what tests and benchmarks use). Failed requests
+    (connection errors, timeouts, 429 and 5xx) are retried with exponential backoff;
+    other errors stop the stream and are kept in ``error``.
+    """
+
+    def __init__(self, url: str, analyzer: "NetworkAnalyzer" = None, api_key: str = None, page_size: int = 1000,
+                 poll_interval: float = 5.0, queue_pages: int = 8, buffer_rows: int = 100_000,
+                 timeout: float = 30.0, max_retries: int = 5, backoff: float = 1.0):
+        self.url = url
+        self.analyzer = analyzer  # swapped by the caller when the model reloads; read once per page
+        self.api_key = api_key
+        self.page_size = page_size
+        self.poll_interval = poll_interval
+        self.queue_pages = queue_pages
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.buffer = TelemetryBuffer(buffer_rows)
+        self.pages = 0
+        self.retries = 0
+        self.bad_pages = 0
+        self.quarantine: deque = deque(maxlen=QUARANTINE_PAGES)  # (error, page) of skipped pages
+        self.error: Optional[Exception] = None
+        self.started_at: Optional[float] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "TelemetryStream":
+        """Run the stream on a daemon thread (no-op if it is already running)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=lambda: asyncio.run(self.run()), name="telemetry", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, wait: bool = True):
+        loop, stopping = self._loop, self._stopping
+        if loop is not None and stopping is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(stopping.set)
+        if wait and self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(self.timeout)
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None
+
+    def stats(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        return {
+            "running": self.running,
+            "pages": self.pages,
+            "rows": self.buffer.total_rows,
+            "buffered_rows": len(self.buffer),
+            "dropped_rows": self.buffer.dropped_rows,
+            "queued_pages": self._queue.qsize() if self._queue is not None else 0,
+            "retries": self.retries,
+            "bad_pages": self.bad_pages,
+            "rows_per_sec": self.buffer.total_rows / elapsed if elapsed else 0.0,
+            "error": str(self.error) if self.error else None,
+        }
+
+    async def run(self, until_caught_up: bool = False):
+        """Fetch and score pages until ``stop()`` (or, with ``until_caught_up``, the source is drained)."""
+        import aiohttp  # imported when a stream starts; it is not needed until then
+
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        self._queue = asyncio.Queue(maxsize=self.queue_pages)
+        self.started_at, self.error = time.monotonic(), None
+        try:
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
+                consumer = asyncio.create_task(self._consume())
+                try:
+                    await self._produce(session, until_caught_up)
+                finally:
+                    await self._queue.put(None)  # lets the consumer drain what is queued, then stop
+                    await consumer
+        except Exception as e:
+            logger.error(f"Telemetry stream stopped: {str(e)}")
+            self.error = e
+            raise
+        finally:
+            self._loop = None
+
+    async def _produce(self, session, until_caught_up: bool):
+        cursor = None
+        while not self._stopping.is_set():
+            page, next_cursor, has_more = await self._fetch_page(session, cursor)
+            if len(page):
+                # Blocks while the queue is full: a slow consumer throttles fetching
+                with timed("ingest.queue_wait"):
+                    await self._queue.put(page)
+                metrics.observe("ingest.queue_depth", self._queue.qsize())
+            if next_cursor is not None:
+                cursor = next_cursor
+            if not has_more:
+                if until_caught_up:
+                    return
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        error = None
+        while True:
+            page = await self._queue.get()
+            if page is None:
+                break
+            if error is not None:
+                continue  # keep draining, so a producer waiting on the full queue can see the stop
+            try:
+                # Scoring is CPU-bound, so it runs off the event loop and fetching continues meanwhile
+                await loop.run_in_executor(None, self._process, page)
+            except (ValueError, TypeError) as e:
+                # Unconvertible values in one page; skip it rather than stop the stream
+                logger.warning(f"Skipping malformed telemetry page ({len(page)} rows): {str(e)}")
+                count("ingest.bad_pages")
+                self.bad_pages += 1
+                self.quarantine.append((str(e), page))
+            except Exception as e:
+                error = e
+                self._stopping.set()
+        if error is not None:
+            raise error
+
+    def _process(self, page: pd.DataFrame):
+        numeric = {col: np.float32 for col in METRIC_COLUMNS if col in page.columns}
+        if numeric:
+            page = page.astype(numeric)
+        analyzer = self.analyzer
+        # Without a trained model the rows are still buffered, just not scored
+        if analyzer is not None and analyzer.is_fitted() and all(col in page.columns for col in FEATURE_COLUMNS):
+            page['predicted_uptime'] = analyzer.predict_downtime(page[FEATURE_COLUMNS])
+        self.buffer.append(page)
+        self.pages += 1
+        count("ingest.pages")
+        count("ingest.rows", len(page))
+
+    async def _fetch_page(self, session, cursor) -> Tuple[pd.DataFrame, Any, bool]:
+        import aiohttp
+
+        params = {"limit": self.page_size}
+        if cursor is not None:
+            params["cursor"] = cursor
+        if self.api_key:
+            params["key"] = self.api_key
+        attempt = 0
+        while True:
+            try:
+                with timed("ingest.fetch"):
+                    async with session.get(self.url, params=params) as response:
+                        response.raise_for_status()
+                        payload = await response.json()
+                return self._parse_page(payload)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status = getattr(e, "status", None)
+                retryable = not isinstance(e, aiohttp.ClientResponseError) or status in RETRYABLE_STATUS
+                if not retryable or attempt >= self.max_retries:
+                    raise TelemetryError(f"Telemetry request failed: {str(e) or type(e).__name__}") from e
+                delay = min(self.backoff * 2 ** attempt, 30) * (0.5 + random.random() / 2)
+                logger.warning(f"Telemetry request failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                count("ingest.retries", type=type(e).__name__)
+                self.retries += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    def _parse_page(payload: Any) -> Tuple[pd.DataFrame, Any, bool]:
+        if isinstance(payload, list):
+            payload = {"rows": payload}
+        if not isinstance(payload, dict) or "rows" not in payload:
+            raise TelemetryError("Telemetry page has no 'rows'")
+        page = pd.DataFrame(payload["rows"])
+        next_cursor = payload.get("next_cursor")
+        return page, next_cursor, bool(payload.get("has_more", False)) and next_cursor is not None
@@ -0,0 +1,82 @@
+# utils/downsample.py
+"""Server-side downsampling of long series for plotting.
+
+A browser chart only needs roughly as many points as it has pixels. The
+functions here pick which indices of a long series to send, so charts of
+millions of predictions send a few thousand points. They return indices, not
+values, so callers keep the original x positions for hover and zoom.
+
+- ``minmax_indices`` keeps the lowest and highest point of every bucket, so
+  spikes and dips are never smoothed away. It is fully vectorized.
+
+Both keep the first and last point, so the plotted x range never shrinks.
+- ``lttb_indices`` (Largest-Triangle-Three-Buckets) keeps the point of each
+  bucket that best preserves the visual shape of the line.
+"""
+import numpy as np
+
+from utils.metrics import timed
+
+METHODS = ("minmax", "lttb")
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Sorted indices of the first and last point plus the min and max of equal buckets (all indices if short enough).
+
+    NaNs are never picked as a bucket's min or max unless the whole bucket is NaN.
+    """
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+    if n_out < 4:
+        return np.array([0, n - 1])
+    size = -(-n // ((n_out - 2) // 2))  # ceil: every bucket is non-empty
+    buckets = -(-n // size)
+    y = np.asarray(y, dtype=np.float64)
+    missing = np.isnan(y)
+    pad = buckets * size - n
+    # Padding and NaNs can only win a bucket that holds nothing else; ties go to the first (real) index
+    low = np.pad(np.where(missing, np.inf, y), (0, pad), constant_values=np.inf).reshape(buckets, size)
+    high = np.pad(np.where(missing, -np.inf, y), (0, pad), constant_values=-np.inf).reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    picks = np.concatenate([[0, n - 1], low.argmin(axis=1) + offsets, high.argmax(axis=1) + offsets])
+    return np.unique(picks)
+
+
+def lttb_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets over an evenly spaced x; always keeps the first and last point."""
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n) if n <= n_out else np.array([0, n - 1])
+    y = np.asarray(y, dtype=np.float64)
+    # n - 2 interior points split into n_out - 2 buckets
+    edges = (np.linspace(1, n - 1, n_out - 1)).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    # Centroid of each bucket (the "next bucket" average in the triangle area), ignoring NaNs
+    present = ~np.isnan(y[:n - 1])
+    sums = np.add.reduceat(np.where(present, y[:n - 1], 0.0), starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means_y = np.append(sums / np.add.reduceat(present, starts), y[-1])
+    means_x = np.append((starts + ends - 1) / 2.0, n - 1)
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    prev = 0
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        x = np.arange(start, end)
+        # Twice the triangle area (previous pick, candidate, next bucket centroid); the sign is irrelevant
+        area = np.abs((prev - means_x[i + 1]) * (y[start:end] - y[prev])
+                      - (prev - x) * (means_y[i + 1] - y[prev]))
+        prev = start + int(np.nan_to_num(area, nan=-1.0).argmax())  # a NaN point only wins an all-NaN bucket
+        selected[i + 1] = prev
+    return selected
+
+
+@timed("chart.downsample")
+def downsample(y: np.ndarray, n_out: int, method: str = "minmax") -> np.ndarray:
+    """Indices of at most ~``n_out`` points of ``y`` chosen by ``method`` ("minmax" or "lttb")."""
+    if method == "minmax":
+        return minmax_indices(y, n_out)
+    if method == "lttb":
+        return lttb_indices(y, n_out)
+    raise ValueError(f"Unknown downsampling method: {method} (expected one of {', '.join(METHODS)})")
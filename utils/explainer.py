@@ -0,0 +1,244 @@
+# utils/explainer.py
+"""Explanations for the uptime model: which features push a prediction up or down.
+
+Per-prediction attributions are tree-path contributions (Saabas). A tree's
+prediction is its root value plus the change in node value at every split on
+the way to the leaf, and each change is credited to that split's feature, so
+``prediction == bias + sum(contributions)`` holds exactly for every row. Each
+tree's node deltas are packed once into a sparse (nodes x features) matrix;
+explaining a batch is then ``decision_path @ deltas`` per tree, run on a thread
+pool over chunks of trees (sklearn's tree traversal releases the GIL).
+
+Global importance combines the mean absolute contribution, the forest's
+impurity importance and permutation importance (the drop in R^2 when one
+feature is shuffled). Permutation importance needs labelled data and many
+predictions, so it is cached next to the model artifact
+(``<model>.explanations.joblib``), keyed by the model's fingerprint and a hash
+of the evaluation sample. None of this touches the prediction path.
+"""
+import concurrent.futures
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import weakref
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from utils.metrics import count, timed
+from utils.model_artifact import TREE_LEAF, dataset_hash
+
+logger = logging.getLogger(__name__)
+
+EXPLANATIONS_SUFFIX = ".explanations.joblib"
+MAX_CACHED_MODELS = 8  # fingerprints kept in an explanations file; older models are dropped
+DEFAULT_SAMPLE_ROWS = 5_000
+ROW_BLOCK = 10_000  # rows per decision_path call, bounding the size of the sparse path matrix
+
+_explainers: "weakref.WeakKeyDictionary[Any, ModelExplainer]" = weakref.WeakKeyDictionary()
+_explainers_lock = threading.Lock()
+_cache_lock = threading.Lock()
+
+
+def _trees(model) -> Optional[list]:
+    estimators = getattr(model, "estimators_", None)
+    if isinstance(estimators, list) and estimators and all(hasattr(est, "tree_") for est in estimators):
+        return [est.tree_ for est in estimators]
+    if hasattr(model, "tree_"):
+        return [model.tree_]
+    return None
+
+
+def model_fingerprint(model) -> str:
+    """Content hash of a fitted model: its tree structure and leaf values, or the pickled estimator."""
+    digest = hashlib.sha256(type(model).__name__.encode())
+    trees = _trees(model)
+    if trees is None:
+        digest.update(joblib.hash(model).encode())
+        return digest.hexdigest()
+    for tree in trees:
+        for values in (tree.children_left, tree.children_right, tree.feature, tree.threshold, tree.value):
+            digest.update(np.ascontiguousarray(values).tobytes())
+    return digest.hexdigest()
+
+
+def _path_deltas(tree, n_features: int) -> sparse.csr_matrix:
+    """Sparse (nodes x features) matrix: value change into each node, in its parent's split feature."""
+    left, right = tree.children_left, tree.children_right
+    values = tree.value[:, 0, 0]
+    internal = np.flatnonzero(left != TREE_LEAF)
+    parents = np.concatenate([internal, internal])
+    children = np.concatenate([left[internal], right[internal]])
+    return sparse.csr_matrix((values[children] - values[parents], (children, tree.feature[parents])),
+                             shape=(tree.node_count, n_features))
+
+
+def explanations_path(model_path: str) -> str:
+    return f"{model_path}{EXPLANATIONS_SUFFIX}"
+
+
+def _load_explanations(path: str) -> Dict[str, Dict[Any, pd.DataFrame]]:
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        return joblib.load(path)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable explanations cache {path}: {str(e)}")
+        return {}
+
+
+def _store_explanation(path: str, fingerprint: str, key: Any, importance: pd.DataFrame):
+    with _cache_lock:
+        cache = _load_explanations(path)
+        entries = cache.pop(fingerprint, {})
+        entries[key] = importance
+        cache[fingerprint] = entries  # re-inserted last: dicts keep insertion order, newest model last
+        while len(cache) > MAX_CACHED_MODELS:
+            cache.pop(next(iter(cache)))
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        # A unique temp file per writer: another process may be rewriting the same cache
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                joblib.dump(cache, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+class ModelExplainer:
+    """Attributions for a fitted tree-ensemble regressor (e.g. the ``RandomForestRegressor``).
+
+    Only a weak reference to the model is kept (the trees are held directly), so
+    an explainer cached in ``get_explainer`` never keeps its model alive.
+    """
+
+    def __init__(self, model, features: Sequence[str], n_jobs: Optional[int] = None):
+        self._model = weakref.ref(model)
+        self.features = list(features)
+        self.n_jobs = n_jobs or os.cpu_count() or 1
+        self._trees = _trees(model)
+        if self._trees is None:
+            raise ValueError(f"{type(model).__name__} is not a tree model; only permutation importance applies.")
+        if self._trees[0].n_outputs != 1:
+            raise ValueError("Tree-path contributions are only supported for single-output regressors.")
+        self.fingerprint = model_fingerprint(model)
+        self.bias = float(np.mean([tree.value[0, 0, 0] for tree in self._trees]))
+        self._deltas: Optional[List[sparse.csr_matrix]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        model = self._model()
+        if model is None:
+            raise ReferenceError("The explained model no longer exists.")
+        return model
+
+    def _tree_deltas(self) -> List[sparse.csr_matrix]:
+        with self._lock:
+            if self._deltas is None:
+                self._deltas = [_path_deltas(tree, len(self.features)) for tree in self._trees]
+            return self._deltas
+
+    def _sum_contributions(self, trees: range, X: np.ndarray) -> np.ndarray:
+        deltas = self._tree_deltas()
+        total = np.zeros((len(X), len(self.features)))
+        for i in trees:
+            total += (self._trees[i].decision_path(X) @ deltas[i]).toarray()
+        return total
+
+    @timed("explainer.contributions")
+    def contributions(self, X: pd.DataFrame) -> np.ndarray:
+        """(rows x features) tree-path contributions; each row plus ``bias`` sums to the prediction."""
+        X = np.ascontiguousarray(X[self.features].to_numpy(np.float32) if isinstance(X, pd.DataFrame) else X,
+                                 dtype=np.float32)
+        count("explainer.rows", len(X))
+        chunks = [chunk for chunk in np.array_split(np.arange(len(self._trees)), self.n_jobs) if len(chunk)]
+        result = np.empty((len(X), len(self.features)))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(chunks), thread_name_prefix="explain") as pool:
+            for start in range(0, len(X), ROW_BLOCK):
+                block = X[start:start + ROW_BLOCK]
+                parts = pool.map(lambda trees: self._sum_contributions(trees, block), chunks)
+                result[start:start + len(block)] = sum(parts) / len(self._trees)
+        return result
+
+    def explain(self, X: pd.DataFrame) -> pd.DataFrame:
+        """One row per input: prediction, bias and per-feature contributions.
+
+        ``driver`` is the feature pulling that prediction down the most (the
+        most negative contribution).
+        """
+        contributions = self.contributions(X)
+        explained = pd.DataFrame(contributions, columns=self.features,
+                                 index=X.index if isinstance(X, pd.DataFrame) else None)
+        explained.insert(0, 'bias', self.bias)
+        explained.insert(0, 'prediction', self.bias + contributions.sum(axis=1))
+        explained['driver'] = pd.Categorical.from_codes(contributions.argmin(axis=1), self.features)
+        return explained
+
+    @timed("explainer.global_importance")
+    def global_importance(self, X: pd.DataFrame, y: Optional[pd.Series] = None, n_repeats: int = 5,
+                          max_rows: int = DEFAULT_SAMPLE_ROWS, cache_path: Optional[str] = None,
+                          random_state: int = 0) -> pd.DataFrame:
+        """Per-feature importance on (a sample of at most ``max_rows`` of) ``X``, most important first.
+
+        Columns: ``mean_abs_contribution``, ``mean_contribution``, ``impurity``
+        and, when ``y`` is given, ``permutation_mean``/``permutation_std``.
+        With ``cache_path`` (see ``explanations_path``) results are reused across
+        processes for the same model and sample.
+        """
+        if len(X) > max_rows:
+            rows = np.sort(np.random.default_rng(random_state).choice(len(X), max_rows, replace=False))
+            X, y = X.iloc[rows], (y.iloc[rows] if y is not None else None)
+        X = X[self.features]
+        sample = X.assign(_target=y.to_numpy()) if y is not None else X
+        key = (dataset_hash(sample), n_repeats, random_state)
+        if cache_path:
+            cached = _load_explanations(cache_path).get(self.fingerprint, {}).get(key)
+            count("explainer.cache", result="hit" if cached is not None else "miss")
+            if cached is not None:
+                return cached
+
+        contributions = self.contributions(X)
+        importance = pd.DataFrame({
+            'mean_abs_contribution': np.abs(contributions).mean(axis=0),
+            'mean_contribution': contributions.mean(axis=0),
+        }, index=pd.Index(self.features, name='feature'))
+        if hasattr(self.model, "feature_importances_"):
+            importance['impurity'] = self.model.feature_importances_
+        if y is not None:
+            mean, std = self._permutation_importance(X, y, n_repeats, random_state)
+            importance['permutation_mean'], importance['permutation_std'] = mean, std
+        importance = importance.sort_values('mean_abs_contribution', ascending=False)
+        if cache_path:
+            _store_explanation(cache_path, self.fingerprint, key, importance)
+        return importance
+
+    def _permutation_importance(self, X: pd.DataFrame, y: pd.Series, n_repeats: int,
+                                random_state: int) -> Tuple[np.ndarray, np.ndarray]:
+        # sklearn's permutation_importance would fan out to processes, pickling the whole
+        # forest into each; threads share it, and tree prediction releases the GIL
+        from joblib import parallel_backend
+        from sklearn.inspection import permutation_importance
+
+        with parallel_backend("threading", n_jobs=self.n_jobs):
+            result = permutation_importance(self.model, X, y, n_repeats=n_repeats, n_jobs=self.n_jobs,
+                                            random_state=random_state)
+        return result.importances_mean, result.importances_std
+
+
+def get_explainer(model, features: Sequence[str]) -> ModelExplainer:
+    """The explainer for ``model``, built once per model object (and dropped with it)."""
+    with _explainers_lock:
+        explainer = _explainers.get(model)
+        if explainer is None:
+            explainer = ModelExplainer(model, features)
+            _explainers[model] = explainer
+        return explainer
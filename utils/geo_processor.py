@@ -1,42 +1,233 @@
 # utils/geo_processor.py
 import geopandas as gpd
 import folium
+from folium.plugins import FastMarkerCluster
+import hashlib
+import io
 import logging
-from typing import List, Tuple
+import os
+import numpy as np
+import shapely
+import tempfile
+from typing import List, Optional, Tuple, Union
+from config.settings import (NODE_COVERAGE_RADIUS_KM, MAX_NODES, MAP_CLUSTER_THRESHOLD, MAP_MAX_POINTS,
+                             SPATIAL_INDEX_DIR, GEO_CACHE_DIR)
+from utils.cache import TTLCache, file_digest
+from utils.metrics import count, timed
+from utils.node_placement import NodePlacementEngine
+from utils.spatial_index import SpatialIndex, coordinates_digest, geodataframe_latlon
 
 logger = logging.getLogger(__name__)
 
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
 class GeoProcessor:
     def __init__(self):
-        self.map = folium.Map(location=[0, 0], zoom_start=2)
+        # Shared by all sessions of the process; only holds caches, never per-request state
+        self._map_cache = TTLCache(maxsize=32)
+        self._index_cache = TTLCache(maxsize=16)
+
+    @timed("geo.load_geo_data")
+    def load_geo_data(self, source: Union[str, bytes], columns: Optional[List[str]] = None,
+                      bbox: Optional[Tuple[float, float, float, float]] = None,
+                      cache_dir: Optional[str] = GEO_CACHE_DIR) -> gpd.GeoDataFrame:
+        """Load geospatial data from a GeoJSON file path or from the raw uploaded bytes.
 
-    def load_geo_data(self, geojson_path: str) -> gpd.GeoDataFrame:
-        """Load geospatial data from a GeoJSON file."""
+        Bytes are parsed in memory (no temp file). Reads go through pyogrio, with Arrow
+        when pyarrow is installed; ``columns`` and ``bbox`` (minx, miny, maxx, maxy) are
+        applied while reading. With ``cache_dir`` the parsed data is kept as a GeoParquet
+        copy keyed by content hash, so reloading the same file skips GeoJSON parsing.
+        """
         try:
-            gdf = gpd.read_file(geojson_path)
-            if gdf.empty:
-                raise ValueError("GeoJSON file is empty.")
-            return gdf
+            digest = None
+            if cache_dir:
+                digest = hashlib.sha256(source).hexdigest() if isinstance(source, bytes) else file_digest(source)
+                cached_path = os.path.join(cache_dir, f"{digest}.parquet")
+                count("geo.parquet_cache", result="hit" if os.path.exists(cached_path) else "miss")
+                if os.path.exists(cached_path):
+                    gdf = gpd.read_parquet(cached_path, columns=self._with_geometry(columns), bbox=bbox)
+                    return self._check_not_empty(gdf)
+
+            reader_source = io.BytesIO(source) if isinstance(source, bytes) else source
+            if digest is not None:
+                # Parse everything once for the cache, then project/filter the in-memory frame
+                gdf = gpd.read_file(reader_source, engine="pyogrio", use_arrow=HAS_PYARROW)
+                self._write_geoparquet(gdf, os.path.join(cache_dir, f"{digest}.parquet"))
+                if bbox is not None:
+                    gdf = gdf.iloc[gdf.sindex.query(shapely.box(*bbox), predicate="intersects")].sort_index()
+                if columns is not None:
+                    gdf = gdf[self._with_geometry(columns)]
+            else:
+                gdf = gpd.read_file(reader_source, engine="pyogrio", use_arrow=HAS_PYARROW,
+                                    columns=columns, bbox=bbox)
+            return self._check_not_empty(gdf)
         except Exception as e:
             logger.error(f"Error loading geo data: {str(e)}")
             raise
 
-    def suggest_node_placement(self, gdf: gpd.GeoDataFrame) -> List[Tuple[float, float]]:
-        """Suggest optimal network node locations based on geospatial data."""
+    @staticmethod
+    def _with_geometry(columns: Optional[List[str]]) -> Optional[List[str]]:
+        return None if columns is None else [*columns, "geometry"]
+
+    @staticmethod
+    def _check_not_empty(gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+        if gdf.empty:
+            raise ValueError("GeoJSON file is empty.")
+        return gdf
+
+    @staticmethod
+    def _write_geoparquet(gdf: gpd.GeoDataFrame, path: str):
+        """Best-effort GeoParquet copy (with a bbox covering column for filtered reads)."""
+        tmp_path = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # A unique temp file per writer: concurrent sessions caching the same upload can't clobber each other
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            os.close(fd)
+            gdf.to_parquet(tmp_path, compression="zstd", write_covering_bbox=True)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Could not write GeoParquet cache {path}: {str(e)}")
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def suggest_node_placement(self, gdf: gpd.GeoDataFrame, max_nodes: Optional[int] = MAX_NODES,
+                               coverage_radius_km: float = NODE_COVERAGE_RADIUS_KM,
+                               weight_column: str = "population") -> List[Tuple[float, float]]:
+        """Suggest network node locations covering the most population within the coverage radius.
+
+        See ``place_nodes`` for coverage statistics alongside the locations.
+        """
+        placement = self.place_nodes(gdf, max_nodes, coverage_radius_km, weight_column)
+        return list(zip(placement["lat"].tolist(), placement["lon"].tolist()))  # (lat, lon)
+
+    @timed("geo.place_nodes")
+    def place_nodes(self, gdf: gpd.GeoDataFrame, max_nodes: Optional[int] = MAX_NODES,
+                    coverage_radius_km: float = NODE_COVERAGE_RADIUS_KM, weight_column: str = "population") -> dict:
+        """Run the placement engine and return node arrays plus coverage statistics."""
         try:
-            # Simplified: Use centroids of high-density areas
-            centroids = gdf.geometry.centroid
-            return [(point.y, point.x) for point in centroids]  # (lat, lon)
+            engine = NodePlacementEngine(coverage_radius_km=coverage_radius_km, max_nodes=max_nodes or None)
+            return engine.place(gdf, weight_column=weight_column)
         except Exception as e:
             logger.error(f"Error suggesting node placement: {str(e)}")
             raise
 
-    def visualize_map(self, nodes: List[Tuple[float, float]]) -> folium.Map:
-        """Visualize suggested nodes on a map."""
+    @timed("geo.build_index")
+    def build_index(self, gdf: gpd.GeoDataFrame) -> SpatialIndex:
+        """Spatial index over a GeoDataFrame, built once per distinct coordinate set.
+
+        Indexes are kept in memory and, when ``SPATIAL_INDEX_DIR`` is set, persisted
+        to disk so large national datasets are not re-indexed on every run.
+        """
+        try:
+            lat, lon = geodataframe_latlon(gdf)
+            digest = coordinates_digest(lat, lon)
+            index = self._index_cache.get(digest)
+            count("geo.index_cache", result="miss" if index is None else "hit")
+            if index is None:
+                index = (SpatialIndex.load_or_build(lat, lon, SPATIAL_INDEX_DIR) if SPATIAL_INDEX_DIR
+                         else SpatialIndex(lat, lon))
+                self._index_cache.set(digest, index)
+            return index
+        except Exception as e:
+            logger.error(f"Error building spatial index: {str(e)}")
+            raise
+
+    @timed("geo.nearest_nodes")
+    def nearest_nodes(self, gdf: gpd.GeoDataFrame, nodes: List[Tuple[float, float]],
+                      k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """For every location in ``gdf``, distances (km) and indices of the ``k`` nearest nodes."""
+        coords = np.asarray(nodes, dtype=np.float64).reshape(-1, 2)
+        lat, lon = geodataframe_latlon(gdf)
+        return self._node_index(coords).query_nearest(lat, lon, k=k)
+
+    def _node_index(self, coords: np.ndarray) -> SpatialIndex:
+        # Reruns ask about the same placement again and again; index each node set once
+        digest = coordinates_digest(coords[:, 0], coords[:, 1])
+        index = self._index_cache.get(digest)
+        count("geo.index_cache", result="miss" if index is None else "hit")
+        if index is None:
+            index = SpatialIndex(coords[:, 0], coords[:, 1])
+            self._index_cache.set(digest, index)
+        return index
+
+    @timed("geo.locations_within")
+    def locations_within(self, gdf: gpd.GeoDataFrame, nodes: List[Tuple[float, float]],
+                         radius_km: float) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+        """For every node, indices (into ``gdf``) and distances (km) of locations within ``radius_km``."""
+        coords = np.asarray(nodes, dtype=np.float64).reshape(-1, 2)
+        return self.build_index(gdf).query_radius(coords[:, 0], coords[:, 1], radius_km)
+
+    @timed("geo.visualize_map")
+    def visualize_map(self, nodes: List[Tuple[float, float]], cluster_threshold: int = MAP_CLUSTER_THRESHOLD,
+                      max_points: int = MAP_MAX_POINTS) -> folium.Map:
+        """Visualize suggested nodes on a fresh map.
+
+        Up to ``cluster_threshold`` nodes get individual markers; beyond that they are
+        clustered client-side from one compact coordinate array, and beyond
+        ``max_points`` they are binned server-side into a single GeoJSON layer so the
+        page payload stays bounded however many nodes there are.
+        """
         try:
-            for lat, lon in nodes:
-                folium.Marker([lat, lon], popup="Suggested Node").add_to(self.map)
-            return self.map
+            coords = np.asarray(nodes, dtype=np.float64).reshape(-1, 2)
+            map_obj = folium.Map(location=[0, 0], zoom_start=2, prefer_canvas=True)
+            if len(coords) == 0:
+                return map_obj
+
+            if len(coords) <= cluster_threshold:
+                for lat, lon in coords:
+                    folium.Marker([lat, lon], popup="Suggested Node").add_to(map_obj)
+            elif len(coords) <= max_points:
+                FastMarkerCluster(np.round(coords, 5).tolist(), name="Suggested Nodes").add_to(map_obj)
+            else:
+                # GeoJSON features are ~4x larger than cluster entries, so use fewer bins
+                self._binned_layer(coords, max(max_points // 4, 1)).add_to(map_obj)
+
+            map_obj.fit_bounds([coords.min(axis=0).tolist(), coords.max(axis=0).tolist()])
+            return map_obj
         except Exception as e:
             logger.error(f"Error visualizing map: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    @timed("geo.render_map_html")
+    def render_map_html(self, nodes: List[Tuple[float, float]], cluster_threshold: int = MAP_CLUSTER_THRESHOLD,
+                        max_points: int = MAP_MAX_POINTS) -> str:
+        """Rendered map HTML, cached on a digest of the nodes and rendering options."""
+        coords = np.ascontiguousarray(np.asarray(nodes, dtype=np.float64).reshape(-1, 2))
+        key = hashlib.sha256(coords.tobytes() + f"{cluster_threshold}:{max_points}".encode()).hexdigest()
+        html = self._map_cache.get(key)
+        count("geo.map_cache", result="miss" if html is None else "hit")
+        if html is None:
+            html = self.visualize_map(coords, cluster_threshold, max_points).get_root().render()
+            self._map_cache.set(key, html)
+        return html
+
+    @staticmethod
+    def _binned_layer(coords: np.ndarray, max_bins: int) -> folium.GeoJson:
+        """Aggregate nodes onto a lat/lon grid coarse enough to give roughly ``max_bins`` bins."""
+        span = np.maximum(coords.max(axis=0) - coords.min(axis=0), 1e-6)
+        # The second term keeps near-collinear inputs from producing a grid finer than max_bins
+        cell = max(np.sqrt(span[0] * span[1] / max_bins), span.max() / max_bins)
+        keys = np.floor((coords - coords.min(axis=0)) / cell).astype(np.int64)
+        _, inverse, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+        inverse = inverse.ravel()
+        lat = np.bincount(inverse, weights=coords[:, 0]) / counts
+        lon = np.bincount(inverse, weights=coords[:, 1]) / counts
+        collection = {
+            "type": "FeatureCollection",
+            "features": [
+                {"type": "Feature", "properties": {"nodes": int(n)},
+                 "geometry": {"type": "Point", "coordinates": [round(x, 5), round(y, 5)]}}
+                for x, y, n in zip(lon.tolist(), lat.tolist(), counts.tolist())
+            ],
+        }
+        return folium.GeoJson(
+            collection,
+            name="Suggested Nodes (aggregated)",
+            marker=folium.CircleMarker(radius=4, fill=True, fill_opacity=0.7, weight=1),
+            tooltip=folium.GeoJsonTooltip(fields=["nodes"], aliases=["Nodes"]),
+        )
@@ -0,0 +1,158 @@
+# utils/jobs.py
+"""Background job pool with progress reporting and memoized results.
+
+Streamlit re-runs the page script on every interaction. Long analyses submitted
+here run on worker threads instead, and the script only polls their progress.
+Jobs are keyed, e.g. by upload digest and parameters. A finished result is reused
+by later reruns, by other sessions and by repeat uploads, and a job that is
+already running is joined rather than started twice.
+"""
+import concurrent.futures
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.cache import TTLCache
+from utils.metrics import count, timed
+
+logger = logging.getLogger(__name__)
+
+
+def result_nbytes(value: Any, _seen: Optional[set] = None) -> int:
+    """Approximate memory held by a job result: arrays, frames and fitted trees, inside dicts/lists/tuples.
+
+    Objects reachable twice are counted once; memory maps and small objects count as 0.
+    """
+    seen = set() if _seen is None else _seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, np.memmap):  # file-backed
+        return 0
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True))
+    if isinstance(value, dict):
+        return sum(result_nbytes(item, seen) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(result_nbytes(item, seen) for item in value)
+    estimators = getattr(value, "estimators_", None)
+    trees = [est.tree_ for est in estimators if hasattr(est, "tree_")] if isinstance(estimators, list) else []
+    if hasattr(value, "tree_"):
+        trees.append(value.tree_)
+    # A node is ~64 bytes in sklearn's tree struct, plus its values
+    return sum(tree.node_count * 64 + tree.value.nbytes for tree in trees)
+
+
+class Job:
+    """Handle on a submitted computation: progress, status and (eventually) its result."""
+
+    def __init__(self, key: Hashable, name: str = "job"):
+        self.key = key
+        self.name = name
+        self.progress = 0.0
+        self.message = "Queued"
+        self.submitted_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self._future: concurrent.futures.Future = concurrent.futures.Future()
+
+    def report(self, fraction: float, message: str = None):
+        """Progress callback handed to the job function: ``fraction`` in [0, 1]."""
+        self.progress = min(max(float(fraction), self.progress), 1.0)
+        if message is not None:
+            self.message = message
+
+    def done(self) -> bool:
+        return self._future.done()
+
+    def failed(self) -> bool:
+        return self.done() and self._future.exception() is not None
+
+    def result(self, timeout: float = None) -> Any:
+        """The job's return value; re-raises the job's exception."""
+        return self._future.result(timeout)
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.submitted_at
+
+
+class JobPool:
+    """Thread pool running keyed jobs, with an LRU/TTL memo of finished ones.
+
+    Failed jobs are not memoized, so submitting the same key again retries. With
+    ``max_result_bytes`` the memo is also bounded by the estimated size of its
+    keys and results (``result_nbytes``), so cached predictions and models stop
+    accumulating.
+    """
+
+    def __init__(self, max_workers: int = 2, max_results: int = 64, result_ttl: Optional[float] = None,
+                 max_result_bytes: Optional[int] = None):
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="jobs")
+        self._results = TTLCache(maxsize=max_results, ttl=result_ttl, max_weight=max_result_bytes,
+                                 weigher=lambda job: result_nbytes((job.key, job.result())))
+        self._running: Dict[Hashable, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key: Hashable, fn: Callable[..., Any], *args, name: str = "job", **kwargs) -> Job:
+        """Run ``fn(*args, progress=job.report, **kwargs)`` unless ``key`` is finished or running."""
+        with self._lock:
+            job = self._results.get(key)
+            if job is not None:
+                count("jobs.submit", job=job.name, result="memoized")
+                return job
+            job = self._running.get(key)
+            if job is not None:
+                count("jobs.submit", job=job.name, result="joined")
+                return job
+            job = Job(key, name)
+            self._running[key] = job
+        count("jobs.submit", job=name, result="started")
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def put(self, key: Hashable, result: Any, name: str = "job") -> Job:
+        """Memoize a result computed elsewhere (e.g. as a by-product of another job)."""
+        job = Job(key, name)
+        job.report(1.0, "Done")
+        job.finished_at = job.submitted_at
+        job._future.set_result(result)
+        self._results.set(key, job)
+        return job
+
+    def get(self, key: Hashable) -> Optional[Job]:
+        """The finished or running job for ``key``, if any (never starts one)."""
+        with self._lock:
+            return self._running.get(key) or self._results.get(key)
+
+    def stats(self) -> Dict[str, float]:
+        return {"running": len(self._running), **self._results.stats()}
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, job: Job, fn: Callable[..., Any], args: tuple, kwargs: dict):
+        job.report(0.0, "Running")
+        try:
+            with timed("jobs.run", job=job.name):
+                result = fn(*args, progress=job.report, **kwargs)
+        except Exception as e:
+            logger.error(f"Job {job.name} failed: {str(e)}")
+            job.finished_at = time.monotonic()
+            job._future.set_exception(e)
+            with self._lock:
+                self._running.pop(job.key, None)
+            return
+        job.report(1.0, "Done")
+        job.finished_at = time.monotonic()
+        job._future.set_result(result)
+        with self._lock:
+            self._running.pop(job.key, None)
+            self._results.set(job.key, job)
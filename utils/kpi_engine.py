@@ -0,0 +1,340 @@
+# utils/kpi_engine.py
+"""Per-node, time-windowed KPI and energy analytics over network telemetry.
+
+Telemetry rows (``node_id``, ``timestamp`` and the four metrics) are bucketed
+into fixed windows (``window="1h"``). Each (node, window) pair keeps mergeable
+aggregates: row and value counts, sums, minima and maxima, energy (``bandwidth *
+uptime * ENERGY_SCALE``), and a log-bucketed latency histogram for the
+percentiles. Raw rows are never stored. The window table derived from these
+aggregates holds the row count, latency mean/p50/p95/max, bandwidth, signal,
+mean and minimum uptime, and energy. Node summaries, fleet time series, rolling
+views and anomaly flags are all derived from that table.
+
+``append`` is incremental. A batch is aggregated on its own and merged into the
+stored aggregates of the windows it touches. Every other window is left as is,
+and no raw rows are ever summarized again, however unsorted the input. Memory
+grows with the number of (node, window) pairs, not with rows. Each pair holds at
+most a few hundred histogram buckets, and ``retention`` bounds the number of
+windows kept.
+"""
+import functools
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ENERGY_SCALE = 0.1  # simplified energy model: energy = bandwidth * uptime * ENERGY_SCALE
+METRIC_COLUMNS = ['bandwidth', 'latency', 'signal_strength', 'uptime']
+KPI_COLUMNS = ['node_id', 'timestamp'] + METRIC_COLUMNS
+DEFAULT_NODE = "all"
+MAD_TO_SIGMA = 1.4826  # MAD of a normal distribution -> standard deviation
+MIN_RELATIVE_SCALE = 0.01  # deviations below ~1% of the typical value never count as anomalies
+# Latency percentiles come from histograms with buckets [g^i, g^(i+1)): relative error under ~1%
+LATENCY_BUCKET_GROWTH = 1.02
+LATENCY_FLOOR = 1e-3  # ms; smaller latencies (and zero) share the lowest bucket
+WINDOW_KEYS = ['node_id', 'window_start']
+# How each stored aggregate combines across batches
+MERGE_AGGREGATES = {
+    'rows': 'sum', 'energy': 'sum', 'bandwidth_min': 'min', 'latency_max': 'max', 'uptime_min': 'min',
+    **{f'{col}_{part}': 'sum' for col in METRIC_COLUMNS for part in ('sum', 'count')},
+}
+
+
+def robust_zscore(values: pd.Series, groups: Optional[pd.Series] = None) -> pd.Series:
+    """(x - median) / (1.4826 * MAD), optionally within groups.
+
+    The scale is floored at ``MIN_RELATIVE_SCALE`` of the median, so very uniform
+    data does not turn negligible differences into large scores.
+    """
+    if groups is None:
+        median = values.median()
+        mad = (values - median).abs().median()
+    else:
+        median = values.groupby(groups, observed=True).transform("median")
+        mad = (values - median).abs().groupby(groups, observed=True).transform("median")
+    scale = np.maximum(MAD_TO_SIGMA * mad, MIN_RELATIVE_SCALE * np.abs(median))
+    z = (values - median) / scale
+    return z.where(np.asarray(scale > 0), 0.0) if np.ndim(scale) else (z if scale > 0 else values * 0.0)
+
+
+def _histogram_quantiles(histogram: pd.Series, quantiles: Tuple[float, ...]) -> pd.DataFrame:
+    """Per (node, window), each quantile of the histogram's values, interpolated like ``Series.quantile``.
+
+    ``histogram`` must be sorted; a value is represented by the geometric midpoint of its bucket.
+    """
+    window_codes = histogram.index.codes[:2]
+    starts = np.flatnonzero(np.r_[True, (window_codes[0][1:] != window_codes[0][:-1])
+                                  | (window_codes[1][1:] != window_codes[1][:-1])][:len(histogram)])
+    counts = histogram.to_numpy()
+    cumulative = np.cumsum(counts)
+    offsets = cumulative[starts] - counts[starts]  # values in earlier windows
+    totals = np.add.reduceat(counts, starts)
+    bucket_levels, bucket_codes = histogram.index.levels[2].to_numpy(), histogram.index.codes[2]
+
+    def value_at(position: np.ndarray) -> np.ndarray:
+        # The bucket holding the value at 0-based ``position`` is the first whose cumulative count exceeds it
+        found = np.searchsorted(cumulative, offsets + position, side='right')
+        return np.exp((bucket_levels[bucket_codes[found]] + 0.5) * np.log(LATENCY_BUCKET_GROWTH))
+
+    result = {}
+    for quantile in quantiles:
+        rank = quantile * (totals - 1)
+        low, high = value_at(np.floor(rank)), value_at(np.ceil(rank))
+        result[quantile] = low + (high - low) * (rank - np.floor(rank))
+    return pd.DataFrame(result, index=histogram.index[starts].droplevel('bucket'))
+
+
+def _merge_histograms(*histograms: pd.Series) -> pd.Series:
+    """Sum histograms over their (node, window, bucket) keys; the result is sorted by key.
+
+    Works on integer keys built from the index codes: concatenating the indexes and
+    grouping on three levels needs several times more memory than the histograms hold.
+    """
+    levels = [functools.reduce(lambda union, level: union.union(level), (h.index.levels[i] for h in histograms))
+              for i in range(3)]
+    strides = [len(levels[1]) * len(levels[2]), len(levels[2]), 1]
+    keys = []
+    for histogram in histograms:
+        part = np.zeros(len(histogram), dtype=np.int64)
+        for level, own_level, codes, stride in zip(levels, histogram.index.levels, histogram.index.codes, strides):
+            part += level.get_indexer(own_level).astype(np.int64)[codes] * stride
+        keys.append(part)
+    keys = np.concatenate(keys)
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]][:len(keys)])
+    counts = np.add.reduceat(np.concatenate([h.to_numpy() for h in histograms])[order], starts)
+    keys = keys[starts]
+    return pd.Series(counts, index=pd.MultiIndex(
+        levels=levels, codes=[keys // strides[0], keys // strides[1] % len(levels[1]), keys % strides[1]],
+        names=histograms[0].index.names, verify_integrity=False))
+
+
+def _window_mask(index: pd.MultiIndex, predicate) -> np.ndarray:
+    """``predicate`` of each entry's window start, evaluated once per distinct window via the level codes."""
+    level = index.names.index('window_start')
+    return np.asarray(predicate(index.levels[level]))[index.codes[level]]
+
+
+class NetworkKPIEngine:
+    def __init__(self, window: str = "1h", anomaly_threshold: float = 3.5, retention: Optional[str] = None):
+        """``retention`` (e.g. ``"7D"``) drops windows older than that, relative to the newest data."""
+        self.window = pd.Timedelta(window)
+        self.anomaly_threshold = anomaly_threshold
+        self.retention = pd.Timedelta(retention) if retention else None
+        self._aggregates: Optional[pd.DataFrame] = None  # per (node, window), see MERGE_AGGREGATES
+        self._latency_histogram: Optional[pd.Series] = None  # counts per (node, window, bucket)
+        self._windows: Optional[pd.DataFrame] = None
+
+    @property
+    def rows(self) -> int:
+        return int(self._aggregates['rows'].sum()) if self._aggregates is not None else 0
+
+    def prepare(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Normalize a telemetry frame: categorical node ids, datetime timestamps, float32 metrics.
+
+        Rows whose timestamp is missing or cannot be parsed are dropped.
+        """
+        missing = [col for col in ['timestamp'] + METRIC_COLUMNS if col not in df.columns]
+        if missing:
+            raise ValueError(f"Missing required columns for KPI analysis: {', '.join(missing)}")
+        node_id = df['node_id'] if 'node_id' in df.columns else pd.Series(DEFAULT_NODE, index=df.index)
+        timestamp = df['timestamp']
+        if not pd.api.types.is_datetime64_any_dtype(timestamp):
+            # Unparseable timestamps become NaT and their rows are dropped below
+            timestamp = pd.to_datetime(timestamp, format="ISO8601", errors="coerce")
+        # Plain arrays, so the caller's index (e.g. a slice of a bigger frame) is not aligned against
+        prepared = pd.DataFrame({
+            'node_id': pd.Categorical(node_id.to_numpy()) if not isinstance(node_id.dtype, pd.CategoricalDtype)
+            else node_id.array,
+            'window_start': timestamp.dt.floor(self.window).to_numpy(),
+            **{col: df[col].to_numpy(np.float32) for col in METRIC_COLUMNS},
+        })
+        return prepared.dropna(subset=['window_start'])
+
+    def append(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Add telemetry and merge it into the windows it touches; returns their new summaries."""
+        batch = self.prepare(df)
+        if batch.empty:
+            return self._empty_windows()
+        aggregates, histogram = self._aggregate(batch)
+        # Selected by window start alone: a plain datetime lookup, where (node, window) pairs would be
+        # materialized as tuples; merging a node's unchanged aggregates with nothing leaves them as they were
+        affected = aggregates.index.get_level_values('window_start').unique()
+
+        if self._aggregates is not None:
+            # Only the stored aggregates of the touched windows take part in the merge
+            stored = _window_mask(self._aggregates.index, lambda starts: starts.isin(affected))
+            aggregates = (pd.concat([self._aggregates[stored], aggregates])
+                          .groupby(level=WINDOW_KEYS, observed=True, sort=True).agg(MERGE_AGGREGATES))
+            stored_buckets = _window_mask(self._latency_histogram.index, lambda starts: starts.isin(affected))
+            histogram = _merge_histograms(self._latency_histogram[stored_buckets], histogram)
+            self._aggregates = pd.concat([self._aggregates[~stored], aggregates])
+            self._latency_histogram = pd.concat([self._latency_histogram[~stored_buckets], histogram])
+        else:
+            self._aggregates, self._latency_histogram = aggregates, histogram
+
+        recomputed = self._summarize(aggregates, histogram)
+        if self._windows is None:
+            self._windows = recomputed
+        else:
+            kept = self._windows[~_window_mask(self._windows.index, lambda starts: starts.isin(affected))]
+            self._windows = pd.concat([kept, recomputed]).sort_index()
+        self._apply_retention()
+        return recomputed
+
+    def _aggregate(self, rows: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series]:
+        """Mergeable aggregates and latency histogram of one batch, per (node, window)."""
+        if not isinstance(rows['node_id'].dtype, pd.CategoricalDtype):
+            rows['node_id'] = rows['node_id'].astype("category")
+        for col in METRIC_COLUMNS:  # sums accumulate in float64, so batch order doesn't change the result
+            rows[col] = rows[col].to_numpy(np.float64)
+        rows['energy'] = rows['bandwidth'].to_numpy() * rows['uptime'].to_numpy() * ENERGY_SCALE
+        grouped = rows.groupby(WINDOW_KEYS, observed=True, sort=True)
+        aggregates = grouped.agg(
+            rows=('latency', 'size'),
+            energy=('energy', 'sum'),
+            bandwidth_min=('bandwidth', 'min'),
+            latency_max=('latency', 'max'),
+            uptime_min=('uptime', 'min'),
+            **{f'{col}_sum': (col, 'sum') for col in METRIC_COLUMNS},
+            **{f'{col}_count': (col, 'count') for col in METRIC_COLUMNS},
+        )
+
+        latency = rows['latency'].to_numpy()
+        measured = ~np.isnan(latency)
+        buckets = np.floor(np.log(np.maximum(latency[measured], LATENCY_FLOOR))
+                           / np.log(LATENCY_BUCKET_GROWTH)).astype(np.int64)
+        window_ids = grouped.ngroup().to_numpy()[measured]  # positions in ``aggregates``
+        lowest = buckets.min() if len(buckets) else 0
+        span = buckets.max() - lowest + 1 if len(buckets) else 1
+        # One sort of combined (window, bucket) keys is much cheaper than a three-key groupby
+        keys, counts = np.unique(window_ids * span + (buckets - lowest), return_counts=True)
+        windows = keys // span
+        bucket_levels = np.unique(keys % span) + lowest
+        histogram = pd.Series(counts, index=pd.MultiIndex(
+            levels=[*aggregates.index.levels, bucket_levels],
+            codes=[*(codes[windows] for codes in aggregates.index.codes),
+                   np.searchsorted(bucket_levels, keys % span + lowest)],
+            names=WINDOW_KEYS + ['bucket']))
+        return aggregates, histogram
+
+    @staticmethod
+    def _summarize(aggregates: pd.DataFrame, histogram: pd.Series) -> pd.DataFrame:
+        summary = pd.DataFrame({
+            'rows': aggregates['rows'],
+            'bandwidth_mean': aggregates['bandwidth_sum'] / aggregates['bandwidth_count'],
+            'bandwidth_min': aggregates['bandwidth_min'],
+            'latency_mean': aggregates['latency_sum'] / aggregates['latency_count'],
+            'latency_max': aggregates['latency_max'],
+            'signal_mean': aggregates['signal_strength_sum'] / aggregates['signal_strength_count'],
+            'uptime_mean': aggregates['uptime_sum'] / aggregates['uptime_count'],
+            'uptime_min': aggregates['uptime_min'],
+            'energy': aggregates['energy'],
+        }, index=aggregates.index)
+        estimates = _histogram_quantiles(histogram, (0.5, 0.95)).reindex(summary.index)
+        for name, quantile in (('latency_p50', 0.5), ('latency_p95', 0.95)):
+            summary[name] = np.minimum(estimates[quantile], summary['latency_max'])  # a midpoint may overshoot
+        return summary
+
+    def _empty_windows(self) -> pd.DataFrame:
+        index = pd.MultiIndex.from_arrays([pd.Categorical([]), pd.DatetimeIndex([])],
+                                          names=['node_id', 'window_start'])
+        return pd.DataFrame(index=index)
+
+    def _apply_retention(self):
+        if self.retention is None or self._windows is None or self._windows.empty:
+            return
+        cutoff = self._windows.index.get_level_values('window_start').max() - self.retention
+        def recent(starts):
+            return starts >= cutoff
+
+        self._windows = self._windows[_window_mask(self._windows.index, recent)]
+        self._aggregates = self._aggregates[_window_mask(self._aggregates.index, recent)]
+        self._latency_histogram = self._latency_histogram[_window_mask(self._latency_histogram.index, recent)]
+
+    def window_kpis(self) -> pd.DataFrame:
+        """One row per (node_id, window_start), with anomaly flags against the node's own history.
+
+        A window is anomalous when its mean latency or mean uptime is more than
+        ``anomaly_threshold`` robust z-scores away from the node's typical window.
+        """
+        if self._windows is None:
+            return self._empty_windows()
+        windows = self._windows.copy()
+        nodes = windows.index.get_level_values('node_id')
+        windows['latency_z'] = robust_zscore(windows['latency_mean'], nodes).to_numpy()
+        windows['uptime_z'] = robust_zscore(windows['uptime_mean'], nodes).to_numpy()
+        windows['anomaly'] = ((windows['latency_z'] > self.anomaly_threshold)
+                              | (windows['uptime_z'] < -self.anomaly_threshold))
+        return windows
+
+    def node_kpis(self) -> pd.DataFrame:
+        """Per-node summary over all windows, most anomalous nodes first.
+
+        ``latency_p95_peak`` is the worst window p95. ``anomaly`` flags nodes whose
+        mean latency or uptime is a robust outlier relative to the rest of the fleet.
+        """
+        windows = self.window_kpis()
+        if windows.empty:
+            return pd.DataFrame()
+        weighted = windows[['bandwidth_mean', 'latency_mean', 'signal_mean', 'uptime_mean']].mul(
+            windows['rows'], axis=0)
+        weighted['rows'] = windows['rows']
+        grouped = windows.groupby(level='node_id', observed=True)
+        sums = weighted.groupby(level='node_id', observed=True).sum()
+        nodes = pd.DataFrame({
+            'rows': sums['rows'].astype(np.int64),
+            'windows': grouped.size(),
+            'energy_total': grouped['energy'].sum(),
+            'bandwidth_mean': sums['bandwidth_mean'] / sums['rows'],
+            'latency_mean': sums['latency_mean'] / sums['rows'],
+            'latency_p95_peak': grouped['latency_p95'].max(),
+            'signal_mean': sums['signal_mean'] / sums['rows'],
+            'uptime_mean': sums['uptime_mean'] / sums['rows'],
+            'uptime_min': grouped['uptime_min'].min(),
+            'anomalous_windows': grouped['anomaly'].sum().astype(np.int64),
+        })
+        nodes['energy_per_row'] = nodes['energy_total'] / nodes['rows']
+        nodes['anomaly_rate'] = nodes['anomalous_windows'] / nodes['windows']
+        nodes['anomaly'] = ((robust_zscore(nodes['latency_mean']) > self.anomaly_threshold)
+                            | (robust_zscore(nodes['uptime_mean']) < -self.anomaly_threshold))
+        return nodes.sort_values(['anomaly', 'anomaly_rate', 'uptime_mean'], ascending=[False, False, True])
+
+    def fleet_kpis(self) -> pd.DataFrame:
+        """Per-window totals across all nodes: energy, row-weighted means and anomalous nodes."""
+        windows = self.window_kpis()
+        if windows.empty:
+            return pd.DataFrame()
+        weighted = windows[['latency_mean', 'uptime_mean']].mul(windows['rows'], axis=0)
+        weighted[['rows', 'energy', 'anomaly']] = windows[['rows', 'energy', 'anomaly']]
+        sums = weighted.groupby(level='window_start').sum()
+        return pd.DataFrame({
+            'nodes': windows.groupby(level='window_start').size(),
+            'rows': sums['rows'].astype(np.int64),
+            'energy': sums['energy'],
+            'latency_mean': sums['latency_mean'] / sums['rows'],
+            'uptime_mean': sums['uptime_mean'] / sums['rows'],
+            'latency_p95_max': windows.groupby(level='window_start')['latency_p95'].max(),
+            'anomalous_nodes': sums['anomaly'].astype(np.int64),
+        })
+
+    def rolling(self, column: str = 'latency_mean', periods: int = 24) -> pd.Series:
+        """Per-node rolling mean of a window KPI over the last ``periods`` windows."""
+        if self._windows is None:
+            return pd.Series(dtype=np.float64)
+        series = self._windows[column]
+        return (series.groupby(level='node_id', observed=True, group_keys=False)
+                .rolling(periods, min_periods=1).mean()
+                .droplevel(0).reindex(series.index))
+
+    def energy_summary(self) -> dict:
+        """Totals in the shape of ``NetworkAnalyzer.analyze_energy_efficiency``."""
+        if self._windows is None:
+            return {"avg_energy_usage": float("nan"), "total_energy_usage": 0.0}
+        total = float(self._windows['energy'].sum())
+        rows = int(self._windows['rows'].sum())
+        return {"avg_energy_usage": total / rows if rows else float("nan"), "total_energy_usage": total}
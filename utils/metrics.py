@@ -0,0 +1,317 @@
+# utils/metrics.py
+"""Lightweight in-process instrumentation: timers, counters, request traces, profiles.
+
+``timed("geo.place_nodes")`` works as a decorator (sync or async functions) or as
+a context manager; it records the call's duration, counts calls by outcome and,
+inside ``request_trace``, appends a span to the current request's trace so the
+Diagnostics page can show where each request's latency went. Traces follow
+``contextvars``, so spans recorded on the weather I/O loop still land in the
+request that triggered them.
+
+``profile_request`` optionally wraps a request in cProfile and tracemalloc.
+Everything is exported as Prometheus text (``render_prometheus``, or the
+``/metrics`` endpoint of ``start_metrics_server``) or as JSON.
+"""
+import asyncio
+import contextvars
+import cProfile
+import functools
+import http.server
+import inspect
+import io
+import json
+import logging
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "neural_nexus"
+SAMPLE_WINDOW = 2048  # recent durations kept per timer for percentiles
+
+# tracemalloc is process-wide, so only one request is profiled at a time
+_profile_lock = threading.Lock()
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class _Timer:
+    __slots__ = ("count", "total", "max", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples: Deque[float] = deque(maxlen=SAMPLE_WINDOW)
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def summary(self) -> Dict[str, float]:
+        samples = np.fromiter(self.samples, dtype=np.float64, count=len(self.samples))
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99]) if len(samples) else (0.0, 0.0, 0.0)
+        return {"count": self.count, "sum_s": self.total, "max_s": self.max,
+                "p50_s": float(p50), "p95_s": float(p95), "p99_s": float(p99)}
+
+
+class MetricsRegistry:
+    """Thread-safe store of counters, timers, recent request traces and profiles."""
+
+    def __init__(self, max_traces: int = 50, max_profiles: int = 10):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._timers: Dict[str, Dict[LabelKey, _Timer]] = {}
+        self.traces: Deque[Dict[str, Any]] = deque(maxlen=max_traces)
+        self.profiles: Deque[Dict[str, Any]] = deque(maxlen=max_profiles)
+        self.profiling_enabled = False
+        self.started_at = time.time()
+
+    def increment(self, name: str, value: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._timers.setdefault(name, {}).setdefault(key, _Timer()).observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+            self.traces.clear()
+            self.profiles.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """All metrics as plain data (the JSON export)."""
+        with self._lock:
+            counters = {name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                        for name, series in self._counters.items()}
+            timers = {name: [{"labels": dict(key), **timer.summary()} for key, timer in series.items()]
+                      for name, series in self._timers.items()}
+            traces = list(self.traces)
+        return {"uptime_s": time.time() - self.started_at, "counters": counters, "timers": timers,
+                "traces": traces}
+
+    def render_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2, default=str)
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format: counters, and timers as summaries."""
+        lines = []
+        snapshot = self.snapshot()
+        for name, series in sorted(snapshot["counters"].items()):
+            metric = _metric_name(name, "total")
+            lines.append(f"# TYPE {metric} counter")
+            lines.extend(f"{metric}{_format_labels(s['labels'])} {s['value']:g}" for s in series)
+        for name, series in sorted(snapshot["timers"].items()):
+            metric = _metric_name(name, "seconds")
+            lines.append(f"# TYPE {metric} summary")
+            for s in series:
+                for quantile, field in (("0.5", "p50_s"), ("0.95", "p95_s"), ("0.99", "p99_s")):
+                    labels = _format_labels({**s["labels"], "quantile": quantile})
+                    lines.append(f"{metric}{labels} {s[field]:.6g}")
+                lines.append(f"{metric}_sum{_format_labels(s['labels'])} {s['sum_s']:.6g}")
+                lines.append(f"{metric}_count{_format_labels(s['labels'])} {s['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def _metric_name(name: str, suffix: str) -> str:
+    return f"{METRIC_PREFIX}_{re.sub(r'[^a-zA-Z0-9_]', '_', name)}_{suffix}"
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for k, v in sorted(labels.items()))
+    return "{" + ",".join(escaped) + "}"
+
+
+metrics = MetricsRegistry()
+
+_current_trace: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("request_trace",
+                                                                                         default=None)
+
+
+class _Timed:
+    """Context manager / decorator produced by ``timed``."""
+
+    def __init__(self, name: str, registry: MetricsRegistry, labels: Dict[str, Any]):
+        self.name = name
+        self.registry = registry
+        self.labels = labels
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._record(time.perf_counter() - self._start, exc)
+        return False
+
+    def _record(self, seconds: float, exc: Optional[BaseException]):
+        if exc is None:
+            status = "ok"
+        elif isinstance(exc, (GeneratorExit, asyncio.CancelledError)):
+            status = "cancelled"  # the caller stopped consuming; not a failure of the operation
+        else:
+            status = "error"
+        self.registry.observe(self.name, seconds, **self.labels)
+        self.registry.increment(f"{self.name}.calls", status=status, **self.labels)
+        if status == "error":
+            self.registry.increment("errors", operation=self.name, type=type(exc).__name__)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace["spans"].append({"name": self.name, "start_ms": (self._start - trace["_start"]) * 1000,
+                                   "duration_ms": seconds * 1000, "status": status})
+
+    def __call__(self, fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with _Timed(self.name, self.registry, self.labels):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Timed(self.name, self.registry, self.labels):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+def timed(name: str, registry: MetricsRegistry = None, **labels) -> _Timed:
+    """Time a block or function: ``with timed("x"):`` or ``@timed("x")``."""
+    return _Timed(name, registry or metrics, labels)
+
+
+def count(name: str, value: float = 1.0, **labels):
+    """Increment a counter on the default registry."""
+    metrics.increment(name, value, **labels)
+
+
+@contextmanager
+def request_trace(name: str, registry: MetricsRegistry = None) -> Iterator[Dict[str, Any]]:
+    """Collect the spans of everything timed while handling one request."""
+    registry = registry or metrics
+    trace = {"name": name, "started_at": time.time(), "spans": [], "_start": time.perf_counter()}
+    token = _current_trace.set(trace)
+    error = None
+    try:
+        yield trace
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current_trace.reset(token)
+        trace["duration_ms"] = (time.perf_counter() - trace.pop("_start")) * 1000
+        trace["status"] = "ok" if error is None else type(error).__name__
+        registry.traces.append(trace)
+        registry.observe("request", trace["duration_ms"] / 1000, request=name)
+
+
+@contextmanager
+def profile_request(name: str, registry: MetricsRegistry = None, top: int = 25,
+                    enabled: Optional[bool] = None) -> Iterator[None]:
+    """cProfile + tracemalloc around one request when profiling is enabled.
+
+    The top functions by cumulative time and the top allocation sites are kept
+    in ``registry.profiles``. Profiling slows the request down noticeably.
+    Requests that start while another one is being profiled run unprofiled.
+    """
+    registry = registry or metrics
+    if not (registry.profiling_enabled if enabled is None else enabled):
+        yield
+        return
+    if not _profile_lock.acquire(blocking=False):
+        registry.increment("profile.skipped")
+        yield
+        return
+    try:
+        with _profiled(name, registry, top):
+            yield
+    finally:
+        _profile_lock.release()
+
+
+@contextmanager
+def _profiled(name: str, registry: MetricsRegistry, top: int) -> Iterator[None]:
+    profiler = cProfile.Profile()
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    else:
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        duration = time.perf_counter() - start
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if started_tracing:
+            tracemalloc.stop()
+
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(top)
+        allocations = [f"{stat.traceback.format()[-1].strip()}: {stat.size / 1024:.1f} KiB in {stat.count} blocks"
+                       for stat in snapshot.statistics("lineno")[:top]]
+        registry.profiles.append({"name": name, "started_at": time.time() - duration,
+                                  "duration_ms": duration * 1000, "peak_traced_mb": peak / 1e6,
+                                  "cpu": stream.getvalue(), "allocations": allocations})
+
+
+def slowest_spans(trace: Dict[str, Any], limit: int = 10) -> List[Dict[str, Any]]:
+    return sorted(trace["spans"], key=lambda span: span["duration_ms"], reverse=True)[:limit]
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    registry: MetricsRegistry = metrics
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/metrics":
+            body, content_type = self.registry.render_prometheus(), "text/plain; version=0.0.4"
+        elif self.path.rstrip("/") == "/metrics.json":
+            body, content_type = self.registry.render_json(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        payload = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        logger.debug("metrics endpoint: " + format, *args)
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1",
+                         registry: MetricsRegistry = None) -> http.server.ThreadingHTTPServer:
+    """Serve ``/metrics`` (Prometheus) and ``/metrics.json`` from a daemon thread."""
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry or metrics})
+    server = http.server.ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,324 @@
+# utils/model_artifact.py
+"""Versioned, fast-loading model artifacts.
+
+An artifact is a single uncompressed joblib file holding a metadata header and
+the model. Tree ensembles are not pickled tree by tree: their nodes are packed
+into a few flat arrays (int32 children, int16 features, float32 thresholds and
+values by default, plus each split's missing-value direction), which joblib
+memory-maps on load. The sklearn trees are then rebuilt from those arrays in one
+pass, avoiding pickle's per-node overhead and shrinking the file several times. Other estimators are stored as-is, so their
+NumPy arrays are memory-mapped too.
+
+Thresholds are rounded *down* to float32. sklearn casts inputs to float32 before
+walking a tree, and for any float32 ``x`` and float64 ``t``, ``x <= t`` holds
+exactly when ``x <= round_down_f32(t)``, so this halves their size without
+changing a single split decision. Only leaf values lose precision (~1e-7 relative).
+
+The header records the format version, feature list, training-data hash and the
+sklearn version. A model trained on other columns is rejected, and so are packed
+trees from another sklearn minor version (rebuilding them goes through sklearn's
+private tree state). Callers that know the current training data can pass
+``expected_data_hash`` (see ``dataset_hash``) to reject a stale model. Plain
+pickles from before this format still load, with a warning.
+"""
+import argparse
+import copy
+import hashlib
+import logging
+import os
+import pickle
+import warnings
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+import sklearn.exceptions
+from sklearn.tree._tree import NODE_DTYPE, Tree
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_FORMAT = "neural-nexus-model"
+ARTIFACT_VERSION = 1
+TREE_LEAF = -1
+TREE_UNDEFINED = -2
+
+
+class ModelArtifactError(ValueError):
+    """The artifact is unreadable, or does not match what the caller expects."""
+
+
+def dataset_hash(df: pd.DataFrame) -> str:
+    """Content hash of the training columns, independent of the file format they came from."""
+    hashed = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    digest = hashlib.sha256(hashed.tobytes())
+    digest.update(",".join(map(str, df.columns)).encode())
+    return digest.hexdigest()
+
+
+def _is_tree_ensemble(model) -> bool:
+    estimators = getattr(model, "estimators_", None)
+    return (isinstance(estimators, list) and len(estimators) > 0
+            and all(hasattr(est, "tree_") and not hasattr(est, "classes_") for est in estimators))
+
+
+def _node_depths(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    depth = np.zeros(len(left), dtype=np.int32)
+    frontier = np.array([0])
+    level = 0
+    while len(frontier):
+        children = np.concatenate([left[frontier], right[frontier]])
+        frontier = children[children != TREE_LEAF]
+        level += 1
+        depth[frontier] = level
+    return depth
+
+
+def _pack_tree(tree, float32: bool, max_depth: Optional[int]) -> Dict[str, np.ndarray]:
+    state = tree.__getstate__()
+    nodes = state["nodes"]
+    arrays = {
+        "left": nodes["left_child"], "right": nodes["right_child"], "feature": nodes["feature"],
+        "threshold": nodes["threshold"], "impurity": nodes["impurity"],
+        "n_node_samples": nodes["n_node_samples"],
+        "weighted_n_node_samples": nodes["weighted_n_node_samples"],
+        "value": state["values"].reshape(len(nodes), -1),
+    }
+    if "missing_go_to_left" in nodes.dtype.names:
+        # Where rows with NaN go at each split; all zeros unless the model saw missing values
+        arrays["missing_go_to_left"] = nodes["missing_go_to_left"]
+    tree_depth = state["max_depth"]
+
+    if max_depth is not None and tree_depth > max_depth:
+        # Internal nodes already hold the mean of their samples, so cutting a
+        # subtree off and turning its root into a leaf keeps predictions sensible
+        depth = _node_depths(arrays["left"], arrays["right"])
+        keep = depth <= max_depth
+        new_index = np.cumsum(keep) - 1
+        arrays = {name: values[keep] for name, values in arrays.items()}
+        cut = depth[keep] == max_depth
+        for child in ("left", "right"):
+            arrays[child] = np.where(cut | (arrays[child] == TREE_LEAF), TREE_LEAF,
+                                     new_index[np.maximum(arrays[child], 0)])
+        arrays["feature"] = np.where(cut, TREE_UNDEFINED, arrays["feature"])
+        arrays["threshold"] = np.where(cut, TREE_UNDEFINED, arrays["threshold"])
+        if "missing_go_to_left" in arrays:
+            arrays["missing_go_to_left"] = np.where(cut, 0, arrays["missing_go_to_left"])
+        tree_depth = max_depth
+
+    float_dtype = np.float32 if float32 else np.float64
+    threshold = arrays["threshold"]
+    if float32:
+        rounded = threshold.astype(np.float32)
+        too_high = rounded.astype(np.float64) > threshold
+        rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+        threshold = rounded
+
+    packed = {
+        "left": arrays["left"].astype(np.int32),
+        "right": arrays["right"].astype(np.int32),
+        "feature": arrays["feature"].astype(np.int16),
+        "threshold": threshold,
+        "impurity": arrays["impurity"].astype(float_dtype),
+        "n_node_samples": arrays["n_node_samples"].astype(np.int32),
+        "weighted_n_node_samples": arrays["weighted_n_node_samples"].astype(float_dtype),
+        "value": arrays["value"].astype(float_dtype),
+        "max_depth": tree_depth,
+    }
+    if "missing_go_to_left" in arrays:
+        packed["missing_go_to_left"] = arrays["missing_go_to_left"].astype(np.uint8)
+    return packed
+
+
+def _pack_ensemble(model, float32: bool, max_trees: Optional[int], max_depth: Optional[int]) -> Dict[str, Any]:
+    estimators = model.estimators_[:max_trees] if max_trees else model.estimators_
+    packed = [_pack_tree(est.tree_, float32, max_depth) for est in estimators]
+    sizes = np.array([len(p["left"]) for p in packed], dtype=np.int64)
+
+    # Fitted attributes without the trees themselves, which are stored as arrays
+    skeleton = copy.copy(model)
+    skeleton.estimators_ = []
+    if max_trees and len(model.estimators_) > max_trees:
+        skeleton.set_params(n_estimators=max_trees)
+    tree_skeletons = []
+    for est in estimators:
+        est = copy.copy(est)
+        del est.tree_
+        tree_skeletons.append(est)
+
+    arrays = {name: np.concatenate([p[name] for p in packed])
+              for name in packed[0] if name != "max_depth"}
+    arrays["offsets"] = np.concatenate([[0], np.cumsum(sizes)])
+    arrays["max_depth"] = np.array([p["max_depth"] for p in packed], dtype=np.int32)
+    # The small Python objects go in as one pickle blob: joblib unpickles with the
+    # pure-Python unpickler, which would otherwise dominate load time for many trees
+    skeletons = pickle.dumps((skeleton, tree_skeletons), protocol=pickle.HIGHEST_PROTOCOL)
+    return {"skeletons": skeletons, "n_trees": len(tree_skeletons), "arrays": arrays}
+
+
+def _unpack_ensemble(packed: Dict[str, Any]):
+    arrays = packed["arrays"]
+    model, tree_skeletons = pickle.loads(packed["skeletons"])
+    n_outputs = getattr(model, "n_outputs_", 1)
+    n_classes = np.ones(n_outputs, dtype=np.intp)
+    offsets = arrays["offsets"]
+
+    # Expand all trees' nodes in one vectorized pass; each tree then gets a contiguous slice
+    nodes = np.zeros(offsets[-1], dtype=NODE_DTYPE)
+    for field, name in (("left_child", "left"), ("right_child", "right"), ("feature", "feature"),
+                        ("threshold", "threshold"), ("impurity", "impurity"),
+                        ("n_node_samples", "n_node_samples"),
+                        ("weighted_n_node_samples", "weighted_n_node_samples"),
+                        ("missing_go_to_left", "missing_go_to_left")):
+        if field in NODE_DTYPE.names and name in arrays:
+            nodes[field] = arrays[name]
+        elif field in NODE_DTYPE.names or name in arrays:
+            # The node layout of the saving and the running sklearn differ; guessing would misroute rows
+            raise ModelArtifactError(f"Packed trees have no '{name}' for this scikit-learn version "
+                                     f"({sklearn.__version__}); retrain or re-save the model")
+    values = np.asarray(arrays["value"], dtype=np.float64).reshape(-1, n_outputs, 1)
+
+    estimators = []
+    for i, est in enumerate(tree_skeletons):
+        start, end = offsets[i], offsets[i + 1]
+        tree = Tree(model.n_features_in_, n_classes, n_outputs)
+        tree.__setstate__({"max_depth": int(arrays["max_depth"][i]), "node_count": int(end - start),
+                           "nodes": nodes[start:end], "values": values[start:end]})
+        est.tree_ = tree  # skeletons are freshly unpickled, so no copy is needed
+        estimators.append(est)
+
+    model.estimators_ = estimators
+    return model
+
+
+def save_model_artifact(model, path: str, features: List[str], training_data_hash: Optional[str] = None,
+                        float32: bool = True, max_trees: Optional[int] = None,
+                        max_depth: Optional[int] = None, extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Write ``model`` with its metadata header; returns the header.
+
+    ``float32`` stores thresholds/values in single precision; ``max_trees`` and
+    ``max_depth`` prune tree ensembles (first trees kept, deeper nodes cut off).
+    ``extra`` is merged into the header (e.g. evaluation metrics).
+    """
+    header = {
+        "format": ARTIFACT_FORMAT,
+        "format_version": ARTIFACT_VERSION,
+        "model_type": type(model).__name__,
+        "features": list(features),
+        "training_data_hash": training_data_hash,
+        "sklearn_version": sklearn.__version__,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "float32": bool(float32),
+        **(extra or {}),
+    }
+    if _is_tree_ensemble(model):
+        body = {"kind": "tree_ensemble", **_pack_ensemble(model, float32, max_trees, max_depth)}
+        header["n_trees"] = body["n_trees"]
+        header["node_count"] = int(body["arrays"]["offsets"][-1])
+        header["max_depth"] = max_depth
+    else:
+        body = {"kind": "estimator", "model": model}
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    # Uncompressed, so arrays can be memory-mapped straight from the file
+    joblib.dump({"header": header, **body}, tmp_path, compress=0)
+    os.replace(tmp_path, path)
+    logger.info(f"Saved {header['model_type']} artifact to {path} ({os.path.getsize(path) / 1e6:.2f} MB)")
+    return header
+
+
+def _load_payload(path: str):
+    try:
+        with warnings.catch_warnings():
+            # Version drift is reported from the header below, with more context
+            warnings.simplefilter("ignore", getattr(sklearn.exceptions, "InconsistentVersionWarning", UserWarning))
+            return joblib.load(path, mmap_mode="r")
+    except Exception as e:
+        raise ModelArtifactError(f"Could not read model artifact {path}: {str(e)}") from e
+
+
+def _is_artifact(payload) -> bool:
+    return isinstance(payload, dict) and "header" in payload and "kind" in payload
+
+
+def read_header(path: str) -> Optional[Dict[str, Any]]:
+    """The artifact header, or None for a legacy pickle without one."""
+    payload = _load_payload(path)
+    return payload["header"] if _is_artifact(payload) else None
+
+
+def check_header(header: Dict[str, Any], path: str, expected_features: Optional[List[str]] = None,
+                 expected_data_hash: Optional[str] = None):
+    """Raise ``ModelArtifactError`` when the artifact does not fit the caller's data."""
+    if header.get("format") != ARTIFACT_FORMAT or header.get("format_version") != ARTIFACT_VERSION:
+        raise ModelArtifactError(f"Unsupported model artifact format in {path}: "
+                                 f"{header.get('format')} v{header.get('format_version')}")
+    if expected_features is not None and list(header.get("features") or []) != list(expected_features):
+        raise ModelArtifactError(f"Model {path} was trained on features {header.get('features')}, "
+                                 f"expected {list(expected_features)}")
+    if expected_data_hash is not None and header.get("training_data_hash") != expected_data_hash:
+        raise ModelArtifactError(f"Model {path} is stale: it was trained on different data")
+    if header.get("sklearn_version", "").split(".")[:2] != sklearn.__version__.split(".")[:2]:
+        if header.get("n_trees") is not None:
+            # Packed trees are rebuilt through sklearn's private Tree state, whose layout changes between releases
+            raise ModelArtifactError(f"Model {path} holds packed trees saved with scikit-learn "
+                                     f"{header.get('sklearn_version')}, which cannot be rebuilt safely with "
+                                     f"{sklearn.__version__}; retrain it, or re-save it with that version")
+        logger.warning(f"Model {path} was saved with scikit-learn {header.get('sklearn_version')}, "
+                       f"running {sklearn.__version__}; consider retraining")
+
+
+def load_model_artifact(path: str, expected_features: Optional[List[str]] = None,
+                        expected_data_hash: Optional[str] = None) -> Tuple[Any, Optional[Dict[str, Any]]]:
+    """Load a model and its header, validating it against the expected features/data.
+
+    Legacy plain pickles are accepted (header ``None``) but cannot be validated.
+    """
+    payload = _load_payload(path)
+    if not _is_artifact(payload):
+        if not hasattr(payload, "predict"):
+            raise ModelArtifactError(f"{path} does not contain a model")
+        logger.warning(f"{path} is a legacy pickle without metadata; features and training data "
+                       f"cannot be checked. Re-save it with `python -m utils.model_artifact convert`.")
+        return payload, None
+
+    header = payload["header"]
+    check_header(header, path, expected_features, expected_data_hash)
+    if payload["kind"] == "tree_ensemble":
+        model = _unpack_ensemble(payload)
+    elif payload["kind"] == "estimator":
+        model = payload["model"]
+    else:
+        raise ModelArtifactError(f"Unknown model payload {payload['kind']!r} in {path}")
+    return model, header
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect model artifacts or convert legacy pickles.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert = subparsers.add_parser("convert", help="Re-save a model (e.g. a legacy .pkl) as an artifact")
+    convert.add_argument("src", help="Input model (.pkl or artifact)")
+    convert.add_argument("dst", help="Output artifact path (.joblib)")
+    convert.add_argument("--features", default="bandwidth,latency,signal_strength",
+                         help="Comma-separated feature columns the model was trained on")
+    convert.add_argument("--float64", action="store_true", help="Keep thresholds/values in double precision")
+    convert.add_argument("--max-trees", type=int, default=None, help="Keep only the first N trees")
+    convert.add_argument("--max-depth", type=int, default=None, help="Prune trees below this depth")
+    inspect = subparsers.add_parser("inspect", help="Print an artifact's header")
+    inspect.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        model, old_header = load_model_artifact(args.src)
+        features = old_header["features"] if old_header else args.features.split(",")
+        data_hash = old_header.get("training_data_hash") if old_header else None
+        save_model_artifact(model, args.dst, features, data_hash, float32=not args.float64,
+                            max_trees=args.max_trees, max_depth=args.max_depth)
+        print(f"Wrote {args.dst} ({os.path.getsize(args.dst) / 1e6:.2f} MB, "
+              f"source was {os.path.getsize(args.src) / 1e6:.2f} MB)")
+    else:
+        for key, value in (read_header(args.path) or {"format": "legacy pickle (no header)"}).items():
+            print(f"{key}: {value}")
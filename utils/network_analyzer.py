@@ -1,70 +1,296 @@
 # utils/network_analyzer.py
 import pandas as pd
 import numpy as np
+from sklearn.base import clone
 from sklearn.ensemble import RandomForestRegressor
-import pickle
+from sklearn.exceptions import NotFittedError
+from sklearn.utils.validation import check_is_fitted
+import copy
 import logging
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 import os
+from utils.explainer import ModelExplainer, get_explainer
+from utils.kpi_engine import ENERGY_SCALE, KPI_COLUMNS, NetworkKPIEngine
+from utils.metrics import count, timed
+from utils.model_artifact import load_model_artifact
+from utils.storage import iter_network_stats, read_columns, read_network_stats
 
 logger = logging.getLogger(__name__)
 
+FEATURE_COLUMNS = ['bandwidth', 'latency', 'signal_strength']
+TARGET_COLUMN = 'uptime'
+REQUIRED_COLUMNS = FEATURE_COLUMNS + [TARGET_COLUMN]
+DEFAULT_CHUNK_SIZE = 100_000
+# Larger than DEFAULT_CHUNK_SIZE: each KPI append re-summarizes the windows it touches, which for
+# files not sorted by time can be all of them
+KPI_CHUNK_SIZE = 500_000
+
+
 class NetworkAnalyzer:
-    def __init__(self, model_path: str = None):
-        """Initialize with an optional pre-trained model."""
-        if model_path and os.path.exists(model_path):
-            with open(model_path, "rb") as f:
-                self.model = pickle.load(f)
-            logger.info(f"Loaded pre-trained model from {model_path}")
+    def __init__(self, model_path: str = None, model=None, scorer=None, expected_data_hash: str = None):
+        """Initialize with an optional pre-trained model (or an already loaded one).
+
+        ``scorer`` is an optional shared ``BatchScorer``; it is used for prediction
+        as long as this analyzer still holds the scorer's model (i.e. hasn't retrained)
+        and the scorer is open; otherwise the model predicts directly.
+        With ``expected_data_hash``, a model trained on other data is rejected as stale.
+        """
+        self.scorer = scorer
+        if model is not None:
+            self.model = model
+        elif model_path and os.path.exists(model_path):
+            self.model = self.load_model(model_path, expected_data_hash)
         else:
             self.model = RandomForestRegressor(n_estimators=100, random_state=42)
             logger.info("Initialized new RandomForestRegressor model")
 
-    def load_data(self, data_path: str) -> pd.DataFrame:
-        """Load network data from a CSV file."""
+    @staticmethod
+    @timed("model.load")
+    def load_model(model_path: str, expected_data_hash: str = None):
+        """Load a pre-trained model artifact (or legacy pickle) from disk.
+
+        Raises ``ModelArtifactError`` if the model was trained on other feature columns,
+        or on other data than ``expected_data_hash`` (a ``dataset_hash``) when given.
+        """
+        model, header = load_model_artifact(model_path, expected_features=FEATURE_COLUMNS,
+                                            expected_data_hash=expected_data_hash)
+        if header is not None:
+            logger.info(f"Loaded {header['model_type']} model from {model_path} "
+                        f"(trained {header['created_at']}, scikit-learn {header['sklearn_version']})")
+        else:
+            logger.info(f"Loaded pre-trained model from {model_path}")
+        return model
+
+    def _validate_header(self, data_path: str) -> List[str]:
+        """Read only the header/schema and check the required columns are present."""
+        columns = read_columns(data_path)
+        missing = [col for col in REQUIRED_COLUMNS if col not in columns]
+        if missing:
+            raise ValueError(f"Missing required columns in data: {', '.join(missing)}")
+        return columns
+
+    @timed("analyzer.load_data")
+    def load_data(self, data_path: str, columns: List[str] = None) -> pd.DataFrame:
+        """Load network data from CSV, Parquet or Arrow IPC, reading only the needed columns.
+
+        Defaults to the four model columns as float32; extra ``columns`` (e.g.
+        ``node_id``) are read with their stored/inferred dtype.
+        """
         try:
-            df = pd.read_csv(data_path)
-            required_columns = ['bandwidth', 'latency', 'signal_strength', 'uptime']
-            if not all(col in df.columns for col in required_columns):
-                raise ValueError("Missing required columns in data.")
-            return df
+            self._validate_header(data_path)
+            columns = columns or REQUIRED_COLUMNS
+            df = read_network_stats(data_path, columns)
+            return df[columns]
         except Exception as e:
             logger.error(f"Error loading data: {str(e)}")
             raise
 
+    def iter_data(self, data_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+        """Stream the model columns as float32 chunks of at most ``chunk_size`` rows.
+
+        Peak memory is bounded by the chunk size rather than the file size.
+        """
+        try:
+            self._validate_header(data_path)
+            yield from iter_network_stats(data_path, REQUIRED_COLUMNS, chunk_size)
+        except Exception as e:
+            logger.error(f"Error streaming data: {str(e)}")
+            raise
+
     def preprocess_data(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series]:
         """Prepare data for prediction."""
-        features = df[['bandwidth', 'latency', 'signal_strength']]
-        target = df['uptime']
+        features = df[FEATURE_COLUMNS]
+        target = df[TARGET_COLUMN]
         return features, target
 
+    def is_fitted(self, model=None) -> bool:
+        """Whether ``model`` (default: the current model) can be used for prediction without training."""
+        try:
+            check_is_fitted(self.model if model is None else model)
+            return True
+        except NotFittedError:
+            return False
+
+    @timed("analyzer.train_model")
     def train_model(self, features: pd.DataFrame, target: pd.Series):
         """Train the predictive model."""
         try:
-            self.model.fit(features, target)
+            # Fit a fresh copy so a model shared across sessions is never mutated in place
+            model = clone(self.model)
+            model.fit(features, target)
+            self.model = model
             logger.info("Network prediction model trained successfully")
         except Exception as e:
             logger.error(f"Error training model: {str(e)}")
             raise
 
-    def predict_downtime(self, features: pd.DataFrame) -> List[float]:
+    @timed("analyzer.update_model")
+    def update_model(self, features: pd.DataFrame, target: pd.Series, n_new_trees: int = 10,
+                     max_trees: int = 300):
+        """Incrementally train on a new batch only, keeping what the model already learned.
+
+        Forests grow ``n_new_trees`` extra trees fitted on the batch (``warm_start``),
+        dropping the oldest trees beyond ``max_trees`` so prediction cost stays bounded.
+        Regressors exposing ``partial_fit`` are updated in place on a copy.
+        Falls back to a full fit when the model has never been trained.
+        """
+        try:
+            if not self.is_fitted():
+                self.train_model(features, target)
+                return
+
+            if isinstance(self.model, RandomForestRegressor):
+                # Shallow copy with its own tree list: fitted trees are shared, never mutated
+                model = copy.copy(self.model)
+                model.estimators_ = list(self.model.estimators_)
+                model.set_params(warm_start=True, n_estimators=len(model.estimators_) + n_new_trees)
+                model.fit(features, target)
+                if len(model.estimators_) > max_trees:
+                    model.estimators_ = model.estimators_[-max_trees:]
+                    model.set_params(n_estimators=max_trees)
+            elif hasattr(self.model, "partial_fit"):
+                model = copy.deepcopy(self.model)
+                model.partial_fit(features, target)
+            else:
+                raise ValueError(f"{type(self.model).__name__} does not support incremental training.")
+
+            self.model = model
+            logger.info(f"Network prediction model updated incrementally on {len(features)} rows")
+        except Exception as e:
+            logger.error(f"Error updating model: {str(e)}")
+            raise
+
+    def _active_scorer(self):
+        # A scorer closed because the model file reloaded stays referenced by running jobs and the
+        # telemetry stream until their next page render; they predict directly in the meantime
+        if self.scorer is None or self.scorer.closed or self.scorer.model is not self.model:
+            return None
+        return self.scorer
+
+    @timed("analyzer.predict")
+    def predict_downtime(self, features: pd.DataFrame) -> np.ndarray:
         """Predict network uptime/downtime."""
         try:
-            predictions = self.model.predict(features)
-            return predictions.tolist()
+            count("analyzer.predicted_rows", len(features))
+            scorer = self._active_scorer()
+            if scorer is not None:
+                try:
+                    return scorer.predict(features)
+                except RuntimeError:
+                    if not scorer.closed:  # only a scorer closed while we were queued falls through
+                        raise
+            return self.model.predict(features)
         except Exception as e:
             logger.error(f"Error predicting downtime: {str(e)}")
             raise
 
+    def explainer(self) -> ModelExplainer:
+        """Attributions for the current model (built once per model, separate from prediction)."""
+        return get_explainer(self.model, FEATURE_COLUMNS)
+
+    @timed("analyzer.explain")
+    def explain_predictions(self, features: pd.DataFrame) -> pd.DataFrame:
+        """Per-row prediction, bias and bandwidth/latency/signal_strength contributions, plus the main ``driver``."""
+        try:
+            return self.explainer().explain(features)
+        except Exception as e:
+            logger.error(f"Error explaining predictions: {str(e)}")
+            raise
+
+    def feature_importance(self, features: pd.DataFrame, target: pd.Series = None,
+                           cache_path: str = None) -> pd.DataFrame:
+        """Global feature importance; cached per model in ``cache_path`` (see ``explanations_path``)."""
+        try:
+            return self.explainer().global_importance(features, target, cache_path=cache_path)
+        except Exception as e:
+            logger.error(f"Error computing feature importance: {str(e)}")
+            raise
+
+    @timed("analyzer.energy")
     def analyze_energy_efficiency(self, df: pd.DataFrame) -> Dict[str, float]:
         """Estimate energy usage based on network metrics."""
         try:
-            # Simplified energy model: energy = bandwidth * uptime * scaling factor
-            energy_usage = df['bandwidth'] * df['uptime'] * 0.1
-            return {
-                "avg_energy_usage": energy_usage.mean(),
-                "total_energy_usage": energy_usage.sum()
-            }
+            return self._energy_stats(*self._energy_totals(df))
         except Exception as e:
             logger.error(f"Error analyzing energy efficiency: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    def analyze_energy_efficiency_chunks(self, chunks: Iterable[pd.DataFrame]) -> Dict[str, float]:
+        """Same as ``analyze_energy_efficiency`` but accumulated over a stream of chunks."""
+        total, count = 0.0, 0
+        for chunk in chunks:
+            chunk_total, chunk_count = self._energy_totals(chunk)
+            total += chunk_total
+            count += chunk_count
+        return self._energy_stats(total, count)
+
+    @timed("analyzer.analyze_file")
+    def analyze_file(self, data_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                     progress: Optional[Callable[[int], None]] = None) -> Tuple[np.ndarray, Dict[str, float]]:
+        """Predict uptime and compute energy stats in a single streaming pass over a file.
+
+        ``progress`` is called with the number of rows processed so far after each chunk.
+        """
+        predictions: List[np.ndarray] = []
+        total, count, rows = 0.0, 0, 0
+        for chunk in self.iter_data(data_path, chunk_size):
+            predictions.append(self.predict_downtime(chunk[FEATURE_COLUMNS]))
+            chunk_total, chunk_count = self._energy_totals(chunk)
+            total += chunk_total
+            count += chunk_count
+            rows += len(chunk)
+            if progress is not None:
+                progress(rows)
+        return (np.concatenate(predictions) if predictions else np.empty(0)), self._energy_stats(total, count)
+
+    @timed("analyzer.kpis")
+    def analyze_kpis(self, data_path: str, window: str = "1h",
+                     chunk_size: int = KPI_CHUNK_SIZE) -> Optional[NetworkKPIEngine]:
+        """Per-node and per-window KPIs for a file with a ``timestamp`` column (None without one).
+
+        Only the KPI columns are read, in chunks fed to the engine's incremental
+        ``append``; files without ``node_id`` are treated as a single node.
+        """
+        try:
+            columns = self._validate_header(data_path)
+            if 'timestamp' not in columns:
+                return None
+            engine = NetworkKPIEngine(window)
+            for chunk in iter_network_stats(data_path, [col for col in KPI_COLUMNS if col in columns], chunk_size):
+                engine.append(chunk)
+            return engine
+        except Exception as e:
+            logger.error(f"Error computing KPIs: {str(e)}")
+            raise
+
+    @timed("analyzer.score_file")
+    def score_file(self, data_path: str, out_path: str = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> np.ndarray:
+        """Score a whole file out-of-core; with ``out_path`` the result is a float32 memory map."""
+        try:
+            scorer = self._active_scorer()
+            if scorer is None:
+                from utils.batch_inference import BatchScorer
+                scorer = BatchScorer(self.model)
+                try:
+                    return scorer.score_chunks(self.iter_data(data_path, chunk_size), out_path)
+                finally:
+                    scorer.close()
+            return scorer.score_chunks(self.iter_data(data_path, chunk_size), out_path)
+        except Exception as e:
+            logger.error(f"Error scoring file: {str(e)}")
+            raise
+
+    @staticmethod
+    def _energy_totals(df: pd.DataFrame) -> Tuple[float, int]:
+        # Simplified energy model: energy = bandwidth * uptime * scaling factor
+        # (accumulated in float64 so float32 inputs don't lose precision over large sums)
+        # Rows with a missing bandwidth or uptime are left out of both the sum and the count
+        energy_usage = df['bandwidth'].to_numpy(np.float64) * df['uptime'].to_numpy(np.float64) * ENERGY_SCALE
+        return float(np.nansum(energy_usage)), int(np.count_nonzero(~np.isnan(energy_usage)))
+
+    @staticmethod
+    def _energy_stats(total: float, count: int) -> Dict[str, float]:
+        return {
+            "avg_energy_usage": total / count if count else float("nan"),
+            "total_energy_usage": total
+        }
\ No newline at end of file
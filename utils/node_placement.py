@@ -0,0 +1,120 @@
+# utils/node_placement.py
+import logging
+from typing import Dict, Optional
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+
+class NodePlacementEngine:
+    """Population-weighted, coverage-radius-constrained node placement.
+
+    Solves a greedy maximum-coverage problem: each chosen node covers every location
+    within ``coverage_radius_km``, and nodes are added where they cover the most
+    still-uncovered population, until ``max_nodes`` is reached or everything is covered.
+
+    To scale to 100k+ locations, points are first snapped onto a grid with cells of
+    ``coverage_radius_km * cell_fraction``; the population-weighted centroid of each
+    occupied cell acts as both demand point and candidate site. Neighbour pairs come
+    from a single vectorized STRtree ``dwithin`` query and the greedy updates are
+    sparse matrix-vector products, so no step loops over individual locations.
+    """
+
+    def __init__(self, coverage_radius_km: float = 5.0, max_nodes: Optional[int] = None,
+                 cell_fraction: float = 0.25):
+        if coverage_radius_km <= 0:
+            raise ValueError("coverage_radius_km must be positive.")
+        self.coverage_radius_km = coverage_radius_km
+        self.max_nodes = max_nodes
+        self.cell_fraction = cell_fraction
+
+    def place(self, gdf: gpd.GeoDataFrame, weight_column: Optional[str] = "population") -> Dict[str, np.ndarray]:
+        """Choose node locations for the geometries in ``gdf``.
+
+        Returns a dict with ``lat``/``lon`` arrays of node locations (in selection
+        order), ``covered_weight`` per node and the overall ``coverage_fraction``.
+        """
+        if gdf.crs is None:
+            gdf = gdf.set_crs("EPSG:4326")
+        projected = gdf.to_crs(gdf.estimate_utm_crs())
+        xy = shapely.get_coordinates(projected.geometry.centroid.values)
+
+        weights = np.ones(len(xy))
+        if weight_column and weight_column in gdf.columns:
+            weights = gdf[weight_column].to_numpy(dtype=np.float64, na_value=0.0)
+            weights = np.where(weights > 0, weights, 0.0)
+            if not weights.any():
+                weights = np.ones(len(xy))
+
+        cell_xy, cell_weight = self._aggregate_cells(xy, weights)
+        coverage = self._coverage_matrix(cell_xy)
+        chosen, covered_weight = self._greedy_cover(coverage, cell_weight)
+
+        nodes = gpd.GeoSeries(shapely.points(cell_xy[chosen]), crs=projected.crs).to_crs("EPSG:4326")
+        return {
+            "lat": nodes.y.to_numpy(),
+            "lon": nodes.x.to_numpy(),
+            "covered_weight": covered_weight,
+            "coverage_fraction": covered_weight.sum() / cell_weight.sum() if cell_weight.sum() else 0.0,
+        }
+
+    def _aggregate_cells(self, xy: np.ndarray, weights: np.ndarray):
+        cell_size = self.coverage_radius_km * 1000 * self.cell_fraction
+        keys = np.floor(xy / cell_size).astype(np.int64)
+        _, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        n_cells = inverse.max() + 1
+
+        # Weighted centroid per cell (plain mean for cells whose total weight is zero)
+        cell_weight = np.bincount(inverse, weights=weights, minlength=n_cells)
+        counts = np.bincount(inverse, minlength=n_cells)
+        denom = np.where(cell_weight > 0, cell_weight, counts)
+        eff_weights = np.where(cell_weight[inverse] > 0, weights, 1.0)
+        cell_xy = np.column_stack([
+            np.bincount(inverse, weights=xy[:, 0] * eff_weights, minlength=n_cells) / denom,
+            np.bincount(inverse, weights=xy[:, 1] * eff_weights, minlength=n_cells) / denom,
+        ])
+        return cell_xy, cell_weight
+
+    def _coverage_matrix(self, cell_xy: np.ndarray) -> sparse.csr_matrix:
+        """Sparse (candidate x demand) matrix: 1 where the candidate covers the demand cell."""
+        points = shapely.points(cell_xy)
+        tree = shapely.STRtree(points)
+        demand_idx, candidate_idx = tree.query(points, predicate="dwithin",
+                                               distance=self.coverage_radius_km * 1000)
+        n = len(cell_xy)
+        return sparse.csr_matrix((np.ones(len(candidate_idx), dtype=np.float64), (candidate_idx, demand_idx)),
+                                 shape=(n, n))
+
+    def _greedy_cover(self, coverage: sparse.csr_matrix, demand_weight: np.ndarray):
+        coverage_csc = coverage.tocsc()
+        uncovered = np.ones(coverage.shape[1], dtype=bool)
+        gain = coverage @ demand_weight
+        limit = self.max_nodes or coverage.shape[0]
+        chosen, covered_weight = [], []
+
+        while len(chosen) < limit:
+            best = int(np.argmax(gain))
+            if gain[best] <= 0:
+                if not uncovered.any():
+                    break
+                # Only zero-weight locations remain; cover them too when unconstrained
+                if self.max_nodes is not None:
+                    break
+                best = int(np.flatnonzero(uncovered)[0])
+            row = coverage.indices[coverage.indptr[best]:coverage.indptr[best + 1]]
+            newly = row[uncovered[row]]
+            uncovered[newly] = False
+            chosen.append(best)
+            covered_weight.append(demand_weight[newly].sum())
+            # Incremental update: only candidates overlapping the newly covered cells lose gain
+            gain -= coverage_csc[:, newly] @ demand_weight[newly]
+            gain[best] = -np.inf
+            if not uncovered.any():
+                break
+
+        return np.asarray(chosen, dtype=np.int64), np.asarray(covered_weight, dtype=np.float64)
@@ -0,0 +1,95 @@
+# utils/resource_manager.py
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from utils.cache import file_digest
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ResourceManager:
+    """Process-wide registry for expensive objects shared by every Streamlit session.
+
+    Streamlit re-executes the page script on every interaction, but imported
+    modules survive, so objects held here are built once per worker process.
+    Resources tied to a file (e.g. the model pickle) are rebuilt only when the
+    file's mtime/size changes *and* its content hash differs.
+    """
+
+    def __init__(self):
+        self._resources: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+        self.started_at = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+
+    def get(self, name: str, factory: Callable[[], Any], watch_path: Optional[str] = None) -> Any:
+        """Return the cached resource, building (or rebuilding) it when needed."""
+        with self._lock:
+            entry = self._resources.get(name)
+            stat_signature = self._stat_signature(watch_path) if watch_path else None
+
+            if entry is not None:
+                if stat_signature == entry["stat_signature"]:
+                    return entry["value"]
+                # mtime/size changed; only rebuild if the content actually differs
+                digest = self._file_digest(watch_path) if stat_signature else None
+                if digest is not None and digest == entry["digest"]:
+                    entry["stat_signature"] = stat_signature
+                    return entry["value"]
+                logger.info(f"Resource '{name}' changed on disk, reloading")
+
+            start = time.perf_counter()
+            value = factory()
+            self.timings[f"load.{name}"] = time.perf_counter() - start
+            metrics.observe("resource.load", self.timings[f"load.{name}"], resource=name)
+            self._resources[name] = {
+                "value": value,
+                "stat_signature": stat_signature,
+                "digest": self._file_digest(watch_path) if stat_signature else None,
+            }
+            logger.info(f"Built resource '{name}' in {self.timings[f'load.{name}'] * 1000:.1f} ms")
+            return value
+
+    def peek(self, name: str) -> Any:
+        """The resource if it has already been built, else None (never builds it)."""
+        with self._lock:
+            entry = self._resources.get(name)
+            return entry["value"] if entry is not None else None
+
+    def invalidate(self, name: str = None):
+        """Drop one cached resource, or all of them."""
+        with self._lock:
+            if name is None:
+                self._resources.clear()
+            else:
+                self._resources.pop(name, None)
+
+    def record_timing(self, name: str, seconds: float):
+        """Store an arbitrary timing measurement (in seconds)."""
+        self.timings[name] = seconds
+
+    def get_timings(self) -> Dict[str, float]:
+        """Return a copy of all recorded timings, in seconds."""
+        return dict(self.timings)
+
+    @staticmethod
+    def _stat_signature(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def _file_digest(path: str) -> Optional[str]:
+        try:
+            return file_digest(path)
+        except OSError:
+            return None
+
+
+resource_manager = ResourceManager()
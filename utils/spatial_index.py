@@ -0,0 +1,128 @@
+# utils/spatial_index.py
+import hashlib
+import logging
+import os
+from typing import List, Optional, Tuple
+
+import geopandas as gpd
+import joblib
+import numpy as np
+import shapely
+from scipy.spatial import cKDTree
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+INDEX_FORMAT_VERSION = 1
+
+
+def coordinates_digest(lat: np.ndarray, lon: np.ndarray) -> str:
+    """Content hash of a coordinate set, used to key cached/persisted indexes."""
+    coords = np.ascontiguousarray(np.column_stack([lat, lon]), dtype=np.float64)
+    return hashlib.sha256(coords.tobytes()).hexdigest()
+
+
+def geodataframe_latlon(gdf: gpd.GeoDataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorized WGS84 (lat, lon) of each geometry's centroid."""
+    if gdf.crs is not None and not gdf.crs.equals("EPSG:4326"):
+        gdf = gdf.to_crs("EPSG:4326")
+    xy = shapely.get_coordinates(shapely.centroid(gdf.geometry.values))
+    return xy[:, 1], xy[:, 0]
+
+
+def _unit_vectors(lat, lon) -> np.ndarray:
+    lat = np.radians(np.atleast_1d(np.asarray(lat, dtype=np.float64)))
+    lon = np.radians(np.atleast_1d(np.asarray(lon, dtype=np.float64)))
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+
+def _chord_to_km(chord: np.ndarray) -> np.ndarray:
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0.0, 1.0))
+
+
+def _km_to_chord(radius_km: float) -> float:
+    return 2 * np.sin(min(radius_km / EARTH_RADIUS_KM, np.pi) / 2)
+
+
+class SpatialIndex:
+    """Great-circle index over a set of points.
+
+    Points are stored as 3D unit vectors in a KD-tree: straight-line (chord)
+    distance is monotonic in great-circle distance, so nearest-neighbour and
+    radius results are exact haversine results, at KD-tree speed and using all
+    cores (``workers=-1``). Queries are batched: pass arrays of query coordinates
+    and get arrays back. Distances are in kilometres; returned indices refer to
+    the indexed points.
+    """
+
+    def __init__(self, lat: np.ndarray, lon: np.ndarray, leaf_size: int = 16):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        self.digest = coordinates_digest(lat, lon)
+        self.size = len(lat)
+        self.tree = cKDTree(_unit_vectors(lat, lon), leafsize=leaf_size)
+
+    @classmethod
+    def from_geodataframe(cls, gdf: gpd.GeoDataFrame, leaf_size: int = 16) -> "SpatialIndex":
+        lat, lon = geodataframe_latlon(gdf)
+        return cls(lat, lon, leaf_size=leaf_size)
+
+    def query_nearest(self, lat, lon, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """Distances (km) and indices of the ``k`` nearest indexed points, each shaped (n_queries, k)."""
+        k = min(k, self.size)
+        chord, idx = self.tree.query(_unit_vectors(lat, lon), k=k, workers=-1)
+        return _chord_to_km(chord).reshape(-1, k), idx.reshape(-1, k)
+
+    def query_radius(self, lat, lon, radius_km: float) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+        """Per query point, indices and distances (km) of indexed points within ``radius_km``, nearest first."""
+        queries = _unit_vectors(lat, lon)
+        hits = self.tree.query_ball_point(queries, _km_to_chord(radius_km), workers=-1)
+        lengths = np.fromiter(map(len, hits), dtype=np.int64, count=len(hits))
+        flat_idx = np.concatenate(hits).astype(np.int64, copy=False) if len(hits) else np.empty(0, np.int64)
+        group = np.repeat(np.arange(len(hits)), lengths)
+
+        # Distances for all hits at once, then sort by (query, distance)
+        points = self.tree.data[flat_idx]
+        dist = _chord_to_km(np.linalg.norm(points - queries[group], axis=1))
+        order = np.lexsort((dist, group))
+        bounds = np.cumsum(lengths)[:-1]
+        return np.split(flat_idx[order], bounds), np.split(dist[order], bounds)
+
+    def count_within(self, lat, lon, radius_km: float) -> np.ndarray:
+        """Number of indexed points within ``radius_km`` of each query point."""
+        return self.tree.query_ball_point(_unit_vectors(lat, lon), _km_to_chord(radius_km),
+                                          workers=-1, return_length=True)
+
+    def save(self, path: str):
+        """Persist the index so large datasets need not be re-indexed on every run."""
+        joblib.dump({"version": INDEX_FORMAT_VERSION, "digest": self.digest, "size": self.size,
+                     "tree": self.tree}, path)
+        logger.info(f"Saved spatial index ({self.size} points) to {path}")
+
+    @classmethod
+    def load(cls, path: str, expected_digest: Optional[str] = None) -> "SpatialIndex":
+        """Load a persisted index, refusing one built for a different coordinate set."""
+        payload = joblib.load(path)
+        if payload.get("version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported spatial index format in {path}")
+        if expected_digest is not None and payload["digest"] != expected_digest:
+            raise ValueError(f"Spatial index {path} was built for different data")
+        index = cls.__new__(cls)
+        index.digest, index.size, index.tree = payload["digest"], payload["size"], payload["tree"]
+        return index
+
+    @classmethod
+    def load_or_build(cls, lat: np.ndarray, lon: np.ndarray, index_dir: str) -> "SpatialIndex":
+        """Reuse the index persisted for exactly these coordinates, building and saving it if missing."""
+        digest = coordinates_digest(lat, lon)
+        path = os.path.join(index_dir, f"{digest}.kdtree.joblib")
+        if os.path.exists(path):
+            try:
+                return cls.load(path, expected_digest=digest)
+            except Exception as e:
+                logger.warning(f"Ignoring unusable spatial index {path}: {str(e)}")
+        index = cls(lat, lon)
+        os.makedirs(index_dir, exist_ok=True)
+        index.save(path)
+        return index
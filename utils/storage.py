@@ -0,0 +1,179 @@
+# utils/storage.py
+"""Columnar storage for network stats: CSV <-> Parquet / Arrow IPC (Feather v2).
+
+Parquet is the compact on-disk format (zstd-compressed, column-projectable);
+Arrow IPC files are uncompressed and memory-mapped so reads are zero-copy.
+pyarrow is only imported when one of these formats is actually used.
+"""
+import argparse
+import logging
+import os
+from typing import Iterator, List
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+ARROW_EXTENSIONS = ('.arrow', '.feather', '.ipc')
+NUMERIC_COLUMNS = ['bandwidth', 'latency', 'signal_strength', 'uptime']
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError("pyarrow is required for Parquet/Arrow network data (pip install pyarrow)") from e
+
+
+def detect_format(path: str) -> str:
+    """Return 'parquet', 'arrow' or 'csv' based on the file extension."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in PARQUET_EXTENSIONS:
+        return "parquet"
+    if ext in ARROW_EXTENSIONS:
+        return "arrow"
+    return "csv"
+
+
+def _open_arrow(path: str):
+    import pyarrow as pa
+    # The memory map stays alive as long as any buffer read from it does
+    return pa.ipc.open_file(pa.memory_map(path, "r"))
+
+
+def read_columns(path: str) -> List[str]:
+    """Column names of a network stats file, read from metadata only."""
+    fmt = detect_format(path)
+    if fmt == "csv":
+        return pd.read_csv(path, nrows=0).columns.tolist()
+    _require_pyarrow()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        return pq.read_schema(path).names
+    return _open_arrow(path).schema.names
+
+
+def _to_pandas(table) -> pd.DataFrame:
+    df = table.to_pandas(split_blocks=True)
+    numeric = [col for col in NUMERIC_COLUMNS if col in df.columns and df[col].dtype != np.float32]
+    if numeric:
+        df = df.astype({col: np.float32 for col in numeric})
+    return df
+
+
+def read_network_stats(path: str, columns: List[str] = None) -> pd.DataFrame:
+    """Read (a projection of) a network stats file; numeric columns come back as float32."""
+    fmt = detect_format(path)
+    if fmt == "csv":
+        dtype = {col: np.float32 for col in NUMERIC_COLUMNS if columns is None or col in columns}
+        return pd.read_csv(path, usecols=columns, dtype=dtype)
+    _require_pyarrow()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        table = pq.read_table(path, columns=columns, memory_map=True)
+    else:
+        table = _open_arrow(path).read_all()
+        if columns is not None:
+            table = table.select(columns)
+    return _to_pandas(table)
+
+
+def count_rows(path: str) -> int:
+    """Number of data rows: exact from Parquet/Arrow metadata, a newline count for CSV.
+
+    The CSV count ignores quoting, so it is an estimate (good enough for progress bars).
+    """
+    fmt = detect_format(path)
+    if fmt == "csv":
+        lines, last = 0, b"\n"
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                lines += block.count(b"\n")
+                last = block[-1:]
+        if last != b"\n":
+            lines += 1  # no trailing newline after the last row
+        return max(lines - 1, 0)  # header
+    _require_pyarrow()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path, memory_map=True).metadata.num_rows
+    reader = _open_arrow(path)
+    return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+
+
+def iter_network_stats(path: str, columns: List[str], chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Yield chunks of at most ``chunk_size`` rows of ``columns``; numeric columns come back as float32."""
+    fmt = detect_format(path)
+    if fmt == "csv":
+        dtype = {col: np.float32 for col in NUMERIC_COLUMNS if col in columns}
+        with pd.read_csv(path, usecols=columns, dtype=dtype, chunksize=chunk_size) as reader:
+            for chunk in reader:
+                yield chunk[columns]
+        return
+    _require_pyarrow()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path, memory_map=True).iter_batches(batch_size=chunk_size, columns=columns):
+            yield _to_pandas(batch)
+    else:
+        reader = _open_arrow(path)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i).select(columns)
+            for offset in range(0, batch.num_rows, chunk_size):
+                yield _to_pandas(batch.slice(offset, chunk_size))
+
+
+def convert_network_stats(src_path: str, dst_path: str, chunk_size: int = 1_000_000) -> str:
+    """Stream a network stats CSV into Parquet or Arrow IPC without loading it whole.
+
+    Numeric columns are stored as float32; other columns (e.g. ``node_id``) are kept.
+    """
+    _require_pyarrow()
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    fmt = detect_format(dst_path)
+    if fmt == "csv":
+        raise ValueError(f"Destination must be a Parquet or Arrow file, got {dst_path}")
+
+    try:
+        header = pd.read_csv(src_path, nrows=0).columns.tolist()
+        column_types = {col: pa.float32() for col in NUMERIC_COLUMNS if col in header}
+        reader = pacsv.open_csv(
+            src_path,
+            read_options=pacsv.ReadOptions(block_size=64 * 1024 * 1024),
+            convert_options=pacsv.ConvertOptions(column_types=column_types),
+        )
+        # Opened from the inferred schema so a header-only CSV still gives a valid, empty file
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+            writer = pq.ParquetWriter(dst_path, reader.schema, compression="zstd")
+        else:
+            writer = pa.ipc.new_file(dst_path, reader.schema)
+        try:
+            for batch in reader:
+                table = pa.Table.from_batches([batch])
+                if fmt == "parquet":
+                    writer.write_table(table, row_group_size=chunk_size)
+                else:
+                    writer.write_table(table, max_chunksize=chunk_size)
+        finally:
+            writer.close()
+        logger.info(f"Converted {src_path} -> {dst_path}")
+        return dst_path
+    except Exception as e:
+        logger.error(f"Error converting network stats: {str(e)}")
+        raise
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert network stats CSV to Parquet or Arrow IPC.")
+    parser.add_argument("src", help="Input CSV path")
+    parser.add_argument("dst", help="Output path (.parquet or .arrow/.feather)")
+    parser.add_argument("--chunk-size", type=int, default=1_000_000, help="Rows per row group / record batch")
+    args = parser.parse_args()
+    convert_network_stats(args.src, args.dst, args.chunk_size)
+    print(f"Wrote {args.dst} ({os.path.getsize(args.dst) / 1e6:.2f} MB, "
+          f"CSV was {os.path.getsize(args.src) / 1e6:.2f} MB)")
@@ -0,0 +1,128 @@
+# utils/upload_store.py
+"""Content-addressed storage for uploaded files.
+
+Each upload is written once to ``<root>/<digest[:2]>/<digest><ext>``: identical
+uploads share one file, concurrent sessions never overwrite each other's data,
+and the digest doubles as the key for memoized analysis results. The store is
+capped by ``max_total_bytes``; the least recently uploaded files go first, and
+files that a job of this process is reading (see ``reading``) are skipped.
+"""
+import functools
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from config.settings import MAX_FILE_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class UploadTooLargeError(ValueError):
+    """The upload exceeds the configured ``MAX_FILE_SIZE``."""
+
+
+@dataclass(frozen=True)
+class StoredUpload:
+    digest: str
+    path: str
+    size: int
+
+
+class UploadStore:
+    def __init__(self, root: str, max_file_size: int = MAX_FILE_SIZE, max_total_bytes: Optional[int] = None):
+        self.root = root
+        self.max_file_size = max_file_size
+        self.max_total_bytes = max_total_bytes
+        self._lock = threading.Lock()
+        self._in_use: Dict[str, int] = {}  # path -> readers
+
+    def check_size(self, size: int, name: str = "upload"):
+        if size > self.max_file_size:
+            raise UploadTooLargeError(f"{name} is {size / 1e6:.1f} MB; the limit is {self.max_file_size / 1e6:.1f} MB")
+
+    def path_for(self, digest: str, extension: str = "") -> str:
+        return os.path.join(self.root, digest[:2], f"{digest}{extension.lower()}")
+
+    def put(self, data: bytes, filename: str = "") -> StoredUpload:
+        """Store ``data`` (if not already stored) and return its digest and path.
+
+        The file keeps ``filename``'s extension so format detection still works.
+        """
+        self.check_size(len(data), filename or "upload")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path_for(digest, os.path.splitext(filename)[1])
+        if os.path.exists(path):
+            os.utime(path)  # keeps recently re-uploaded files out of pruning
+            return StoredUpload(digest, path, len(data))
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)  # atomic: readers never see a partial file
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        logger.info(f"Stored upload {digest[:12]} ({len(data) / 1e6:.2f} MB)")
+        if self.max_total_bytes:
+            self.prune(self.max_total_bytes)
+        return StoredUpload(digest, path, len(data))
+
+    @contextmanager
+    def in_use(self, path: str) -> Iterator[str]:
+        """Keep ``path`` out of pruning while the block runs."""
+        path = os.path.abspath(path)
+        with self._lock:
+            self._in_use[path] = self._in_use.get(path, 0) + 1
+        try:
+            yield path
+        finally:
+            with self._lock:
+                if self._in_use[path] == 1:
+                    del self._in_use[path]
+                else:
+                    self._in_use[path] -= 1
+
+    def reading(self, path: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+        """``fn`` wrapped so that ``path`` is not pruned while a call to it runs (e.g. a background job)."""
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            with self.in_use(path):
+                return fn(*args, **kwargs)
+        return run
+
+    def prune(self, max_total_bytes: int) -> int:
+        """Delete the oldest stored files until the store fits in ``max_total_bytes``; returns files removed."""
+        with self._lock:
+            files = []
+            for dirpath, _, filenames in os.walk(self.root):
+                for name in filenames:
+                    path = os.path.abspath(os.path.join(dirpath, name))
+                    if name.endswith(".tmp"):
+                        continue
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in files)
+            removed = 0
+            for _, size, path in sorted(files):
+                if total <= max_total_bytes:
+                    break
+                if path in self._in_use:  # still counts towards the cap, but a job is reading it
+                    continue
+                try:
+                    os.unlink(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+            return removed